@@ -18,8 +18,11 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['email', 'password', 'first_name', 'last_name', 'description']
+        # uniqueness is checked once, in validate_email, instead of also by the model's UniqueValidator
+        extra_kwargs = {'email': {'validators': []}}
 
     def validate_email(self, value):
+        value = User.objects.normalize_email(value)
         if User.objects.filter(email=value).exists():
             raise serializers.ValidationError("ایمیل قبلاً ثبت شده است.")
         return value
@@ -29,21 +32,13 @@ class RegisterSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        # جداسازی اطلاعات پروفایل
-        first_name = validated_data.pop('first_name')
-        last_name = validated_data.pop('last_name')
-        description = validated_data.pop('description', '')
-
-        user = User.objects.create_user(**validated_data)
-
-        # به‌روزرسانی پروفایل مرتبط
-        profile = user.profile
-        profile.first_name = first_name
-        profile.last_name = last_name
-        profile.description = description
-        profile.save()
-
-        return user
+        # جداسازی اطلاعات پروفایل؛ پروفایل همراه کاربر و با همین مقادیر ساخته می‌شود
+        profile = {
+            'first_name': validated_data.pop('first_name'),
+            'last_name': validated_data.pop('last_name'),
+            'description': validated_data.pop('description', ''),
+        }
+        return User.objects.create_user(**validated_data, profile=profile)
 
 
 
@@ -123,4 +118,14 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
         model = Profile
         
         fields = ['first_name', 'last_name', 'description', 'image']
-        
+
+    def update(self, instance, validated_data):
+        '''
+        Saves only the submitted fields: the profile comes from the
+        authentication cache, and a full save would write back its copy of
+        the other columns, e.g. image_variants built since it was cached.
+        '''
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_date'])
+        return instance
@@ -4,6 +4,7 @@ from rest_framework import status
 from .serializers import RegisterSerializer, LoginSerializer, ResetPasswordSerializer, ProfileUpdateSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from core.utils.responses import success_response, error_response
+from core.utils.throttling import IPTokenBucketThrottle, EmailTokenBucketThrottle
 
 
 def get_tokens_for_user(user):
@@ -24,6 +25,9 @@ class RegisterView(APIView):
     No token is returned on registration.
     '''
     permission_classes = (AllowAny,)
+    throttle_classes = (IPTokenBucketThrottle,)
+    throttle_scope = 'register'
+    query_budget = 5  # email check, user and profile INSERTs inside a transaction
 
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -42,6 +46,9 @@ class LoginView(APIView):
     It takes email and password information, authenticates, and returns a JWT token if successful.
     '''
     permission_classes = (AllowAny,)
+    throttle_classes = (IPTokenBucketThrottle, EmailTokenBucketThrottle)
+    throttle_scope = 'login'
+    query_budget = 2  # the user, plus an UPDATE when the password hash is upgraded
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -63,6 +70,9 @@ class ResetPasswordView(APIView):
     '''
 
     permission_classes = (AllowAny,)
+    throttle_classes = (IPTokenBucketThrottle, EmailTokenBucketThrottle)
+    throttle_scope = 'password_reset'
+    query_budget = 3
 
     def post(self, request):
         serializer = ResetPasswordSerializer(data=request.data)
@@ -86,6 +96,7 @@ class ProfileUpdateView(APIView):
     Only logged in users are allowed to use this endpoint.
     '''
     permission_classes = (IsAuthenticated,)
+    query_budget = 2
 
     def patch(self, request):
         profile = request.user.profile
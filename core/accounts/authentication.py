@@ -0,0 +1,136 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def auth_cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'auth')]
+
+
+def token_cache_key(raw_token):
+    return f'jwt:{hashlib.sha256(raw_token).hexdigest()}'
+
+
+def user_cache_key(user_id):
+    return f'jwt-user:{user_id}'
+
+
+def evict_user(user_id):
+    '''
+    Drops the cached user/profile row so the next request reloads it. Called
+    from the User and Profile post_save/post_delete signals.
+    '''
+    auth_cache().delete(user_cache_key(user_id))
+
+
+def column_values(instance, exclude=()):
+    # as from_db() receives them, e.g. the name of a file rather than its FieldFile
+    return {
+        field.attname: field.get_prep_value(getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields if field.attname not in exclude
+    }
+
+
+def user_snapshot(user):
+    '''
+    What the auth cache keeps of a user and its profile: their column values
+    without the password hash, plus the password-derived claim revoked
+    tokens are checked against when CHECK_REVOKE_TOKEN is on (the value the
+    tokens carry, not the hash).
+    '''
+    snapshot = {
+        'user': column_values(user, exclude={'password'}),
+        'profile': None,
+        'revoke_claim': get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None,
+    }
+    profile = getattr(user, 'profile', None)
+    if profile is not None:
+        snapshot['profile'] = column_values(profile)
+    return snapshot
+
+
+def user_from_snapshot(model, snapshot, using=DEFAULT_DB_ALIAS):
+    '''
+    Rebuilds the user (password left deferred, loaded on access) with its profile.
+    '''
+    user = model.from_db(using, list(snapshot['user']), list(snapshot['user'].values()))
+    if snapshot['profile'] is not None:
+        related = model._meta.get_field('profile').related_model
+        profile = related.from_db(using, list(snapshot['profile']), list(snapshot['profile'].values()))
+        user.profile = profile
+    user._revoke_claim = snapshot['revoke_claim']
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    '''
+    JWTAuthentication without the per-request database hits: the claims of
+    verified tokens and the token's user (with its profile, via
+    select_related) are kept in the "auth" cache, shared by the workers, with
+    a short TTL (AUTH_CACHE_TIMEOUT).
+
+    No credential is written to the cache, which may be on disk: tokens are
+    only known by their digest, so a cached entry cannot be replayed, and
+    users are stored without their password hash (see user_snapshot).
+
+    Saving or deleting a user or profile evicts its entry, so a deactivation
+    or password reset is seen by the next request in any worker. Changes
+    made with queryset.update(), which sends no signals, are seen when the
+    entry expires unless evict_user() is called.
+    '''
+
+    def get_validated_token(self, raw_token):
+        cache = auth_cache()
+        key = token_cache_key(raw_token)
+        token_class = cache.get(key)
+        if token_class is not None:
+            # verified when it was cached and not expired since (see the timeout below)
+            return import_string(token_class)(raw_token, verify=False)
+
+        token = super().get_validated_token(raw_token)
+        remaining = int(token['exp'] - time.time()) if 'exp' in token else cache.default_timeout
+        if remaining > 0:
+            cls = type(token)
+            cache.set(key, f'{cls.__module__}.{cls.__qualname__}', timeout=min(cache.default_timeout, remaining))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        cache = auth_cache()
+        key = user_cache_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            user = (
+                self.user_model.objects
+                .select_related('profile')
+                .filter(**{api_settings.USER_ID_FIELD: user_id})
+                .first()
+            )
+            if user is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            snapshot = user_snapshot(user)
+            cache.set(key, snapshot)
+        user = user_from_snapshot(self.user_model, snapshot)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            revoke_claim = user._revoke_claim or get_md5_hash_password(user.password)
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != revoke_claim:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
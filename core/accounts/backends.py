@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    '''
+    Authenticates with email and password using a single SELECT on the
+    user table. Unknown emails still pay for one password hash so response
+    times do not reveal which addresses are registered; a stored hash made
+    with an outdated hasher or cost is replaced on a successful login (one
+    UPDATE of the password column).
+    '''
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None:
+            email = kwargs.get(UserModel.USERNAME_FIELD, kwargs.get('username'))
+        if email is None or password is None:
+            return None
+
+        user = UserModel._default_manager.filter(email=UserModel._default_manager.normalize_email(email)).first()
+        if user is None:
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
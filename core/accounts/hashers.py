@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    '''
+    Argon2id with the cost taken from settings (ARGON2_TIME_COST,
+    ARGON2_MEMORY_COST in KiB, ARGON2_PARALLELISM) instead of Django's
+    fixed defaults. Hashes made with other parameters are upgraded the
+    next time their user logs in (must_update compares them).
+    '''
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    '''
+    PBKDF2-SHA256 with PBKDF2_ITERATIONS rounds, for deployments without argon2-cffi.
+    '''
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
@@ -0,0 +1,98 @@
+import json
+import logging
+from importlib.util import find_spec
+from itertools import count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.utils.benchmarks import temporary_database, time_call
+
+
+PASSWORD = 'correct-horse-battery'
+
+
+def hasher_variants():
+    '''
+    (label, hasher path) pairs: Django's stock hashers next to the configured ones.
+    '''
+    variants = [
+        ('pbkdf2, django default cost', 'django.contrib.auth.hashers.PBKDF2PasswordHasher'),
+        ('argon2, django default cost', 'django.contrib.auth.hashers.Argon2PasswordHasher'),
+    ]
+    variants += [(f'{name}, configured cost', path) for name, path in settings.PASSWORD_HASHER_CHOICES.items()]
+    if find_spec('argon2') is None:  # argon2-cffi is optional
+        variants = [(label, path) for label, path in variants if not label.startswith('argon2')]
+    return variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the auth endpoints for each password hasher: login latency (known and "
+        "unknown email) through the full request cycle, plus the SQL statements a login "
+        "and a registration execute. Use it to pick PASSWORD_HASHER and its ARGON2_* / "
+        "PBKDF2_ITERATIONS cost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--hasher', action='append', dest='hashers', help="Only run hashers whose label contains this (repeatable).")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        client = Client()
+        login_url = reverse('accounts:accounts:login')
+        register_url = reverse('accounts:accounts:register')
+        serial = count()
+
+        variants = hasher_variants()
+        if options['hashers']:
+            variants = [(label, path) for label, path in variants if any(h in label for h in options['hashers'])]
+
+        # failed logins are part of the run; keep django.request from logging each one
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        results = []
+        with temporary_database():
+            for label, path in variants:
+                with override_settings(PASSWORD_HASHERS=[path]):
+                    email = f'bench{next(serial)}@example.com'
+                    with CaptureQueriesContext(connection) as register_queries:
+                        response = client.post(register_url, {
+                            'email': email, 'password': PASSWORD, 'first_name': 'Bench', 'last_name': 'User',
+                        })
+                    assert response.status_code == 201, response.content
+
+                    credentials = {'email': email, 'password': PASSWORD}
+                    with CaptureQueriesContext(connection) as login_queries:
+                        response = client.post(login_url, credentials)
+                    assert response.status_code == 200, response.content
+
+                    results.append({
+                        "hasher": label,
+                        "register_queries": len(register_queries),
+                        "login_queries": len(login_queries),
+                        "login": time_call(lambda: client.post(login_url, credentials), repeat=options['requests']),
+                        "login_unknown_email": time_call(
+                            lambda: client.post(login_url, {'email': 'nobody@example.com', 'password': PASSWORD}),
+                            repeat=options['requests'],
+                        ),
+                    })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(result['hasher']))
+            self.stdout.write(
+                f"  statements: register {result['register_queries']}, login {result['login_queries']}"
+            )
+            for key in ('login', 'login_unknown_email'):
+                timing = result[key]
+                self.stdout.write(
+                    f"  {key:<20} median {timing['median']:>8} ms  p95 {timing['p95']:>8} ms  p99 {timing['p99']:>8} ms"
+                )
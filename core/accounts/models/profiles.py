@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.db import models
+from core.utils.images import schedule_variants, variants_ready
 from .users import User
 
 
@@ -13,6 +14,8 @@ class Profile(models.Model):
     first_name = models.CharField(max_length=250)
     last_name = models.CharField(max_length=250)
     image = models.ImageField(upload_to='profiles/',blank=True, null=True)
+    # thumbnails and WebP/AVIF versions of the image, built after upload (core/utils/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(max_length=250,blank=True, null=True)
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
@@ -24,8 +27,38 @@ class Profile(models.Model):
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, created, **kwargs):
     """
-    Signal for post creating a user which activates when a user being created ONLY
+    Signal for post creating a user which activates when a user being created ONLY.
+    The profile is inserted with the user's initial_profile values (set by
+    UserManager.create_user), so it does not need a second save.
     """
     if created:
-        Profile.objects.create(user=instance)
-        
\ No newline at end of file
+        Profile.objects.create(user=instance, **getattr(instance, 'initial_profile', {}))
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+def evict_cached_user(sender, instance, **kwargs):
+    """
+    Drops the user (with its profile) from the JWT authentication cache, e.g.
+    after a deactivation, a password reset or a profile update
+    """
+    from accounts.authentication import evict_user
+
+    evict_user(instance.user_id if sender is Profile else instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def profile_image_saved(sender, instance, using, **kwargs):
+    """
+    Signal that builds the image variants of a new or replaced profile image once the transaction commits
+    """
+    schedule_variants(instance, using=using)
+
+
+@receiver(variants_ready, sender=Profile)
+def profile_variants_ready(sender, pk, **kwargs):
+    from accounts.authentication import evict_user
+
+    user_id = Profile.objects.filter(pk=pk).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        evict_user(user_id)
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
@@ -15,13 +15,22 @@ class UserManager(BaseUserManager):
     for authentication instead of username.
     """
 
-    def create_user(self, email, password=None, **extra_fields):
+    def create_user(self, email, password=None, profile=None, **extra_fields):
+        """
+        Creates the user and its profile (INSERT user + INSERT profile in one
+        transaction). profile holds the initial Profile field values; the
+        password is hashed before the transaction starts so the write lock is
+        not held during it.
+        """
         if not email:
             raise ValueError(_("Email must be set"))
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
-        user.save()
+        # read by the post_save signal that creates the profile
+        user.initial_profile = profile or {}
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
         return user
 
     def create_superuser(self, email, password, **extra_fields):
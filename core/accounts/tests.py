@@ -1,3 +1,196 @@
-from django.test import TestCase
+import json
+import math
+import pickle
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts.authentication import auth_cache, token_cache_key, user_cache_key, user_from_snapshot
+from accounts.models import Profile, User
+from core.utils.testing import QueryBudgetTestMixin
+from core.utils.throttling import bucket_store, parse_rate
+
+
+PASSWORD = 'correct-horse-battery'
+
+
+class AccountsQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    '''
+    Every accounts endpoint stays within its query budget.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', PASSWORD, profile={'first_name': 'علی', 'last_name': 'رضایی'})
+
+    def auth_headers(self):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def test_register(self):
+        response = self.client.post('/accounts/api/v1/register/', {
+            'email': 'new@example.com', 'password': PASSWORD, 'first_name': 'سارا', 'last_name': 'احمدی', 'description': 'سلام',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertWithinQueryBudget(response)
+        profile = Profile.objects.get(user__email='new@example.com')
+        self.assertEqual((profile.first_name, profile.last_name, profile.description), ('سارا', 'احمدی', 'سلام'))
+
+    def test_login(self):
+        response = self.client.post('/accounts/api/v1/login/', {'email': 'user@example.com', 'password': PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_login_upgrades_password_hash(self):
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']):
+            self.user.set_password(PASSWORD)
+            self.user.save(update_fields=['password'])
+        response = self.client.post('/accounts/api/v1/login/', {'email': 'user@example.com', 'password': PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.password.startswith('pbkdf2_sha1$'))
+
+    def test_token_refresh(self):
+        response = self.client.post('/accounts/api/v1/token/refresh/', {'refresh': str(RefreshToken.for_user(self.user))})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_reset_password(self):
+        response = self.client.post('/accounts/api/v1/reset-password/', {'email': 'user@example.com', 'new_password': 'another-horse-battery'})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_profile_update(self):
+        headers = self.auth_headers()
+        for name in ('رضا', 'مریم'):
+            response = self.client.patch(
+                '/accounts/api/v1/profile/update/', {'first_name': name, 'last_name': 'کریمی'},
+                content_type='application/json', **headers,
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertWithinQueryBudget(response)
+        self.assertEqual(Profile.objects.get(user=self.user).first_name, 'مریم')
+
+    def test_deactivated_user_is_rejected(self):
+        headers = self.auth_headers()
+        data = {'first_name': 'رضا', 'last_name': 'کریمی'}
+        self.assertEqual(self.client.patch('/accounts/api/v1/profile/update/', data, content_type='application/json', **headers).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.patch('/accounts/api/v1/profile/update/', data, content_type='application/json', **headers).status_code, 401)
+
+    def test_profile_update_keeps_other_columns(self):
+        headers = self.auth_headers()
+        # a rejected request caches the user with its profile
+        data = {'first_name': '', 'last_name': 'کریمی'}
+        self.assertEqual(self.client.patch('/accounts/api/v1/profile/update/', data, content_type='application/json', **headers).status_code, 400)
+        # e.g. the image pipeline storing variants; the cached profile misses them
+        variants = {'source': 'profiles/a.jpg', 'thumb': {'width': 160, 'height': 160}}
+        Profile.objects.filter(user=self.user).update(image_variants=variants, description='سلام')
+
+        data['first_name'] = 'مریم'
+        self.assertEqual(self.client.patch('/accounts/api/v1/profile/update/', data, content_type='application/json', **headers).status_code, 200)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.first_name, profile.description, profile.image_variants), ('مریم', 'سلام', variants))
+
+    def test_cache_holds_no_credentials(self):
+        Profile.objects.filter(user=self.user).update(image='profiles/a.jpg', image_variants={'source': 'profiles/a.jpg'})
+        token = str(AccessToken.for_user(self.user))
+        data = {'first_name': '', 'last_name': 'کریمی'}
+        response = self.client.patch(
+            '/accounts/api/v1/profile/update/', data, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+        self.assertEqual(response.status_code, 400)
+
+        snapshot = auth_cache().get(user_cache_key(self.user.pk))
+        self.assertNotIn('password', snapshot['user'])
+        stored = pickle.dumps([snapshot, auth_cache().get(token_cache_key(token.encode()))])
+        self.assertNotIn(self.user.password.encode(), stored)
+        self.assertNotIn(token.encode(), stored)
+
+        user = user_from_snapshot(User, snapshot)
+        self.assertEqual((user.pk, user.email, user.profile.image.name), (self.user.pk, 'user@example.com', 'profiles/a.jpg'))
+        # deferred, loaded on access
+        self.assertEqual(user.get_deferred_fields(), {'password'})
+        self.assertTrue(user.check_password(PASSWORD))
+
+    def test_password_reset_evicts_cached_user(self):
+        # patched in place: modules keep the api_settings object override_settings would replace
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            headers = self.auth_headers()
+            # rejected after authentication, so nothing is saved and the user stays cached
+            data = {'first_name': '', 'last_name': 'کریمی'}
+            self.assertEqual(self.client.patch('/accounts/api/v1/profile/update/', data, content_type='application/json', **headers).status_code, 400)
+            self.assertIsNotNone(auth_cache().get(user_cache_key(self.user.pk)))
+
+            response = self.client.post('/accounts/api/v1/reset-password/', {'email': 'user@example.com', 'new_password': 'another-horse-battery'})
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(auth_cache().get(user_cache_key(self.user.pk)))
+            # the token carries the old password hash, so it is revoked at once
+            self.assertEqual(self.client.patch('/accounts/api/v1/profile/update/', data, content_type='application/json', **headers).status_code, 401)
+
+
+class ThrottleTest(TestCase):
+    '''
+    Token bucket throttling of the login and password reset endpoints.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', PASSWORD)
+
+    def setUp(self):
+        bucket_store.backend.clear()
+
+    def test_bucket_refills(self):
+        # 5/min: a burst of 5, then one token every 12 seconds
+        for _ in range(5):
+            self.assertEqual(bucket_store.consume('bucket', 5, 60, now=1000), (True, 0.0))
+        allowed, wait = bucket_store.consume('bucket', 5, 60, now=1000)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 12)
+        self.assertFalse(bucket_store.consume('bucket', 5, 60, now=1011)[0])
+        self.assertTrue(bucket_store.consume('bucket', 5, 60, now=1012)[0])
+        self.assertFalse(bucket_store.consume('bucket', 5, 60, now=1012)[0])
+        # refills up to the capacity only
+        for _ in range(5):
+            self.assertTrue(bucket_store.consume('bucket', 5, 60, now=5000)[0])
+        self.assertFalse(bucket_store.consume('bucket', 5, 60, now=5000)[0])
+
+    def test_login_is_throttled_per_email(self):
+        capacity, period = parse_rate(drf_settings.DEFAULT_THROTTLE_RATES['login_email'])
+        for index in range(capacity):
+            response = self.client.post(
+                '/accounts/api/v1/login/', {'email': 'User@example.com', 'password': 'wrong-password'},
+                REMOTE_ADDR=f'10.0.0.{index}',
+            )
+            self.assertNotEqual(response.status_code, 429)
+
+        response = self.client.post('/accounts/api/v1/login/', {'email': 'user@example.com', 'password': PASSWORD})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), math.ceil(period / capacity))
+        # other accounts keep their own bucket
+        response = self.client.post('/accounts/api/v1/login/', {'email': 'other@example.com', 'password': PASSWORD})
+        self.assertNotEqual(response.status_code, 429)
+
+    def test_forwarded_for_does_not_reset_the_bucket(self):
+        capacity, _ = parse_rate(drf_settings.DEFAULT_THROTTLE_RATES['login'])
+        for index in range(capacity):
+            response = self.client.post(
+                '/accounts/api/v1/login/', {'email': f'user{index}@example.com', 'password': PASSWORD},
+                HTTP_X_FORWARDED_FOR=f'203.0.113.{index}',
+            )
+            self.assertNotEqual(response.status_code, 429)
+        response = self.client.post(
+            '/accounts/api/v1/login/', {'email': 'last@example.com', 'password': PASSWORD}, HTTP_X_FORWARDED_FOR='198.51.100.1',
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_malformed_body_is_rejected(self):
+        for url in ('/accounts/api/v1/login/', '/accounts/api/v1/reset-password/'):
+            for body in ([{'email': 'user@example.com'}], 'user@example.com', 42, None):
+                response = self.client.post(url, json.dumps(body), content_type='application/json')
+                self.assertEqual(response.status_code, 400, (url, body))
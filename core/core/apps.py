@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        # connects the query recorder before any database connection is opened, whatever thread opens it
+        from core.utils import profiling  # noqa: F401
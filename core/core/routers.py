@@ -0,0 +1,117 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# models whose reads may be served by a replica; everything else (users,
+# sessions, orders, ...) always uses the primary
+REPLICATED_MODELS = {
+    'general.stone',
+    'general.stonecomment',
+    'general.stonefaq',
+    'products.productstone',
+}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def replica_reads_allowed():
+    return _replica_reads.get()
+
+
+@contextmanager
+def allow_replica_reads(allowed=True):
+    '''
+    Lets reads made inside the block go to replicas (or, with allowed=False,
+    forces them back to the primary). Outside of it, e.g. in management
+    commands and the shell, everything uses the primary.
+    '''
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    '''
+    Sends reads of REPLICATED_MODELS to a random replica_* database and all
+    writes to the primary. Replicas are only used where reads were allowed
+    to go there (safe requests, see ReplicaPinningMiddleware) and never
+    inside a transaction on the primary, so code does not read behind its
+    own writes. Response cache misses go to the primary while their scopes
+    were invalidated recently (see cache_response), so a lagging replica
+    never gets its page cached.
+    Migrations only run on the primary; replicas get the schema from it.
+    '''
+
+    def __init__(self):
+        self.replicas = replica_aliases()
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or model._meta.label_lower not in REPLICATED_MODELS:
+            return DEFAULT_DB_ALIAS
+        if not replica_reads_allowed() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    '''
+    Turns replica reads on for safe requests, with read-your-writes: requests
+    with an unsafe method are served entirely from the primary, and a
+    successful one sets a cookie that keeps the client's following requests
+    on the primary for REPLICA_STICKY_SECONDS, long enough for the replicas
+    to catch up.
+    '''
+
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, 'REPLICA_STICKY_COOKIE', 'db_pin')
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def use_replicas(self, request):
+        return request.method in self.safe_methods and self.cookie_name not in request.COOKIES
+
+    def process_response(self, request, response):
+        if request.method not in self.safe_methods and response.status_code < 400 and self.sticky_seconds:
+            response.set_cookie(self.cookie_name, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.use_replicas(request):
+            with allow_replica_reads():
+                return self.get_response(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        if self.use_replicas(request):
+            with allow_replica_reads():
+                return await self.get_response(request)
+        return self.process_response(request, await self.get_response(request))
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
+import sys
+from importlib.util import find_spec
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,7 +29,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config("SECRET_KEY", default="test")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config("DEBUG", default=True, cast=bool)
 
 ALLOWED_HOSTS = ['*']
 
@@ -40,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     "rest_framework",
+    "core",
     "accounts",
     "general",
     "products",
@@ -48,6 +53,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.utils.profiling.RequestProfilingMiddleware',
+    'core.utils.compression.CompressionMiddleware',
+    'core.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,13 +88,216 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DB_ENGINE selects sqlite (default) or postgresql; the remaining DB_* variables
+# fill in the connection. Connections are kept open between requests for
+# DB_CONN_MAX_AGE seconds (None = forever) and pinged before they are reused.
+# On PostgreSQL, DB_POOL=True switches to Django's native psycopg pool instead
+# (needs psycopg[pool]; persistent connections are then disabled, the pool
+# owns them). SQLite gets WAL journaling, synchronous=NORMAL and a memory
+# mapped file on every new connection, and takes the write lock at BEGIN so
+# concurrent writers wait for DB_TIMEOUT seconds instead of failing.
+
+DB_ENGINE = config("DB_ENGINE", default="sqlite")
+DB_POOL = config("DB_POOL", default=False, cast=bool)
+DB_CONN_MAX_AGE = config("DB_CONN_MAX_AGE", default=60, cast=lambda v: None if v in ('', 'None') else int(v))
+
+DATABASE_ENGINES = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': config("DB_NAME", default=str(BASE_DIR / 'db.sqlite3')),
+        'OPTIONS': {
+            'timeout': config("DB_TIMEOUT", default=20, cast=int),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA mmap_size={config("DB_SQLITE_MMAP_SIZE", default=128 * 1024 * 1024, cast=int)};'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        # a file (not in-memory) test database lets threaded tests open their own connections
+        'TEST': {
+            'NAME': str(BASE_DIR / 'test_db.sqlite3'),
+        },
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config("DB_NAME", default="stones"),
+        'USER': config("DB_USER", default="postgres"),
+        'PASSWORD': config("DB_PASSWORD", default=""),
+        'HOST': config("DB_HOST", default="localhost"),
+        'PORT': config("DB_PORT", default=5432, cast=int),
+        'OPTIONS': {
+            'pool': {
+                'min_size': config("DB_POOL_MIN_SIZE", default=2, cast=int),
+                'max_size': config("DB_POOL_MAX_SIZE", default=10, cast=int),
+                'timeout': config("DB_POOL_TIMEOUT", default=10, cast=int),
+            },
+        } if DB_POOL else {},
+    },
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **DATABASE_ENGINES[DB_ENGINE],
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool),
     }
 }
 
+# DB_REPLICAS lists read replicas of the primary, comma separated: SQLite file
+# paths (copy the primary with `python manage.py sync_sqlite_replicas`) or
+# PostgreSQL hosts sharing its credentials. Catalog and community reads are
+# spread over them (core/routers.py); after a write the client stays on the
+# primary for REPLICA_STICKY_SECONDS, and cached responses whose data changed
+# within that window are filled from the primary.
+
+DB_REPLICAS = config("DB_REPLICAS", default="", cast=Csv())
+
+for index, replica in enumerate(DB_REPLICAS, start=1):
+    replica_settings = {
+        **DATABASES['default'],
+        'OPTIONS': copy.deepcopy(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DB_ENGINE == 'sqlite':
+        replica_settings['NAME'] = replica
+        replica_settings['OPTIONS']['init_command'] += 'PRAGMA query_only=ON;'
+    else:
+        replica_settings['HOST'] = replica
+    DATABASES[f'replica_{index}'] = replica_settings
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=10, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The "api" cache holds rendered read responses of the general API, and the
+# scope versions that invalidate them, so every worker must see the same one.
+# API_CACHE_BACKEND selects file (default, shared by the processes of a host),
+# db (shared by every host; run `python manage.py createcachetable` once),
+# redis (shared, needs redis-py; API_CACHE_LOCATION is then the redis:// URL)
+# or locmem (per process LRU: only for a single worker, since an invalidation
+# in one process never reaches the others; refused when WEB_CONCURRENCY > 1).
+
+API_CACHE_BACKEND = config("API_CACHE_BACKEND", default="file")
+API_CACHE_MAX_ENTRIES = config("API_CACHE_MAX_ENTRIES", default=5000, cast=int)
+
+API_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-responses',
+        'OPTIONS': {'MAX_ENTRIES': API_CACHE_MAX_ENTRIES},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config("API_CACHE_LOCATION", default=str(BASE_DIR / '.cache' / 'api')),
+        'OPTIONS': {'MAX_ENTRIES': API_CACHE_MAX_ENTRIES},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': config("API_CACHE_LOCATION", default='api_response_cache'),
+        'OPTIONS': {'MAX_ENTRIES': API_CACHE_MAX_ENTRIES},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config("API_CACHE_LOCATION", default='redis://127.0.0.1:6379/2'),
+    },
+}
+
+# The "auth" cache remembers verified JWTs (by digest) and their users with
+# profiles, without password hashes (accounts/authentication.py). Saves evict a user's entry, so like the "api"
+# cache it must be shared for a deactivation or password reset to reach every
+# worker at once. AUTH_CACHE_BACKEND takes the same values as API_CACHE_BACKEND.
+
+AUTH_CACHE_BACKEND = config("AUTH_CACHE_BACKEND", default="file")
+AUTH_CACHE_MAX_ENTRIES = config("AUTH_CACHE_MAX_ENTRIES", default=10000, cast=int)
+
+AUTH_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'jwt-auth',
+        'OPTIONS': {'MAX_ENTRIES': AUTH_CACHE_MAX_ENTRIES},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config("AUTH_CACHE_LOCATION", default=str(BASE_DIR / '.cache' / 'auth')),
+        'OPTIONS': {'MAX_ENTRIES': AUTH_CACHE_MAX_ENTRIES},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': config("AUTH_CACHE_LOCATION", default='jwt_auth_cache'),
+        'OPTIONS': {'MAX_ENTRIES': AUTH_CACHE_MAX_ENTRIES},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config("AUTH_CACHE_LOCATION", default='redis://127.0.0.1:6379/3'),
+    },
+}
+
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=1, cast=int)
+
+for name, backend in (('API_CACHE_BACKEND', API_CACHE_BACKEND), ('AUTH_CACHE_BACKEND', AUTH_CACHE_BACKEND)):
+    if backend == 'locmem' and WEB_CONCURRENCY > 1:
+        raise ImproperlyConfigured(
+            f"{name}=locmem with WEB_CONCURRENCY={WEB_CONCURRENCY}: workers would keep serving "
+            "entries invalidated by writes made in another worker; use file, db or redis."
+        )
+
+# Rate limiting buckets (core/utils/throttling.py). THROTTLE_CACHE_BACKEND
+# selects locmem (default, per process), db (shared by all processes; run
+# `python manage.py createcachetable` once) or redis (shared, needs redis-py;
+# THROTTLE_CACHE_LOCATION is then the redis:// URL).
+
+THROTTLE_CACHE_BACKEND = config("THROTTLE_CACHE_BACKEND", default="locmem")
+THROTTLE_CACHE_MAX_ENTRIES = config("THROTTLE_CACHE_MAX_ENTRIES", default=50000, cast=int)
+
+THROTTLE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle-buckets',
+        'OPTIONS': {'MAX_ENTRIES': THROTTLE_CACHE_MAX_ENTRIES},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': config("THROTTLE_CACHE_LOCATION", default='throttle_buckets'),
+        'OPTIONS': {'MAX_ENTRIES': THROTTLE_CACHE_MAX_ENTRIES},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config("THROTTLE_CACHE_LOCATION", default='redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        **API_CACHE_BACKENDS[API_CACHE_BACKEND],
+        'TIMEOUT': config("API_CACHE_TIMEOUT", default=600, cast=int),
+    },
+    'auth': {
+        **AUTH_CACHE_BACKENDS[AUTH_CACHE_BACKEND],
+        'TIMEOUT': config("AUTH_CACHE_TIMEOUT", default=60, cast=int),
+    },
+    'throttle': THROTTLE_CACHE_BACKENDS[THROTTLE_CACHE_BACKEND],
+}
+
+# The test runner gets its own in-memory caches, so tests (which clear them
+# between cases) never read or wipe the file caches of a development checkout.
+if sys.argv[1:2] == ['test']:
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'test-{alias}',
+            **({'TIMEOUT': options['TIMEOUT']} if 'TIMEOUT' in options else {}),
+        }
+        for alias, options in CACHES.items()
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -106,6 +317,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# PASSWORD_HASHER picks the hasher for new hashes: argon2 (default when
+# argon2-cffi is installed) or pbkdf2. Its cost comes from the ARGON2_* /
+# PBKDF2_ITERATIONS variables; measure it with `python manage.py bench_auth`.
+# The other hashers stay listed so existing hashes still verify, and are
+# rehashed with the current hasher and cost on the user's next login.
+
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="argon2" if find_spec("argon2") else "pbkdf2")
+
+ARGON2_TIME_COST = config("ARGON2_TIME_COST", default=2, cast=int)
+ARGON2_MEMORY_COST = config("ARGON2_MEMORY_COST", default=19456, cast=int)  # KiB
+ARGON2_PARALLELISM = config("ARGON2_PARALLELISM", default=1, cast=int)
+PBKDF2_ITERATIONS = config("PBKDF2_ITERATIONS", default=600000, cast=int)
+
+PASSWORD_HASHER_CHOICES = {
+    'argon2': 'accounts.hashers.TunedArgon2PasswordHasher',
+    'pbkdf2': 'accounts.hashers.TunedPBKDF2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CHOICES[PASSWORD_HASHER],
+    *(hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+AUTHENTICATION_BACKENDS = ['accounts.backends.EmailBackend']
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -124,6 +364,59 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STATIC_ROOT = config("STATIC_ROOT", default=str(BASE_DIR / 'staticfiles'))
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = config("MEDIA_ROOT", default=str(BASE_DIR / 'media'))
+
+# collectstatic writes content-hashed names plus .br/.gz copies (core/utils/staticfiles.py);
+# on by default outside DEBUG, as {% static %} then needs the collected manifest
+STATIC_MANIFEST = config("STATIC_MANIFEST", default=not DEBUG, cast=bool)
+STATIC_COMPRESS_MIN_SIZE = config("STATIC_COMPRESS_MIN_SIZE", default=512, cast=int)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.utils.staticfiles.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Response compression (core/utils/compression.py): codings in server preference
+# order (unavailable ones are skipped) and the per-request levels, which favour
+# CPU over ratio; collectstatic precompresses static files at the highest levels.
+COMPRESS_MIN_SIZE = config("COMPRESS_MIN_SIZE", default=1024, cast=int)
+COMPRESS_ENCODINGS = config("COMPRESS_ENCODINGS", default="zstd,br,gzip", cast=Csv())
+COMPRESS_LEVELS = {
+    'zstd': config("COMPRESS_LEVEL_ZSTD", default=3, cast=int),
+    'br': config("COMPRESS_LEVEL_BR", default=4, cast=int),
+    'gzip': config("COMPRESS_LEVEL_GZIP", default=6, cast=int),
+}
+
+# Serve STATIC_URL and MEDIA_URL from the app when there is no front web server.
+# Behind nginx (X-Accel-Redirect, internal location SENDFILE_URL_PREFIX + static/ or media/)
+# or Apache/lighttpd (X-Sendfile), SENDFILE_HEADER hands the bytes over to it.
+SERVE_FILES = config("SERVE_FILES", default=True, cast=bool)
+SENDFILE_HEADER = config("SENDFILE_HEADER", default="")
+SENDFILE_URL_PREFIX = config("SENDFILE_URL_PREFIX", default="/protected/")
+FILE_BLOCK_SIZE = config("FILE_BLOCK_SIZE", default=64 * 1024, cast=int)
+MEDIA_CACHE_CONTROL = config("MEDIA_CACHE_CONTROL", default="public, max-age=86400")
+
+# Image variants (core/utils/images.py): built after an upload commits, in a
+# pool of IMAGE_WORKERS processes ("process") or in the request itself ("sync").
+IMAGE_PIPELINE = config("IMAGE_PIPELINE", default="process")
+IMAGE_WORKERS = config("IMAGE_WORKERS", default=2, cast=int)
+# name: (width, height, crop); uncropped sizes keep the aspect ratio and never upscale
+IMAGE_VARIANT_SIZES = {
+    'thumb': (160, 160, True),
+    'small': (480, 480, False),
+    'medium': (1024, 1024, False),
+}
+# formats the installed Pillow cannot encode are skipped
+IMAGE_VARIANT_FORMATS = config("IMAGE_VARIANT_FORMATS", default="webp,avif", cast=Csv())
+IMAGE_VARIANT_QUALITY = config("IMAGE_VARIANT_QUALITY", default=70, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -135,10 +428,29 @@ AUTH_USER_MODEL = "accounts.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWTAuthentication plus a short-lived cache of tokens and users
+        "accounts.authentication.CachedJWTAuthentication",
+    ],
+    # orjson when installed, stdlib json otherwise (see core/utils/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.utils.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    # proxies in front of the app that append to X-Forwarded-For; with 0 the
+    # throttles key on REMOTE_ADDR and ignore the header, which clients can forge
+    'NUM_PROXIES': config("NUM_PROXIES", default=0, cast=int),
     'PAGE_SIZE': 100,
+    # token buckets for the anonymous write endpoints, per IP and (*_email) per email
+    # (see core/utils/throttling.py); "N/period" allows a burst of N, refilled over the period
+    'DEFAULT_THROTTLE_RATES': {
+        'login': config("THROTTLE_RATE_LOGIN", default="20/min"),
+        'login_email': config("THROTTLE_RATE_LOGIN_EMAIL", default="5/min"),
+        'register': config("THROTTLE_RATE_REGISTER", default="10/hour"),
+        'password_reset': config("THROTTLE_RATE_PASSWORD_RESET", default="5/hour"),
+        'password_reset_email': config("THROTTLE_RATE_PASSWORD_RESET_EMAIL", default="3/hour"),
+        'community_write': config("THROTTLE_RATE_COMMUNITY_WRITE", default="30/min"),
+    },
 }
 
 SIMPLE_JWT = {
@@ -179,4 +491,33 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+
+# Request profiling (core/utils/profiling.py)
+# Every response gets a Server-Timing header (db with the query count, view,
+# render, total) and a JSON line on the "core.profiling" logger; set
+# REQUEST_LOG_LEVEL=INFO to see one per request, over-budget requests are
+# logged as warnings. Views declare query_budget; QUERY_BUDGETS overrides it
+# by url name. QUERY_BUDGET_ACTION=raise turns an overrun into an error
+# (the API tests do this).
+
+QUERY_BUDGET_ACTION = config("QUERY_BUDGET_ACTION", default="warn")
+QUERY_BUDGETS = {
+    'accounts:accounts:token_refresh': 1,  # simplejwt's view; checks the user is still active
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': config("REQUEST_LOG_LEVEL", default="WARNING"),
+            'propagate': False,
+        },
+    },
+}
\ No newline at end of file
@@ -0,0 +1,27 @@
+from django.views import View
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from core.utils.responses import json_error_response
+
+
+class AsyncReadView(View):
+    '''
+    Base class for async-native, read-only endpoints served under ASGI.
+
+    Handlers are coroutines and reach the database through the async ORM,
+    so a slow client never pins a worker thread. The request is wrapped in
+    DRF's Request (no parsing or authentication happens) so the sync views'
+    query helpers and paginators can be reused. Responses are built with
+    json_success_response/json_error_response since DRF's rendering
+    pipeline is synchronous; the response cache is not used here.
+    '''
+
+    http_method_names = ['get', 'head', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request = request = Request(request)
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except NotFound as e:
+            return json_error_response(message=str(e.detail), status_code=404)
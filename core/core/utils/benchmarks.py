@@ -0,0 +1,78 @@
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def temporary_database(verbosity=0):
+    '''
+    Runs the block against a throwaway copy of the schema (the same database
+    the test runner would create), so seeded rows never touch real data.
+    '''
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection.settings_dict['NAME']
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def explain(queryset, tag=''):
+    '''
+    Returns the database's query plan for a queryset. The tag ends up in an SQL
+    comment so the statement is never served from a stale prepared-statement
+    cache after the schema changed (e.g. an index was dropped).
+    '''
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {tag} */', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def time_call(func, repeat=10, warmup=1):
+    '''
+    Calls func repeatedly and returns timing statistics in milliseconds.
+    '''
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    '''
+    Reduces a list of millisecond samples to min/median/p95/p99/max.
+    '''
+    ordered = sorted(samples)
+
+    def percentile(p):
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    return {
+        "count": len(ordered),
+        "min": round(ordered[0], 3),
+        "median": round(statistics.median(ordered), 3),
+        "p95": round(percentile(95), 3),
+        "p99": round(percentile(99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def measure_allocations(func):
+    '''
+    Calls func once under tracemalloc and returns the peak memory it traced, in KiB.
+    '''
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import urlencode
+from rest_framework.response import Response
+
+from core.routers import allow_replica_reads, replica_reads_allowed
+from core.utils.renderers import FastJSONRenderer, PreEncodedJSON, encode_json
+
+
+class ResponseCache:
+    '''
+    Caches the payload of read endpoints under versioned scopes.
+
+    Every scope (e.g. "stones" or "stone:12:comments") owns a version stored
+    in the cache backend itself: the time, in nanoseconds, it was last
+    invalidated. Invalidating a scope moves its version, so entries written
+    under the old version are never read again and simply age out of the
+    backend. This works the same on the local-memory, file and
+    database backends because it never needs to enumerate keys.
+
+    Scopes are invalidated by the post_save/post_delete signals of the
+    models (general/models.py). Writes that send no signals (bulk_create,
+    bulk_update, QuerySet.update(), SQL run outside the ORM) must call
+    invalidate() for the scopes they touch themselves, as
+    stone_content_changed and the image pipeline do; otherwise readers get
+    the old page until API_CACHE_TIMEOUT.
+    '''
+
+    version_prefix = 'scope-version'
+    entry_prefix = 'response-body'
+
+    def __init__(self, alias='api', timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _version_key(self, scope):
+        return f'{self.version_prefix}:{scope}'
+
+    def get_versions(self, scopes):
+        keys = [self._version_key(scope) for scope in scopes]
+        versions = self.backend.get_many(keys)
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            # A time based version guarantees that an evicted one never
+            # brings back entries written under an older version.
+            for key in missing:
+                self.backend.add(key, time.time_ns(), timeout=None)
+            versions.update(self.backend.get_many(missing))
+        return [versions.get(key) for key in keys]
+
+    def build_key(self, request, scopes, versions=None):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        versions = self.get_versions(scopes) if versions is None else versions
+        raw = '|'.join([request.path, query] + [f'{s}={v}' for s, v in zip(scopes, versions)])
+        return f'{self.entry_prefix}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+    def get(self, key):
+        data = self.backend.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        if self.timeout is None:
+            self.backend.set(key, data)
+        else:
+            self.backend.set(key, data, timeout=self.timeout)
+
+    def get_encoded(self, key, coding):
+        '''
+        The compressed body (e.g. coding "br") stored next to an entry; it
+        lives under the same versioned key, so it is invalidated with it.
+        '''
+        return self.backend.get(f'{key}:{coding}')
+
+    def set_encoded(self, key, coding, content):
+        self.set(f'{key}:{coding}', content)
+
+    def invalidate(self, *scopes):
+        now = time.time_ns()
+        self.backend.set_many({self._version_key(scope): now for scope in scopes}, timeout=None)
+
+    def settled(self, versions, seconds):
+        '''
+        Whether none of the versions moved in the last `seconds`, i.e. the
+        replicas have had that long to catch up with the writes behind them.
+        '''
+        newest = max(versions, default=0)
+        return time.time_ns() - newest >= seconds * 1_000_000_000
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": self.backend.__class__.__name__,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def resolve_scopes(scopes, view, request, kwargs):
+    '''
+    Fills in the scopes given to cache_response or conditional_get: format
+    strings take the URL kwargs, callables return a list of scopes.
+    '''
+    resolved = []
+    for scope in scopes:
+        if callable(scope):
+            resolved.extend(scope(view, request, **kwargs))
+        else:
+            resolved.append(scope.format(**kwargs))
+    return resolved
+
+
+def cache_response(*scopes):
+    '''
+    Decorator for APIView.get methods that serves successful responses from
+    response_cache. Scopes are format strings filled with the URL kwargs
+    (e.g. 'stone:{stone_id}:comments') or callables taking
+    (view, request, **kwargs) and returning a list of scopes.
+    The X-Cache response header reports HIT or MISS.
+    A miss reads from a replica only when the client is not pinned to the
+    primary (see ReplicaPinningMiddleware) and none of its scopes was
+    invalidated within REPLICA_STICKY_SECONDS, so a replica still behind a
+    write never has its page stored under the versions that write set. An
+    entry is only stored when the versions did not move during the fill.
+    Entries hold the encoded JSON body, so a hit is served without
+    serializing or encoding anything again; responses whose body is that
+    entry carry its key as compress_cache_key so CompressionMiddleware can
+    cache their compressed bytes too.
+    '''
+
+    def payload(request, content):
+        # compact JSON goes out as stored; other representations re-render the decoded data
+        renderer = getattr(request, 'accepted_renderer', None)
+        if isinstance(renderer, FastJSONRenderer) and renderer.get_indent(request.accepted_media_type, {}) is None:
+            return PreEncodedJSON(content)
+        return PreEncodedJSON(content).data
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            resolved = resolve_scopes(scopes, view, request, kwargs)
+            versions = response_cache.get_versions(resolved)
+            key = response_cache.build_key(request, resolved, versions)
+            content = response_cache.get(key)
+            if content is not None:
+                response = Response(payload(request, content))
+                response['X-Cache'] = 'HIT'
+            else:
+                sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+                replicas = replica_reads_allowed() and response_cache.settled(versions, sticky_seconds)
+                with allow_replica_reads(replicas):
+                    response = method(view, request, *args, **kwargs)
+                if isinstance(response, Response) and response.status_code == 200:
+                    content = encode_json(response.data)
+                    if response_cache.get_versions(resolved) == versions:
+                        response_cache.set(key, content)
+                    response.data = payload(request, content)
+                response['X-Cache'] = 'MISS'
+            if isinstance(response, Response) and isinstance(response.data, PreEncodedJSON):
+                response.compress_cache_key = key
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,209 @@
+import gzip
+import zlib
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+
+def _gzip(data, level=9):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level=11):
+    import brotli
+
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level=19):
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# content-coding: (file suffix, compress function, best level), in the order
+# precompressed static files are preferred; brotli and zstandard are optional
+ENCODERS = {
+    'br': ('.br', _brotli, 11),
+    'zstd': ('.zst', _zstd, 19),
+    'gzip': ('.gz', _gzip, 9),
+}
+for _coding, _module in (('br', 'brotli'), ('zstd', 'zstandard')):
+    if find_spec(_module) is None:
+        del ENCODERS[_coding]
+
+# already compressed formats, not worth another pass
+INCOMPRESSIBLE_EXTENSIONS = frozenset((
+    '.gz', '.br', '.zst', '.zip', '.7z', '.rar', '.bz2', '.xz',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.ico',
+    '.woff', '.woff2', '.mp3', '.mp4', '.webm', '.ogg', '.pdf',
+))
+
+
+def accepted_encodings(header):
+    '''
+    Parses an Accept-Encoding header into {coding: q}; "identity" and "*" are kept as given.
+    '''
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header, available):
+    '''
+    The coding of `available` (in server preference order) the client
+    accepts with the highest q, or None for the identity encoding.
+    '''
+    accepted = accepted_encodings(header)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level):
+        import brotli
+
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk):
+        return self.compressor.process(chunk) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level):
+        import zstandard
+
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        self.flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, chunk):
+        return self.compressor.compress(chunk) + self.compressor.flush(self.flush_block)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+STREAMS = {'gzip': _GzipStream, 'br': _BrotliStream, 'zstd': _ZstdStream}
+
+
+def compress_stream(chunks, coding, level):
+    '''
+    Compresses a streamed body chunk by chunk, flushing after each one so
+    the client still receives every chunk as soon as it is produced.
+    '''
+    stream = STREAMS[coding](level)
+    for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+async def acompress_stream(chunks, coding, level):
+    stream = STREAMS[coding](level)
+    async for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+COMPRESSIBLE_TYPES = _lazy_re_compile(r'^(text/|application/(json|javascript|xml|[\w.+-]+\+(json|xml))|image/svg\+xml)')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    '''
+    Compresses text and JSON responses with the best coding both sides
+    support (COMPRESS_ENCODINGS, in server preference order: zstd, br, gzip)
+    at the fast COMPRESS_LEVELS suited to per-request work. Bodies under
+    COMPRESS_MIN_SIZE bytes, files and already encoded responses are left
+    alone; streamed bodies are compressed as they go. Only GET/HEAD
+    responses are compressed: write endpoints answer with small bodies that
+    echo the request next to tokens, the BREACH pattern.
+
+    Responses served from the response cache (core/utils/cache.py) carry
+    their cache key, and their compressed bytes are cached next to the
+    identity body under the same versioned key, so a hot response is
+    compressed once per coding, not once per request.
+    '''
+
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        if response.has_header('Content-Encoding') or getattr(response, 'file_to_stream', None) is not None:
+            return response
+        if not 200 <= response.status_code < 300 or not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESS_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        offered = [coding for coding in settings.COMPRESS_ENCODINGS if coding in ENCODERS]
+        coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'), offered)
+        if coding is None:
+            return response
+        level = settings.COMPRESS_LEVELS[coding]
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, coding, level)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, coding, level)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.content = self.compressed_content(response, coding, level)
+            response['Content-Length'] = str(len(response.content))
+
+        # the body differs from the identity one; keep validators comparable (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
+
+    def compressed_content(self, response, coding, level):
+        from core.utils.cache import response_cache
+
+        compress = ENCODERS[coding][1]
+        key = getattr(response, 'compress_cache_key', None)
+        if key is None:
+            return compress(response.content, level)
+        content = response_cache.get_encoded(key, coding)
+        if content is None:
+            content = compress(response.content, level)
+            response_cache.set_encoded(key, coding, content)
+        return content
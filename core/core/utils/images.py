@@ -0,0 +1,228 @@
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.dispatch import Signal
+from rest_framework import serializers
+
+
+logger = logging.getLogger('core.images')
+
+# sent with (sender=model, pk, variants) once the variants of a row are stored
+variants_ready = Signal()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_spec():
+    '''
+    The configured sizes, the formats this Pillow build can encode, and the quality.
+    '''
+    from PIL import features
+
+    return {
+        'sizes': {name: list(size) for name, size in settings.IMAGE_VARIANT_SIZES.items()},
+        'formats': [fmt for fmt in settings.IMAGE_VARIANT_FORMATS if features.check(fmt)],
+        'quality': settings.IMAGE_VARIANT_QUALITY,
+    }
+
+
+def variant_folder(data, spec):
+    '''
+    Variants are addressed by the content of the original and the spec they
+    were made with, so the same upload is processed once whatever its name,
+    and changing IMAGE_VARIANT_* never serves stale files.
+    '''
+    digest = hashlib.sha256(data).hexdigest()
+    spec_digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:8]
+    return f'variants/{digest[:2]}/{digest}-{spec_digest}'
+
+
+def render_variants(data, spec):
+    '''
+    Decodes the original once and encodes every size in every format.
+    Runs in a worker process; returns the dimensions and the encoded bytes.
+    '''
+    from PIL import ExifTags, Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        width, height = original.size
+        if original.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8):  # stored rotated by 90 degrees
+            width, height = height, width
+        largest = max(max(width, height) for width, height, _ in spec['sizes'].values())
+        original.draft('RGB', (largest, largest))  # JPEG: decode at the smallest scale that is still large enough
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    result = {'width': width, 'height': height, 'sizes': {}}
+    for name, (width, height, crop) in spec['sizes'].items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        files = {}
+        for fmt in spec['formats']:
+            buffer = io.BytesIO()
+            options = {'method': 4} if fmt == 'webp' else {'speed': 8}
+            resized.save(buffer, fmt.upper(), quality=spec['quality'], **options)
+            files[fmt] = buffer.getvalue()
+        result['sizes'][name] = {'width': resized.width, 'height': resized.height, 'files': files}
+    return result
+
+
+def store_variants(folder, rendered):
+    '''
+    Saves the rendered files and, last, their manifest, which marks the folder complete.
+    '''
+    manifest = {'width': rendered['width'], 'height': rendered['height'], 'sizes': {}}
+    for name, size in rendered['sizes'].items():
+        entry = {'width': size['width'], 'height': size['height']}
+        for fmt, content in size['files'].items():
+            entry[fmt] = default_storage.save(f'{folder}/{name}.{fmt}', ContentFile(content))
+        manifest['sizes'][name] = entry
+    default_storage.save(f'{folder}/manifest.json', ContentFile(json.dumps(manifest).encode()))
+    return manifest
+
+
+def load_manifest(folder):
+    name = f'{folder}/manifest.json'
+    if not default_storage.exists(name):
+        return None
+    with default_storage.open(name, 'rb') as f:
+        return json.load(f)
+
+
+def apply_variants(model, pk, field, source, variants, using=None):
+    '''
+    Stores the variants on the row, unless its image changed in the meantime
+    (source None clears them). An UPDATE sends no post_save, so variants_ready
+    tells the models to drop their caches.
+    '''
+    rows = model.objects.using(using).filter(pk=pk)
+    if source is not None:
+        rows = rows.filter(**{field: source})
+    updated = rows.update(image_variants=variants)
+    if updated:
+        variants_ready.send(sender=model, pk=pk, variants=variants)
+    return updated
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: the server process has threads and open connections
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def submit(*args):
+    global _executor
+    try:
+        return executor().submit(*args)
+    except BrokenProcessPool:
+        # a worker died (e.g. killed for memory); start a fresh pool once
+        with _executor_lock:
+            _executor = None
+        return executor().submit(*args)
+
+
+def build_variants(model, pk, field, source, using=None, background=True, force=False):
+    '''
+    Makes the variants of one row's image, reusing the stored ones of an
+    identical original. With background=True the decoding and encoding run
+    in the process pool and the row is updated when they are done;
+    otherwise everything happens before returning.
+    '''
+    storage = model._meta.get_field(field).storage
+    with storage.open(source, 'rb') as f:
+        data = f.read()
+    spec = variant_spec()
+    folder = variant_folder(data, spec)
+    manifest = None if force else load_manifest(folder)
+    if manifest is not None:
+        return apply_variants(model, pk, field, source, {'source': source, **manifest}, using)
+
+    if not background:
+        manifest = store_variants(folder, render_variants(data, spec))
+        return apply_variants(model, pk, field, source, {'source': source, **manifest}, using)
+
+    future = submit(render_variants, data, spec)
+    future.add_done_callback(partial(_rendered, model, pk, field, source, using, folder))
+    return None
+
+
+def _rendered(model, pk, field, source, using, folder, future):
+    # runs on the pool's management thread
+    try:
+        manifest = store_variants(folder, future.result())
+        apply_variants(model, pk, field, source, {'source': source, **manifest}, using)
+    except Exception:
+        logger.exception("Could not build the image variants of %s %s (%s)", model._meta.label, pk, source)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(instance, field='image', using=None):
+    '''
+    Called from post_save: once the transaction commits, builds the variants
+    of a new or replaced image (IMAGE_PIPELINE "process": in the process
+    pool, "sync": right away) and clears those of a removed one.
+    '''
+    image = getattr(instance, field)
+    stored = instance.image_variants or {}
+    model = type(instance)
+    if not image:
+        if stored:
+            transaction.on_commit(partial(apply_variants, model, instance.pk, field, None, {}, using), using=using, robust=True)
+        return
+    if stored.get('source') == image.name:
+        return
+    background = settings.IMAGE_PIPELINE == 'process'
+    transaction.on_commit(
+        partial(build_variants, model, instance.pk, field, image.name, using, background), using=using, robust=True,
+    )
+
+
+class ImageVariantsField(serializers.Field):
+    '''
+    Read-only URLs of the image variants, e.g.
+    {"thumb": {"width": 160, "height": 160, "webp": "...", "avif": "..."}};
+    null until they are built.
+    '''
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        sizes = (value or {}).get('sizes')
+        if not sizes:
+            return None
+        request = self.context.get('request')
+        result = {}
+        for name, entry in sizes.items():
+            urls = {}
+            for key, item in entry.items():
+                if key in ('width', 'height'):
+                    urls[key] = item
+                    continue
+                url = default_storage.url(item)
+                urls[key] = request.build_absolute_uri(url) if request is not None else url
+            result[name] = urls
+        return result
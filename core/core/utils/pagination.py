@@ -0,0 +1,212 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+
+def cursor_value(value):
+    # exact text forms, which the fields parse back when filtering (no millisecond rounding)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class EnvelopePageNumberPagination(PageNumberPagination):
+    '''
+    Page-number pagination that returns its metadata as a plain dict,
+    so it can be wrapped by success_response like any other payload.
+    '''
+
+    def get_paginated_data(self, data):
+        return {
+            "count": self.page.paginator.count,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        '''
+        Async counterpart of paginate_queryset: the count and the page rows
+        are fetched with the async ORM (acount() and async iteration).
+        '''
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        self.request = request
+        return self.page.object_list
+
+
+class EnvelopeCursorPagination(CursorPagination):
+    '''
+    Keyset (cursor) pagination on the whole ordering. No COUNT(*) is issued
+    and the cost of a page does not depend on how deep the client has
+    scrolled.
+
+    DRF's CursorPagination keys on the first ordering field only and skips
+    the rows sharing its value with an OFFSET, which degrades to an offset
+    scan when most rows share it (e.g. a comment_count of 0). Here the
+    cursor holds the value of every ordering field of the boundary row, and
+    the next page starts right after that tuple: for ('-price', 'id'),
+    price < p OR (price = p AND id > i). The ordering must end with a unique
+    field (id) and its fields must not be NULL (views filter NULLs out).
+    '''
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request, queryset.model)
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = [self.flip(field) for field in self.ordering] if reverse else self.ordering
+
+        # the ordering values are selected explicitly, so .only() never defers them
+        queryset = queryset.annotate(**{
+            f'cursor_{index}': F(field.lstrip('-')) for index, field in enumerate(self.ordering)
+        })
+        if self.cursor is not None:
+            queryset = queryset.filter(self.after(self.cursor.position, reverse))
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def after(self, position, reverse=False):
+        '''
+        The rows that come after the position in the ordering (before it when reverse).
+        '''
+        condition, equal = Q(), Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            condition |= equal & Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, request, model=None):
+        '''
+        The cursor of the request with its position parsed by the ordering
+        fields of the model, or NotFound when it was not one we issued: a
+        value the field rejects would otherwise fail in the database.
+        '''
+        cursor = super().decode_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            position = json.loads(cursor.position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if model is not None:
+            try:
+                position = [self.clean_value(model, field, value) for field, value in zip(self.ordering, position)]
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    @staticmethod
+    def clean_value(model, field, value):
+        if value is None or isinstance(value, (list, dict)):
+            raise ValueError(value)
+        try:
+            model_field = model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:
+            return value
+        # to_python and the range validators, e.g. of the database integer type
+        return model_field.clean(value, None)
+
+    def position(self, row):
+        values = [getattr(row, f'cursor_{index}') for index in range(len(self.ordering))]
+        return json.dumps([cursor_value(value) for value in values])
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.position(self.page[0])))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        '''
+        Async counterpart of paginate_queryset. A cursor page is a single
+        query, run in one thread hop, which is what the async ORM would do.
+        '''
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+
+class PaginationModeMixin:
+    '''
+    Lets an APIView serve page-number pagination by default and cursor
+    pagination when the client asks for it with ?pagination=cursor.
+    Views that support it can also stream the whole list unpaginated
+    with ?stream=1 (see core.utils.responses.streaming_success_response).
+    '''
+
+    pagination_class = None
+    cursor_pagination_class = None
+    pagination_mode_param = 'pagination'
+    stream_param = 'stream'
+    stream_chunk_size = 500
+
+    def is_streaming(self, request):
+        return request.query_params.get(self.stream_param) in ('1', 'true', 'True')
+
+    def get_paginator(self, request):
+        mode = request.query_params.get(self.pagination_mode_param)
+        if mode == 'cursor' and self.cursor_pagination_class is not None:
+            return self.cursor_pagination_class()
+        return self.pagination_class()
+
+    def paginate(self, request, queryset):
+        '''
+        Returns (page, paginator) for the given queryset.
+        '''
+        paginator = self.get_paginator(request)
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return page, paginator
+
+    async def apaginate(self, request, queryset):
+        paginator = self.get_paginator(request)
+        page = await paginator.apaginate_queryset(queryset, request, view=self)
+        return page, paginator
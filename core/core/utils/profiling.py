@@ -0,0 +1,201 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+logger = logging.getLogger('core.profiling')
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestProfile:
+    '''
+    What one request cost: SQL statements and their time, time spent in the
+    view (handler code, mostly serialization, without its queries) and in
+    rendering the response body. Times are in milliseconds.
+    '''
+
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.path
+        self.view = None
+        self.budget = None
+        self.queries = 0
+        self.db_ms = 0.0
+        self.view_ms = 0.0
+        self.render_ms = 0.0
+        self.total_ms = 0.0
+        self.started = time.perf_counter()
+        self._view_started = None
+        self._view_db_ms = 0.0
+        self._render_started = None
+
+    def add_query(self, elapsed_ms):
+        self.queries += 1
+        self.db_ms += elapsed_ms
+
+    def view_started(self):
+        self._view_started = time.perf_counter()
+        self._view_db_ms = self.db_ms
+
+    def view_finished(self):
+        if self._view_started is not None and not self.view_ms:
+            elapsed = (time.perf_counter() - self._view_started) * 1000
+            self.view_ms = max(0.0, elapsed - (self.db_ms - self._view_db_ms))
+
+    def render_started(self):
+        self.view_finished()
+        self._render_started = time.perf_counter()
+
+    def render_finished(self, response):
+        self.render_ms = (time.perf_counter() - self._render_started) * 1000
+        return response
+
+    def finish(self):
+        self.view_finished()
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_ms:.2f};desc="{self.queries} queries"',
+            f'view;dur={self.view_ms:.2f};desc="view and serialization"',
+            f'render;dur={self.render_ms:.2f}',
+            f'total;dur={self.total_ms:.2f}',
+        ])
+
+    def as_dict(self):
+        return {
+            "method": self.method,
+            "path": self.path,
+            "view": self.view,
+            "queries": self.queries,
+            "query_budget": self.budget,
+            "db_ms": round(self.db_ms, 2),
+            "view_ms": round(self.view_ms, 2),
+            "render_ms": round(self.render_ms, 2),
+            "total_ms": round(self.total_ms, 2),
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query((time.perf_counter() - started) * 1000)
+
+
+def install_query_recorder(connection):
+    # the wrapper stays on the connection for its lifetime and is a no-op outside profiled requests
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def profile_new_connection(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+def view_query_budget(view_func, method):
+    '''
+    The budget declared by the view class: query_budget = 4, or a dict by method ({'GET': 3, 'POST': 5}).
+    '''
+    budget = getattr(getattr(view_func, 'view_class', None), 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(method)
+    return budget
+
+
+class RequestProfilingMiddleware:
+    '''
+    Records a RequestProfile for every request and reports it in a
+    Server-Timing header and a JSON log line on the "core.profiling" logger
+    (INFO, or WARNING when over budget).
+
+    The query budget of a view is its query_budget attribute, overridden by
+    QUERY_BUDGETS[url name]. An overrun is logged, or raises
+    QueryBudgetExceeded when QUERY_BUDGET_ACTION is "raise" (as in tests).
+    Queries run while a streaming response is being sent are not counted.
+
+    Queries are recorded by a wrapper installed on every connection when it
+    is opened (the receiver is connected at startup by CoreConfig.ready), so
+    the async ORM, which runs them on the connections of a worker thread,
+    is counted like the sync views.
+    '''
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        profile = RequestProfile(request)
+        return profile, _current_profile.set(profile)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return None
+        match = request.resolver_match
+        profile.view = match.view_name if match else view_func.__name__
+        profile.budget = getattr(settings, 'QUERY_BUDGETS', {}).get(profile.view, view_query_budget(view_func, request.method))
+        profile.view_started()
+        return None
+
+    def process_template_response(self, request, response):
+        # called right before DRF renders the response body
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.render_started()
+            response.add_post_render_callback(profile.render_finished)
+        return response
+
+    def finish(self, profile, token, response):
+        _current_profile.reset(token)
+        profile.finish()
+        response['Server-Timing'] = profile.server_timing()
+        response.request_profile = profile
+
+        line = json.dumps({**profile.as_dict(), "status": response.status_code})
+        if not profile.over_budget:
+            logger.info(line)
+            return response
+        logger.warning(line)
+        if getattr(settings, 'QUERY_BUDGET_ACTION', 'warn') == 'raise':
+            raise QueryBudgetExceeded(
+                f"{profile.method} {profile.path} ({profile.view}) ran {profile.queries} queries, budget {profile.budget}"
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token = self.start(request)
+        return self.finish(profile, token, self.get_response(request))
+
+    async def __acall__(self, request):
+        profile, token = self.start(request)
+        return self.finish(profile, token, await self.get_response(request))
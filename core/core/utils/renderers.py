@@ -0,0 +1,71 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional dependency, the stdlib encoder is used instead
+    orjson = None
+
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_fallback_encoder = JSONEncoder()
+_stdlib_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+
+def _escape_line_separators(content):
+    # same as DRF: keep the output a strict JavaScript subset
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def encode_json(data, fast=True):
+    '''
+    Encodes data to compact UTF-8 JSON bytes, identical to what DRF's
+    JSONRenderer produces. Uses orjson when it is installed (datetimes,
+    UUIDs and dict/list subclasses are encoded natively, anything else such
+    as Decimal goes through DRF's encoder) and the stdlib json module
+    otherwise or when fast is False.
+    '''
+    if fast and orjson is not None:
+        try:
+            return _escape_line_separators(orjson.dumps(data, default=_fallback_encoder.default, option=ORJSON_OPTIONS))
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers wider than 64 bits; the stdlib handles those
+    return _escape_line_separators(_stdlib_encoder.encode(data).encode())
+
+
+class PreEncodedJSON:
+    '''
+    A payload that has already been encoded to JSON bytes (e.g. a cached
+    response body). FastJSONRenderer writes it out as is; .data decodes it
+    for renderers that need the Python structure.
+    '''
+
+    __slots__ = ('content',)
+
+    def __init__(self, content):
+        self.content = content
+
+    @property
+    def data(self):
+        return json.loads(self.content)
+
+
+class FastJSONRenderer(JSONRenderer):
+    '''
+    Drop-in replacement for DRF's JSONRenderer that encodes with orjson when
+    available. Indented or ASCII-only output (e.g. for the browsable API)
+    keeps using the stdlib path, which is not performance sensitive.
+    '''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, PreEncodedJSON):
+            return data.content
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        return encode_json(data)
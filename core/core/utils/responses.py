@@ -1,6 +1,9 @@
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework import status
 
+from core.utils.renderers import encode_json
+
 
 def success_response(message="Operation successful", data=None, status_code=status.HTTP_200_OK):
     return Response({
@@ -24,3 +27,74 @@ def internal_server_error_response(message="Internal Server Error", exception=No
         "message": message,
         "errors": {"detail": str(exception) if exception else "Unexpected error"},
     }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def streaming_success_response(message, items, serializer, chunk_size=500):
+    '''
+    Same envelope as success_response with a list as "data", but written
+    incrementally: rows are read from the database with a chunked iterator
+    and serialized one at a time, so memory stays flat whatever the number
+    of rows. `serializer` is an unbound serializer instance whose
+    to_representation() is applied to every item.
+    The status code is sent before the body, so an error half way through
+    can only abort the connection; validate everything up front.
+    '''
+    if hasattr(items, 'using'):
+        # pick the database now, while request-scoped routing (replica pinning) still applies
+        items = items.using(items.db)
+
+    def stream():
+        yield b'{"status":"success","message":' + encode_json(message) + b',"data":['
+        rows = items.iterator(chunk_size=chunk_size) if hasattr(items, 'iterator') else iter(items)
+        buffer = []
+        for index, item in enumerate(rows):
+            if index:
+                buffer.append(b',')
+            buffer.append(encode_json(serializer.to_representation(item)))
+            if len(buffer) >= 2 * chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+        buffer.append(b']}')
+        yield b''.join(buffer)
+
+    return StreamingHttpResponse(stream(), content_type='application/json')
+
+
+def json_success_response(message="Operation successful", data=None, status_code=status.HTTP_200_OK):
+    '''
+    success_response for plain Django (e.g. async) views that do not go
+    through DRF's renderers: the envelope is encoded here directly.
+    '''
+    payload = {"status": "success", "message": message, "data": data or {}}
+    return HttpResponse(encode_json(payload), status=status_code, content_type='application/json')
+
+
+def json_error_response(message="Something went wrong", errors=None, status_code=status.HTTP_400_BAD_REQUEST):
+    payload = {"status": "error", "message": message, "errors": errors or {}}
+    return HttpResponse(encode_json(payload), status=status_code, content_type='application/json')
+
+
+def async_streaming_success_response(message, queryset, serializer, chunk_size=500):
+    '''
+    Async counterpart of streaming_success_response: rows come from
+    queryset.aiterator(), so under ASGI no worker thread is held while the
+    client reads the body.
+    '''
+    queryset = queryset.using(queryset.db)
+
+    async def stream():
+        yield b'{"status":"success","message":' + encode_json(message) + b',"data":['
+        buffer = []
+        index = 0
+        async for item in queryset.aiterator(chunk_size=chunk_size):
+            if index:
+                buffer.append(b',')
+            buffer.append(encode_json(serializer.to_representation(item)))
+            index += 1
+            if len(buffer) >= 2 * chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+        buffer.append(b']}')
+        yield b''.join(buffer)
+
+    return StreamingHttpResponse(stream(), content_type='application/json')
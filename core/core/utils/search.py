@@ -0,0 +1,233 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+ZWNJ = '\u200c'  # zero-width non-joiner (نیم‌فاصله)
+
+
+PERSIAN_CHARACTERS = str.maketrans({
+    'ي': 'ی',  # Arabic yeh
+    'ى': 'ی',  # Arabic alef maksura
+    'ك': 'ک',  # Arabic kaf
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    ZWNJ: None,
+    '\u200f': None,  # right-to-left mark
+    '\u0640': None,  # tatweel
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+})
+
+DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+TOKEN = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    '''
+    Normalizes Persian/Arabic text so that spelling variants index and match
+    the same way: Arabic yeh/kaf become Persian ones, ZWNJ joins the word
+    (می‌خواهم and میخواهم are the same word), diacritics and tatweel are
+    dropped and digits become ASCII.
+    '''
+    if not text:
+        return ''
+    text = DIACRITICS.sub('', str(text).translate(PERSIAN_CHARACTERS))
+    return ' '.join(text.lower().split())
+
+
+def normalize_document(text):
+    '''
+    normalize_text for indexed documents. Words written with a ZWNJ are
+    indexed joined and also as their parts, so a query matches whether it
+    is typed with a half-space, without one or with a full space.
+    '''
+    text = str(text or '')
+    parts = ' '.join(word.replace(ZWNJ, ' ') for word in text.split() if ZWNJ in word)
+    return normalize_text(f'{text} {parts}' if parts else text)
+
+
+def tokenize(text):
+    return TOKEN.findall(normalize_text(text))
+
+
+class FullTextIndex:
+    '''
+    Inverted index kept in a side table next to a model's table.
+
+    On SQLite it is an FTS5 virtual table ranked with bm25(); on PostgreSQL
+    a tsvector column with a GIN index ranked with ts_rank(). Documents are
+    normalized in Python before they are stored and queries are normalized
+    the same way, so both backends agree on Persian spelling variants.
+    `columns` maps column names to weights (larger is more important) and
+    `build` turns a model instance into a {column: text} dict.
+    '''
+
+    vendors = ('sqlite', 'postgresql')
+    # FTS5 keeps prefix indexes for these lengths; a partially typed last
+    # word is only matched as a prefix while it is covered by one of them.
+    prefix_lengths = (2, 3, 4, 5, 6)
+
+    def __init__(self, table, columns, build):
+        self.table = table
+        self.columns = columns
+        self.build = build
+
+    def is_supported(self, using=None):
+        return connections[using or DEFAULT_DB_ALIAS].vendor in self.vendors
+
+    def _pg_weights(self):
+        ranked = sorted(self.columns, key=self.columns.get, reverse=True)
+        return {column: 'ABCD'[min(position, 3)] for position, column in enumerate(ranked)}
+
+    def create(self, using=None):
+        connection = connections[using or DEFAULT_DB_ALIAS]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                    f"{', '.join(self.columns)}, tokenize='unicode61 remove_diacritics 2', "
+                    f"prefix='{' '.join(map(str, self.prefix_lengths))}')"
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id bigint PRIMARY KEY, document tsvector NOT NULL)")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_document ON {self.table} USING gin (document)")
+
+    def drop(self, using=None):
+        connection = connections[using or DEFAULT_DB_ALIAS]
+        if self.is_supported(using):
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def index(self, pk, instance, using=None):
+        '''
+        Inserts or replaces the document of one row.
+        '''
+        self.index_many([(pk, instance)], using=using)
+
+    def index_many(self, items, using=None):
+        '''
+        Inserts or replaces the documents of several (pk, instance) pairs with
+        one executemany, for bulk paths that bypass the post_save signal.
+        '''
+        connection = connections[using or DEFAULT_DB_ALIAS]
+        if not self.is_supported(using):
+            return
+        rows = []
+        for pk, instance in items:
+            document = self.build(instance)
+            rows.append([pk, *(normalize_document(document.get(column, '')) for column in self.columns)])
+        if not rows:
+            return
+
+        placeholders = ', '.join(['%s'] * len(self.columns))
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (rowid, {', '.join(self.columns)}) VALUES (%s, {placeholders})",
+                    rows,
+                )
+            else:
+                weights = self._pg_weights()
+                vector = ' || '.join(
+                    f"setweight(to_tsvector('simple', %s), '{weights[column]}')" for column in self.columns
+                )
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (id, document) VALUES (%s, {vector}) "
+                    f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document",
+                    rows,
+                )
+
+    def delete(self, pk, using=None):
+        connection = connections[using or DEFAULT_DB_ALIAS]
+        if not self.is_supported(using):
+            return
+        column = 'rowid' if connection.vendor == 'sqlite' else 'id'
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE {column} = %s", [pk])
+
+    def rebuild(self, queryset, chunk_size=2000):
+        '''
+        Re-indexes every row of the queryset, e.g. right after creating the table.
+        '''
+        batch = []
+        for instance in queryset.iterator(chunk_size=chunk_size):
+            batch.append((instance.pk, instance))
+            if len(batch) >= chunk_size:
+                self.index_many(batch, using=queryset.db)
+                batch = []
+        self.index_many(batch, using=queryset.db)
+
+    def _match(self, vendor, tokens):
+        '''
+        The WHERE condition matching every token (a short last one also as a
+        prefix, so partially typed queries work) and its parameter.
+        '''
+        prefix = len(tokens[-1]) <= max(self.prefix_lengths)
+        if vendor == 'sqlite':
+            return f"{self.table} MATCH %s", ' '.join(f'"{token}"' for token in tokens) + (' *' if prefix else '')
+        return "document @@ to_tsquery('simple', %s)", ' & '.join(tokens) + (':*' if prefix else '')
+
+    def search(self, query, limit=20, using=None):
+        '''
+        Returns the primary keys of the best matching rows, best first. Every
+        match is ranked in the database, so the best one is never left out
+        however common the words are.
+        '''
+        connection = connections[using or DEFAULT_DB_ALIAS]
+        tokens = tokenize(query)
+        if not tokens or not self.is_supported(using):
+            return []
+
+        condition, match = self._match(connection.vendor, tokens)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                weights = ', '.join(str(float(weight)) for weight in self.columns.values())
+                cursor.execute(
+                    f"SELECT rowid FROM {self.table} WHERE {condition} "
+                    f"ORDER BY bm25({self.table}, {weights}), rowid DESC LIMIT %s",
+                    [match, limit],
+                )
+            else:
+                cursor.execute(
+                    f"SELECT id FROM {self.table} WHERE {condition} "
+                    f"ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC, id DESC LIMIT %s",
+                    [match, match, limit],
+                )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, query):
+        '''
+        Narrows the queryset to every matching row, unranked and unlimited
+        (e.g. for the admin, which applies its own ordering and pagination).
+        The match is a subquery, so no list of ids goes through Python.
+        '''
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        vendor = connections[queryset.db].vendor
+        condition, match = self._match(vendor, tokens)
+        column = 'rowid' if vendor == 'sqlite' else 'id'
+        return queryset.filter(pk__in=RawSQL(f"SELECT {column} FROM {self.table} WHERE {condition}", [match]))
+
+
+def search_queryset(index, queryset, query, fields, limit=20):
+    '''
+    Runs a ranked full-text search and returns the matching objects in rank
+    order. Databases without a supported index fall back to icontains on
+    the given fields.
+    '''
+    if index.is_supported(queryset.db):
+        ids = index.search(query, limit=limit, using=queryset.db)
+        objects = queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': query})
+    return list(queryset.filter(condition)[:limit])
@@ -0,0 +1,204 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+
+STONE_TYPES = ('igneous', 'sedimentary', 'metamorphic')
+COLORS = ('سفید', 'سیاه', 'خاکستری', 'قرمز', 'سبز', 'کرم', 'قهوه‌ای')
+NAMES = ('گرانیت', 'مرمر', 'تراورتن', 'چینی', 'اونیکس', 'مرمریت', 'بازالت', 'کوارتزیت')
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    '''
+    Temporarily turns off auto_now/auto_now_add on the given models so seeded
+    rows can carry spread-out timestamps instead of all sharing "now".
+    '''
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, objects, batch_size=5000):
+    '''
+    Inserts a (possibly lazy) iterable of unsaved instances in fixed-size batches,
+    so memory stays bounded whatever the number of rows.
+    '''
+    batch = []
+    count = 0
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            count += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        count += len(batch)
+    return count
+
+
+def _timestamp(rng, now, days=365):
+    return now - timedelta(seconds=rng.randint(0, days * 24 * 3600))
+
+
+def seed_users(count, rng=None, batch_size=5000):
+    '''
+    Creates `count` users with an unusable password plus their profiles.
+    '''
+    from accounts.models import User, Profile
+
+    rng = rng or random.Random(0)
+    password = make_password(None)
+    start = User.objects.count()
+    bulk_insert(User, (
+        User(email=f'user{start + i}@example.com', password=password)
+        for i in range(count)
+    ), batch_size)
+    user_ids = list(User.objects.order_by('-id').values_list('id', flat=True)[:count])
+    bulk_insert(Profile, (
+        Profile(user_id=user_id, first_name='کاربر', last_name=str(user_id))
+        for user_id in user_ids
+    ), batch_size)
+    return user_ids
+
+
+def seed_stones(count, comments_per_stone=0, faqs_per_stone=0, rng=None, batch_size=5000):
+    '''
+    Creates `count` stones, each with the given number of comments and FAQs.
+    Bulk inserts send no signals, so the activity counters and the search
+    index of the new stones are filled in afterwards. Returns their ids.
+    '''
+    from general.activity import recount_stones
+    from general.models import Stone, StoneComment, StoneFAQ
+    from general.search import stone_search_index
+
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    with explicit_timestamps(Stone, StoneComment, StoneFAQ):
+        def stones():
+            for i in range(count):
+                created = _timestamp(rng, now)
+                yield Stone(
+                    name=f'{rng.choice(NAMES)} {i}',
+                    stone_type=rng.choice(STONE_TYPES),
+                    description='سنگ ساختمانی مقاوم ' * rng.randint(5, 40),
+                    main_color=rng.choice(COLORS),
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        bulk_insert(Stone, stones(), batch_size)
+        stone_ids = list(Stone.objects.order_by('-id').values_list('id', flat=True)[:count])
+
+        bulk_insert(StoneComment, (
+            StoneComment(
+                stone_id=stone_id,
+                author_name=f'نویسنده {j}',
+                text='نظر درباره کیفیت این سنگ ' * rng.randint(1, 10),
+                created_at=_timestamp(rng, now),
+            )
+            for stone_id in stone_ids for j in range(comments_per_stone)
+        ), batch_size)
+
+        bulk_insert(StoneFAQ, (
+            StoneFAQ(
+                stone_id=stone_id,
+                question=f'سوال شماره {j} درباره این سنگ؟',
+                answer='پاسخ کارشناس' if rng.random() < 0.6 else None,
+                created_at=_timestamp(rng, now),
+                updated_at=now,
+            )
+            for stone_id in stone_ids for j in range(faqs_per_stone)
+        ), batch_size)
+
+    if stone_ids:
+        seeded = Stone.objects.filter(pk__range=(min(stone_ids), max(stone_ids)))
+        recount_stones(seeded, StoneComment, StoneFAQ)
+        stone_search_index.rebuild(seeded)
+    return stone_ids
+
+
+def seed_products(count, rng=None, batch_size=5000):
+    '''
+    Creates `count` product stones, indexed for search, and returns their ids.
+    '''
+    from products.models import ProductStone
+    from products.search import product_stone_search_index
+
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    with explicit_timestamps(ProductStone):
+        def products():
+            for i in range(count):
+                created = _timestamp(rng, now)
+                yield ProductStone(
+                    name=f'{rng.choice(NAMES)} {i}',
+                    scientific_name=f'Lapis {i}',
+                    stone_type=rng.choice(STONE_TYPES),
+                    colors='، '.join(rng.sample(COLORS, 2)),
+                    hardness=Decimal(rng.randint(10, 100)) / 10,
+                    density=Decimal(rng.randint(200, 400)) / 100,
+                    description='توضیحات کامل محصول ' * rng.randint(20, 80),
+                    applications='نما، کف، پله',
+                    extraction_sites='اصفهان، یزد',
+                    price_per_kg=Decimal(rng.randint(1000, 100000)) / 100,
+                    available_quantity=rng.randint(0, 500),
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        bulk_insert(ProductStone, products(), batch_size)
+    product_ids = list(ProductStone.objects.order_by('-id').values_list('id', flat=True)[:count])
+    if product_ids:
+        product_stone_search_index.rebuild(ProductStone.objects.filter(pk__range=(min(product_ids), max(product_ids))))
+    return product_ids
+
+
+def seed_orders(count, user_ids, product_ids, items_per_order=3, rng=None, batch_size=5000):
+    '''
+    Creates `count` orders spread over the given users, each with a few items,
+    and returns the ids of the new orders.
+    '''
+    from products.models import Order, OrderItem
+
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    statuses = [choice for choice, _ in Order.STATUS_CHOICES]
+    with explicit_timestamps(Order):
+        def orders():
+            for _ in range(count):
+                created = _timestamp(rng, now)
+                yield Order(
+                    user_id=rng.choice(user_ids),
+                    status=rng.choice(statuses),
+                    total_price=0,
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        bulk_insert(Order, orders(), batch_size)
+    order_ids = list(Order.objects.order_by('-id').values_list('id', flat=True)[:count])
+
+    bulk_insert(OrderItem, (
+        OrderItem(
+            order_id=order_id,
+            product_id=rng.choice(product_ids),
+            quantity=rng.randint(1, 20),
+            price_per_unit=Decimal(rng.randint(1000, 100000)) / 100,
+        )
+        for order_id in order_ids for _ in range(items_per_order)
+    ), batch_size)
+    return order_ids
@@ -0,0 +1,234 @@
+import mimetypes
+import os
+import posixpath
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from core.utils.compression import ENCODERS, INCOMPRESSIBLE_EXTENSIONS, negotiate
+
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def is_compressible(name):
+    return os.path.splitext(name)[1].lower() not in INCOMPRESSIBLE_EXTENSIONS
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    '''
+    Manifest storage (content-hashed names, e.g. app.3f2a1b.css) that also
+    writes a .br and a .gz copy of every compressible file next to it, at the
+    highest level, once per collectstatic, so serving never compresses.
+    Copies that would not be smaller are skipped.
+    '''
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if not is_compressible(name) or self.size(name) < settings.STATIC_COMPRESS_MIN_SIZE:
+                continue
+            with self.open(name) as f:
+                data = f.read()
+            for suffix, compress, level in ENCODERS.values():
+                compressed = compress(data, level)
+                if len(compressed) < len(data):
+                    self._save(f'{name}{suffix}', ContentFile(compressed))
+                    yield name, f'{name}{suffix}', True
+
+
+@lru_cache(maxsize=1)
+def hashed_static_names():
+    # the manifest only changes with a deploy, i.e. a restart
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+class FileRange:
+    '''
+    The [start, start + length) slice of an open file. Keeps fileno() and
+    tell() so a WSGI server's file_wrapper can still sendfile() exactly that
+    slice (gunicorn sends Content-Length bytes from tell()).
+    '''
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    '''
+    (start, length) of a single "bytes=" range, None to send the whole file
+    (no or unsupported header, e.g. several ranges), or False when the range
+    cannot be satisfied.
+    '''
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:  # suffix range: the last N bytes
+        length = min(int(last), size)
+        return (size - length, length) if length else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end - start + 1
+
+
+def range_applies(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def serve_file(request, root, path, kind, cache_control, precompressed=False):
+    '''
+    Serves root/path like a front web server would: ETag / Last-Modified
+    with 304 answers, single byte ranges (206, 416), the .br/.gz copy the
+    client accepts, and the given Cache-Control.
+
+    The body is the open file itself, so WSGI servers with a file_wrapper
+    (gunicorn, uWSGI) send it with sendfile() instead of reading it into
+    worker memory. With SENDFILE_HEADER set ("X-Accel-Redirect" for nginx,
+    "X-Sendfile" for Apache/lighttpd) the app only checks and describes the
+    file and the proxy sends the bytes.
+    '''
+    try:
+        full_path = safe_join(root, path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    encoding = None
+    range_header = request.META.get('HTTP_RANGE')
+    offered = [coding for coding, (suffix, _, _) in ENCODERS.items()
+               if os.path.isfile(full_path + suffix)] if precompressed else []
+    if offered and not range_header:  # byte ranges always refer to the identity body
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'), offered)
+    if encoding:
+        full_path += ENCODERS[encoding][0]
+        path += ENCODERS[encoding][0]
+
+    stat = os.stat(full_path)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}')
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = file_response(request, full_path, posixpath.join(kind, path), stat, etag, content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if offered:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def file_response(request, full_path, internal_name, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    if request.META.get('HTTP_RANGE') and range_applies(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    sendfile_header = settings.SENDFILE_HEADER
+    if sendfile_header:
+        response = HttpResponse(content_type=content_type)
+        if sendfile_header.lower() == 'x-accel-redirect':
+            response[sendfile_header] = settings.SENDFILE_URL_PREFIX.rstrip('/') + '/' + internal_name
+        else:
+            response[sendfile_header] = full_path
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(FileRange(file, start, length), content_type=content_type, status=206)
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{start + length - 1}/{size}'
+    response.block_size = settings.FILE_BLOCK_SIZE
+    if request.method == 'HEAD':
+        response.streaming_content = []
+        file.close()
+    return response
+
+
+def serve_static(request, path):
+    '''
+    Collected static files. Content-hashed names are cached for a year as
+    immutable; others are revalidated with their ETag. In DEBUG, files not
+    collected yet are found in the apps like runserver does.
+    '''
+    root = settings.STATIC_ROOT
+    if settings.DEBUG and not os.path.isfile(os.path.join(root, path)):
+        found = finders.find(path)
+        if not found:
+            raise Http404
+        root, path = os.path.dirname(found), os.path.basename(found)
+    cache_control = IMMUTABLE if path in hashed_static_names() else 'no-cache'
+    return serve_file(request, root, path, 'static', cache_control, precompressed=True)
+
+
+def serve_media(request, path):
+    '''
+    Uploaded files. Image variants are content-addressed, hence immutable;
+    originals may be replaced under the same name and get MEDIA_CACHE_CONTROL.
+    '''
+    cache_control = IMMUTABLE if path.startswith('variants/') else settings.MEDIA_CACHE_CONTROL
+    return serve_file(request, settings.MEDIA_ROOT, path, 'media', cache_control)
+
+
+def file_urlpatterns():
+    '''
+    STATIC_URL and MEDIA_URL routes for running without a front web server
+    (SERVE_FILES); behind one, let it serve both locations instead.
+    '''
+    if not settings.SERVE_FILES:
+        return []
+    return [
+        re_path(rf'^{re.escape(prefix.lstrip("/"))}(?P<path>.+)$', view)
+        for prefix, view in ((settings.STATIC_URL, serve_static), (settings.MEDIA_URL, serve_media))
+        if prefix and '://' not in prefix
+    ]
@@ -0,0 +1,27 @@
+from django.core.cache import caches
+from django.test import override_settings
+
+
+class QueryBudgetTestMixin:
+    '''
+    For API tests: every cache starts empty, so requests take their most
+    expensive path, and any request that exceeds its view's query budget
+    fails. assertWithinQueryBudget also checks that the view has a budget.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(QUERY_BUDGET_ACTION='raise'))
+
+    def setUp(self):
+        super().setUp()
+        for cache in caches.all():
+            cache.clear()
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        profile = response.request_profile
+        budget = profile.budget if budget is None else budget
+        self.assertIsNotNone(budget, f"{profile.view} has no query budget")
+        self.assertLessEqual(profile.queries, budget, f"{profile.method} {profile.path} ran {profile.queries} queries")
+        return profile
@@ -0,0 +1,139 @@
+import math
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections.abc import Mapping
+
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    '''
+    "5/min" -> (5, 60). Same format as DRF's DEFAULT_THROTTLE_RATES; None means unlimited.
+    '''
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    '''
+    Token buckets kept in a Django cache alias ("throttle" by default).
+
+    A bucket is a (tokens, updated_at) pair, so a check is one get and at
+    most one set whatever the rate, unlike DRF's sliding log which keeps a
+    timestamp per request. Tokens refill continuously at capacity/period per
+    second; a full bucket is never stored, its entry simply expires.
+
+    Updates are serialized per process. With a shared backend (db, redis)
+    two processes may consume the same token at the same instant, so a
+    client can exceed its rate by at most one request per process.
+    '''
+
+    def __init__(self, alias='throttle'):
+        self.alias = alias
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def consume(self, key, capacity, period, now=None):
+        '''
+        Takes a token from the bucket; returns (allowed, seconds until the next token).
+        '''
+        now = time.time() if now is None else now
+        refill_rate = capacity / period
+        with self._lock:
+            state = self.backend.get(key)
+            tokens, updated_at = state if state else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            if tokens < 1:
+                return False, (1 - tokens) / refill_rate
+            tokens -= 1
+            self.backend.set(key, (tokens, now), timeout=math.ceil((capacity - tokens) / refill_rate) + 1)
+        return True, 0.0
+
+    def reset(self, key):
+        self.backend.delete(key)
+
+
+bucket_store = TokenBucketStore()
+
+
+class TokenBucketThrottle(BaseThrottle, ABC):
+    '''
+    Base for the write-endpoint throttles. The rate comes from
+    DEFAULT_THROTTLE_RATES under the view's throttle_scope (plus
+    scope_suffix) and is read as a bucket of that many requests that refills
+    over the period, e.g. "5/min" allows a burst of 5 and then one request
+    every 12 seconds. Safe methods are never throttled.
+
+    DRF runs throttles before the handler, so a rejected request costs one
+    cache lookup: no serializer, query or password hash.
+    '''
+
+    store = bucket_store
+    scope_suffix = ''
+
+    def get_scope(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        return f'{scope}{self.scope_suffix}' if scope else None
+
+    @abstractmethod
+    def get_ident_key(self, request, view):
+        '''
+        The bucket key of the request, or None to let it through unthrottled.
+        '''
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if request.method in SAFE_METHODS:
+            return True
+        scope = self.get_scope(view)
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope)) if scope else None
+        ident = self.get_ident_key(request, view) if rate else None
+        if ident is None:
+            return True
+
+        allowed, self.retry_after = self.store.consume(f'throttle:{scope}:{ident}', *rate)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    '''
+    One bucket per client IP: REMOTE_ADDR, or with NUM_PROXIES set the
+    address those trusted proxies put in X-Forwarded-For (as DRF's throttles).
+    '''
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailTokenBucketThrottle(TokenBucketThrottle):
+    '''
+    One bucket per email in the request body, whatever IP it comes from,
+    e.g. to slow down password guessing for one account from many
+    addresses. Uses the "<scope>_email" rate.
+    '''
+
+    scope_suffix = '_email'
+
+    def get_ident_key(self, request, view):
+        # a JSON array or scalar body has no email; the serializer rejects it with a 400
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return email.strip().lower()
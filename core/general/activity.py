@@ -0,0 +1,46 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+COUNTER_FIELDS = ('comment_count', 'faq_count', 'answered_faq_count', 'last_comment_at')
+
+
+def activity_expressions(comment_model, faq_model):
+    '''
+    The true value of every activity counter of a stone, as correlated
+    subqueries over the given comment and FAQ models (historical models
+    inside migrations).
+    '''
+    def count(queryset):
+        rows = queryset.filter(stone=OuterRef('pk')).order_by().values('stone').annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(rows), 0)
+
+    return {
+        'comment_count': count(comment_model.objects.all()),
+        'faq_count': count(faq_model.objects.all()),
+        'answered_faq_count': count(faq_model.objects.exclude(answer__isnull=True).exclude(answer='')),
+        'last_comment_at': Subquery(
+            comment_model.objects.filter(stone=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+        ),
+    }
+
+
+def drifted_stones(stones, comment_model, faq_model):
+    '''
+    The stones of the queryset whose stored counters differ from the real ones.
+    '''
+    actual = {f'actual_{field}': expression for field, expression in activity_expressions(comment_model, faq_model).items()}
+    in_sync = Q()
+    for field in COUNTER_FIELDS:
+        same = Q(**{field: F(f'actual_{field}')})
+        if field == 'last_comment_at':
+            same |= Q(last_comment_at__isnull=True, actual_last_comment_at__isnull=True)
+        in_sync &= same
+    return stones.annotate(**actual).exclude(in_sync)
+
+
+def recount_stones(stones, comment_model, faq_model):
+    '''
+    Recomputes the counters of the given stones with a single UPDATE; returns the number of rows.
+    '''
+    return stones.update(**activity_expressions(comment_model, faq_model))
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Stone, StoneComment, StoneFAQ 
+from .search import stone_search_index
 
 @admin.register(Stone)
 class StoneAdmin(admin.ModelAdmin):
@@ -7,6 +8,12 @@ class StoneAdmin(admin.ModelAdmin):
     search_fields = ('name', 'stone_type', 'main_color')
     list_filter = ('stone_type',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # use the full-text index instead of icontains table scans when the database supports it
+        if not search_term or not stone_search_index.is_supported(queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        return stone_search_index.filter(queryset, search_term), False
+
 @admin.register(StoneComment)
 class StoneCommentAdmin(admin.ModelAdmin):
     list_display = ('author_name', 'stone', 'created_at')
@@ -0,0 +1,67 @@
+from general.models import StoneComment, StoneFAQ
+from .serializers import StoneCommentSerializer, StoneFAQSerializer
+from .views import StandardResultsSetPagination, StoneCursorPagination, CommentsListPagination, FAQListPagination, StoneListMixin
+from core.utils.async_views import AsyncReadView
+from core.utils.pagination import PaginationModeMixin
+from core.utils.responses import json_success_response, async_streaming_success_response
+
+
+class AsyncStoneListView(StoneListMixin, PaginationModeMixin, AsyncReadView):
+    '''
+    Async variant of the stone list (GET only): same fields, expand, search,
+    pagination modes and ?stream=1 as StoneListCreateView.
+    '''
+    pagination_class = StandardResultsSetPagination
+    cursor_pagination_class = StoneCursorPagination
+    query_budget = 4  # count, page, and the comments and faqs when expanded
+
+    async def get(self, request):
+        selected_fields = self.get_selected_fields(request)
+        stones = self.filter_queryset(request, self.get_queryset(selected_fields))
+        if self.is_streaming(request):
+            return async_streaming_success_response(
+                "لیست سنگ‌ها با موفقیت دریافت شد.", stones, self.get_list_serializer(selected_fields),
+                chunk_size=self.stream_chunk_size,
+            )
+
+        page, paginator = await self.apaginate(request, stones)
+        serializer = self.get_list_serializer(selected_fields, page)
+        return json_success_response(message="لیست سنگ‌ها با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
+
+
+class AsyncStoneCommentListView(PaginationModeMixin, AsyncReadView):
+    '''
+    Async variant of the comment list of a Stone (paginated or ?stream=1, newest first)
+    '''
+    ordering_by = ('-created_at', '-id')
+    pagination_class = CommentsListPagination
+    query_budget = 2
+
+    async def get(self, request, stone_id):
+        comments = StoneComment.objects.filter(stone_id=stone_id).order_by(*self.ordering_by)
+        if self.is_streaming(request):
+            return async_streaming_success_response(
+                "نظرات با موفقیت دریافت شد.", comments, StoneCommentSerializer(), chunk_size=self.stream_chunk_size,
+            )
+        page, paginator = await self.apaginate(request, comments)
+        serializer = StoneCommentSerializer(page, many=True)
+        return json_success_response(message="نظرات با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
+
+
+class AsyncStoneFAQListView(PaginationModeMixin, AsyncReadView):
+    '''
+    Async variant of the FAQ list of a Stone (paginated or ?stream=1)
+    '''
+    ordering_by = ('-created_at', '-id')
+    pagination_class = FAQListPagination
+    query_budget = 2
+
+    async def get(self, request, stone_id):
+        faqs = StoneFAQ.objects.filter(stone_id=stone_id).order_by(*self.ordering_by)
+        if self.is_streaming(request):
+            return async_streaming_success_response(
+                "سوالات با موفقیت دریافت شد.", faqs, StoneFAQSerializer(), chunk_size=self.stream_chunk_size,
+            )
+        page, paginator = await self.apaginate(request, faqs)
+        serializer = StoneFAQSerializer(page, many=True)
+        return json_success_response(message="سوالات با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
@@ -1,5 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
-from general.models import Stone, StoneComment, StoneFAQ
+from rest_framework.exceptions import ValidationError
+from core.utils.images import ImageVariantsField
+from general.models import Stone, StoneComment, StoneFAQ, added_content_counters, stone_content_changed
 
 
 class StoneCommentSerializer(serializers.ModelSerializer):
@@ -35,13 +38,141 @@ class StoneFAQSerializer(serializers.ModelSerializer):
         }
 
 
+class StoneContentBatchSerializer(serializers.ListSerializer):
+    '''
+    Creates a JSON array of comments or FAQs (of any stones) in one pass and
+    keeps the valid items. Validation only fails as a whole when the payload
+    is unusable (not a list, empty, more than max_length items); invalid
+    items are collected in item_errors instead. The stones of all items are
+    checked with one query and save() inserts the valid items with
+    bulk_create. Bulk inserts send no post_save, so the caches and activity
+    counters of the touched stones are refreshed with one UPDATE for the
+    whole batch.
+    '''
+
+    default_max_length = 1000
+    insert_batch_size = 500
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', self.default_max_length)
+        kwargs.setdefault('allow_empty', False)
+        super().__init__(*args, **kwargs)
+        self.item_errors = {}
+        self.valid_indexes = []
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise ValidationError({'non_field_errors': ["یک آرایه از موارد ارسال کنید."]})
+        if not data:
+            raise ValidationError({'non_field_errors': ["آرایه ارسالی خالی است."]})
+        if len(data) > self.max_length:
+            raise ValidationError({'non_field_errors': [f"حداکثر {self.max_length} مورد در هر درخواست مجاز است."]})
+
+        self.item_errors = {}
+        items = []
+        for index, item in enumerate(data):
+            try:
+                items.append((index, self.child.run_validation(item)))
+            except ValidationError as exc:
+                self.item_errors[index] = exc.detail
+
+        stone_ids = {attrs['stone_id'] for _, attrs in items}
+        existing = set(Stone.objects.filter(pk__in=stone_ids).values_list('pk', flat=True))
+        self.valid_indexes = []
+        valid = []
+        for index, attrs in items:
+            if attrs['stone_id'] in existing:
+                self.valid_indexes.append(index)
+                valid.append(attrs)
+            else:
+                self.item_errors[index] = {'stone': ["سنگ مورد نظر یافت نشد."]}
+        return valid
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objects = [model(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=self.insert_batch_size)
+            if objects:
+                relation = model._meta.get_field('stone').remote_field.related_name
+                stone_ids = {obj.stone_id for obj in objects}
+                stone_content_changed(stone_ids, relation, **added_content_counters(relation, objects))
+        return objects
+
+    @property
+    def results(self):
+        '''
+        Outcome of every submitted item, in request order: 201 with the created
+        object or 400 with its errors.
+        '''
+        created = dict(zip(self.valid_indexes, self.instance or []))
+        results = []
+        for index in sorted(created.keys() | self.item_errors.keys()):
+            if index in created:
+                results.append({'index': index, 'status': 201, 'data': self.child.to_representation(created[index])})
+            else:
+                results.append({'index': index, 'status': 400, 'errors': self.item_errors[index]})
+        return results
+
+
+class StoneCommentBatchItemSerializer(StoneCommentSerializer):
+    '''
+    A comment inside a batch; the stone is a plain id, checked for the whole batch at once
+    '''
+    stone = serializers.IntegerField(min_value=1, source='stone_id')
+
+    class Meta(StoneCommentSerializer.Meta):
+        list_serializer_class = StoneContentBatchSerializer
+
+
+class StoneFAQBatchItemSerializer(StoneFAQSerializer):
+    '''
+    An FAQ inside a batch; the stone is a plain id, checked for the whole batch at once
+    '''
+    stone = serializers.IntegerField(min_value=1, source='stone_id')
+
+    class Meta(StoneFAQSerializer.Meta):
+        list_serializer_class = StoneContentBatchSerializer
+
+
+class StoneSummarySerializer(serializers.ModelSerializer):
+    '''
+    Compact Stone representation used by listings (no nested relations, no description).
+    Only the small image variants are referenced, never the original upload.
+    '''
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = Stone
+        fields = [
+            'id',
+            'name',
+            'stone_type',
+            'main_color',
+            'image_variants',
+            'comment_count',
+            'faq_count',
+            'answered_faq_count',
+            'last_comment_at',
+        ]
+
+
 class StoneSerializer(serializers.ModelSerializer):
     '''
-    Serializer for creating and listing Stones along with their comments and FAQs
+    Serializer for creating and listing Stones along with their comments and FAQs.
+    Accepts an optional `fields` argument to render only a subset of its fields.
     '''
     comments = StoneCommentSerializer(many=True, read_only=True)
     faqs = StoneFAQSerializer(many=True, read_only=True)
-    
+    image_variants = ImageVariantsField()
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
 
     class Meta:
         model = Stone
@@ -52,6 +183,11 @@ class StoneSerializer(serializers.ModelSerializer):
             'description',
             'main_color',
             'image',
+            'image_variants',
+            'comment_count',
+            'faq_count',
+            'answered_faq_count',
+            'last_comment_at',
             'comments',
             'faqs',
         ]
@@ -1,13 +1,24 @@
 from django.urls import path
-from .views import StoneListCreateView, StoneCommentListCreateView, StoneFAQListCreateView, StoneFAQAnswerView
+from .views import (
+    StoneListCreateView, StoneCommentListCreateView, StoneFAQListCreateView, StoneFAQAnswerView, CacheStatsView, StoneSearchView,
+    StoneCommentBatchCreateView, StoneFAQBatchCreateView,
+)
+from .async_views import AsyncStoneListView, AsyncStoneCommentListView, AsyncStoneFAQListView
 
 app_name = "general"
 
 urlpatterns = [
     path('stones/', StoneListCreateView.as_view(), name='stone-list-create'), # لیست و ایجاد سنگ‌ها
+    path('stones/search/', StoneSearchView.as_view(), name='stone-search'), # جستجوی متنی سنگ‌ها
     path('stones/<int:stone_id>/comments/', StoneCommentListCreateView.as_view(), name='stone-comments'), # لیست و ایجاد نظرات سنگ‌ها
     path('stones/<int:stone_id>/faqs/', StoneFAQListCreateView.as_view(), name='stone-faqs'), # لیست و ایجاد سوالات متداول سنگ‌ها
+    path('comments/batch/', StoneCommentBatchCreateView.as_view(), name='comments-batch'), # ثبت گروهی نظرات
+    path('faqs/batch/', StoneFAQBatchCreateView.as_view(), name='faqs-batch'), # ثبت گروهی سوالات متداول
     path('faqs/<int:pk>/answer/', StoneFAQAnswerView.as_view(), name='answer-faq'), # پاسخ به سوالات متداول سنگ‌ها
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'), # آمار کش پاسخ‌ها
+    path('async/stones/', AsyncStoneListView.as_view(), name='async-stone-list'), # لیست سنگ‌ها (async)
+    path('async/stones/<int:stone_id>/comments/', AsyncStoneCommentListView.as_view(), name='async-stone-comments'), # لیست نظرات سنگ‌ها (async)
+    path('async/stones/<int:stone_id>/faqs/', AsyncStoneFAQListView.as_view(), name='async-stone-faqs'), # لیست سوالات متداول سنگ‌ها (async)
 
 ]
     
\ No newline at end of file
@@ -1,33 +1,172 @@
 from rest_framework.views import APIView
 from rest_framework.generics import UpdateAPIView
 from rest_framework.permissions import AllowAny, IsAdminUser
-from rest_framework.pagination import PageNumberPagination
 from rest_framework import status
+from rest_framework.exceptions import APIException
+from django.db.models import Prefetch, Q
 from general.models import Stone, StoneComment, StoneFAQ
-from .serializers import StoneSerializer, StoneCommentSerializer, StoneFAQSerializer
-from core.utils.responses import success_response, error_response, internal_server_error_response
+from .serializers import (
+    StoneSerializer, StoneSummarySerializer, StoneCommentSerializer, StoneFAQSerializer,
+    StoneCommentBatchItemSerializer, StoneFAQBatchItemSerializer,
+)
+from core.utils.responses import success_response, error_response, internal_server_error_response, streaming_success_response
+from core.utils.pagination import EnvelopePageNumberPagination, EnvelopeCursorPagination, PaginationModeMixin
+from core.utils.cache import cache_response, response_cache
+from core.utils.conditional import conditional_get
+from core.utils.search import search_queryset
+from core.utils.throttling import IPTokenBucketThrottle
+from general.search import stone_search_index
 
 
-class StandardResultsSetPagination(PageNumberPagination):
+def stone_list_scopes(view, request):
+    return view.get_cache_scopes(request)
+
+
+class StandardResultsSetPagination(EnvelopePageNumberPagination):
     page_size = 3
     page_size_query_param = 'page_size'
     max_page_size = 10   
 
 
-class StoneListCreateView(APIView):
+class StoneCursorPagination(EnvelopeCursorPagination):
     '''
-    API view to list all Stones or create a new one
+    Keyset pagination whose ordering is chosen by the view (see StoneListMixin.orderings)
     '''
-    
-    permission_classes = (AllowAny,)
+    page_size = 3
+    page_size_query_param = 'page_size'
+    max_page_size = 10
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        return view.get_ordering(request)
+
+
+def split_query_param(request, name):
+    '''
+    Parses a comma separated query parameter (e.g. ?expand=comments,faqs) into a list.
+    '''
+    value = request.query_params.get(name, '')
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class StoneListMixin:
+    '''
+    Query building shared by the sync and async stone lists: by default the
+    compact summary representation; ?fields=... picks columns and
+    ?expand=comments,faqs adds the nested relations, which are then
+    prefetched in one query each. ?search= filters by name and type and
+    ?min_comments= / ?min_answered_faqs= by the activity counters, which,
+    like ?ordering=, need no join with comments or FAQs.
+    '''
+
     search_filter = ('name', 'stone_type')
-    ordering_by = ('-created_at',)
-    PageNumberPagination = StandardResultsSetPagination
+    orderings = {
+        '-id': ('-id',),
+        'id': ('id',),
+        '-comment_count': ('-comment_count', '-id'),
+        '-answered_faq_count': ('-answered_faq_count', '-id'),
+        '-last_comment_at': ('-last_comment_at', '-id'),
+    }
+    default_ordering = '-id'
+    counter_filters = {
+        'min_comments': 'comment_count',
+        'min_answered_faqs': 'answered_faq_count',
+    }
+    expandable_fields = {
+        'comments': lambda: Prefetch('comments', queryset=StoneComment.objects.order_by('-created_at')),
+        'faqs': lambda: Prefetch('faqs', queryset=StoneFAQ.objects.order_by('id')),
+    }
+
+    def get_selected_fields(self, request):
+        '''
+        Returns the list of StoneSerializer fields requested by the client,
+        or None when the plain summary representation should be used.
+        '''
+        available = StoneSerializer.Meta.fields
+        fields = [f for f in split_query_param(request, 'fields') if f in available]
+        expand = [f for f in split_query_param(request, 'expand') if f in self.expandable_fields]
+        if not fields and not expand:
+            return None
+
+        selected = set(fields or StoneSummarySerializer.Meta.fields) | set(expand) | {'id'}
+        return [f for f in available if f in selected]
+
+    def get_ordering(self, request):
+        return self.orderings.get(request.query_params.get('ordering'), self.orderings[self.default_ordering])
+
+    def get_queryset(self, selected_fields=None):
+        if selected_fields is None:
+            return Stone.objects.only(*StoneSummarySerializer.Meta.fields)
+
+        columns = [f for f in selected_fields if f not in self.expandable_fields]
+        prefetches = [self.expandable_fields[f]() for f in selected_fields if f in self.expandable_fields]
+        return Stone.objects.only(*columns).prefetch_related(*prefetches)
+
+    def get_cache_scopes(self, request):
+        '''
+        The list depends on the stones themselves and on every relation it expands.
+        '''
+        selected_fields = self.get_selected_fields(request) or []
+        return ['stones'] + [f'stones:{f}' for f in selected_fields if f in self.expandable_fields]
+
+    def filter_queryset(self, request, queryset):
+        '''
+        Applies the query string filters and the ordering; malformed counter filters are ignored.
+        '''
+        search = request.query_params.get('search', '').strip()
+        if search:
+            condition = Q()
+            for field in self.search_filter:
+                condition |= Q(**{f'{field}__icontains': search})
+            queryset = queryset.filter(condition)
+
+        for param, field in self.counter_filters.items():
+            value = request.query_params.get(param, '')
+            if value.isdigit():
+                queryset = queryset.filter(**{f'{field}__gte': int(value)})
+
+        ordering = self.get_ordering(request)
+        if ordering[0] == '-last_comment_at':
+            # stones without comments have no place in a keyset on last_comment_at
+            queryset = queryset.filter(last_comment_at__isnull=False)
+        return queryset.order_by(*ordering)
+
+    def get_list_serializer(self, selected_fields, instance=None):
+        '''
+        Pass no instance to get an unbound serializer for streaming.
+        '''
+        many = instance is not None
+        if selected_fields is None:
+            return StoneSummarySerializer(instance, many=many)
+        return StoneSerializer(instance, many=many, fields=selected_fields)
+
+
+class StoneListCreateView(StoneListMixin, PaginationModeMixin, APIView):
+    '''
+    API view to list all Stones or create a new one.
+    The list is paginated (?page= or ?pagination=cursor&cursor=) or streamed
+    whole with ?stream=1; see StoneListMixin for fields, expand and search.
+    '''
     
+    permission_classes = (AllowAny,)
+    pagination_class = StandardResultsSetPagination
+    cursor_pagination_class = StoneCursorPagination
+    query_budget = {'GET': 4, 'POST': 4}
+
+    @conditional_get(stone_list_scopes)
+    @cache_response(stone_list_scopes)
     def get(self, request):
-        stones = Stone.objects.all()
-        serializer = StoneSerializer(stones, many=True)
-        return success_response(message="لیست سنگ‌ها با موفقیت دریافت شد.", data=serializer.data)
+        selected_fields = self.get_selected_fields(request)
+        stones = self.filter_queryset(request, self.get_queryset(selected_fields))
+        if self.is_streaming(request):
+            return streaming_success_response(
+                "لیست سنگ‌ها با موفقیت دریافت شد.", stones, self.get_list_serializer(selected_fields),
+                chunk_size=self.stream_chunk_size,
+            )
+
+        page, paginator = self.paginate(request, stones)
+        serializer = self.get_list_serializer(selected_fields, page)
+        return success_response(message="لیست سنگ‌ها با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
 
     def post(self, request):
         serializer = StoneSerializer(data=request.data)
@@ -37,26 +176,61 @@ class StoneListCreateView(APIView):
         return error_response(message="ثبت سنگ با خطا مواجه شد.", errors=serializer.errors)
 
 
-class CommentsListPagination(PageNumberPagination):
+class StoneSearchView(APIView):
+    '''
+    API view for ranked full-text search over Stones (?q=...&limit=...)
+    '''
+    permission_classes = (AllowAny,)
+    query_budget = 2
+    search_filter = ('name', 'stone_type', 'main_color')
+    max_limit = 50
+
+    @cache_response('stones')
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return error_response(message="عبارت جستجو (q) ارسال نشده است.")
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), self.max_limit))
+        except ValueError:
+            return error_response(message="مقدار limit نامعتبر است.")
+
+        queryset = Stone.objects.only(*StoneSummarySerializer.Meta.fields)
+        stones = search_queryset(stone_search_index, queryset, query, self.search_filter, limit=limit)
+        serializer = StoneSummarySerializer(stones, many=True)
+        return success_response(message="نتایج جستجو با موفقیت دریافت شد.", data=serializer.data)
+
+
+class CommentsListPagination(EnvelopePageNumberPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 10
 
 
-class StoneCommentListCreateView(APIView):
+class StoneCommentListCreateView(PaginationModeMixin, APIView):
     '''
-    API view to list or create comments for a specific Stone
+    API view to list (paginated or ?stream=1, newest first) or create comments for a specific Stone
     '''
     permission_classes = (AllowAny,)
+    throttle_classes = (IPTokenBucketThrottle,)  # POST only
+    throttle_scope = 'community_write'
+    query_budget = {'GET': 2, 'POST': 3}
     search_filter = ('stone')
-    ordering_by = ('-created_at',)
-    PageNumberPagination = CommentsListPagination
+    ordering_by = ('-created_at', '-id')
+    pagination_class = CommentsListPagination
     
+    @conditional_get('stone:{stone_id}:comments')
+    @cache_response('stone:{stone_id}:comments')
     def get(self, request, stone_id):
         try:
-            comments = StoneComment.objects.filter(stone_id=stone_id)
-            serializer = StoneCommentSerializer(comments, many=True)
-            return success_response(message="نظرات با موفقیت دریافت شد.", data=serializer.data)
+            comments = StoneComment.objects.filter(stone_id=stone_id).order_by(*self.ordering_by)
+            if self.is_streaming(request):
+                return streaming_success_response("نظرات با موفقیت دریافت شد.", comments, StoneCommentSerializer(), chunk_size=self.stream_chunk_size)
+            page, paginator = self.paginate(request, comments)
+            serializer = StoneCommentSerializer(page, many=True)
+            return success_response(message="نظرات با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
+        except APIException:
+            raise  # e.g. an out of range page, handled by DRF as a 404
         except Exception as e:
             return internal_server_error_response(message="خطا در دریافت نظرات", exception=e)
 
@@ -70,26 +244,36 @@ class StoneCommentListCreateView(APIView):
         return error_response(message="ثبت نظر با خطا مواجه شد.", errors=serializer.errors)
 
 
-class FAQListPagination(PageNumberPagination):
+class FAQListPagination(EnvelopePageNumberPagination):
     page_size = 4
     page_size_query_param = 'page_size'
     max_page_size = 10
 
 
-class StoneFAQListCreateView(APIView):
+class StoneFAQListCreateView(PaginationModeMixin, APIView):
     '''
-    API view to list or create FAQs for a specific Stone
+    API view to list (paginated or ?stream=1) or create FAQs for a specific Stone
     '''
     permission_classes = (AllowAny,)
+    throttle_classes = (IPTokenBucketThrottle,)  # POST only
+    throttle_scope = 'community_write'
+    query_budget = {'GET': 2, 'POST': 3}
     SearchFilter = ('stone')
-    ordering_by = ('-created_at',)
-    PageNumberPagination = FAQListPagination
+    ordering_by = ('-created_at', '-id')
+    pagination_class = FAQListPagination
     
+    @conditional_get('stone:{stone_id}:faqs')
+    @cache_response('stone:{stone_id}:faqs')
     def get(self, request, stone_id):
         try:
-            faqs = StoneFAQ.objects.filter(stone_id=stone_id)
-            serializer = StoneFAQSerializer(faqs, many=True)
-            return success_response(message="سوالات با موفقیت دریافت شد.", data=serializer.data)
+            faqs = StoneFAQ.objects.filter(stone_id=stone_id).order_by(*self.ordering_by)
+            if self.is_streaming(request):
+                return streaming_success_response("سوالات با موفقیت دریافت شد.", faqs, StoneFAQSerializer(), chunk_size=self.stream_chunk_size)
+            page, paginator = self.paginate(request, faqs)
+            serializer = StoneFAQSerializer(page, many=True)
+            return success_response(message="سوالات با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
+        except APIException:
+            raise  # e.g. an out of range page, handled by DRF as a 404
         except Exception as e:
             return internal_server_error_response(message="خطا در دریافت سوالات", exception=e)
 
@@ -104,6 +288,55 @@ class StoneFAQListCreateView(APIView):
 
 
 
+class StoneContentBatchCreateView(APIView):
+    '''
+    Base for the batch create endpoints used by moderation and migration
+    tools: POST a JSON array of items (each with its "stone" id) and get one
+    result per item. Responds 201 when every item was created, 207 when only
+    some were and 400 when none were or the payload itself is invalid.
+    '''
+    permission_classes = (IsAdminUser,)
+    query_budget = 12  # user, stones, savepoint, INSERTs (SQLite: 333 rows each), stone counters
+    serializer_class = None
+    created_message = partial_message = failed_message = None
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data, many=True)
+        if not serializer.is_valid():
+            return error_response(message=self.failed_message, errors=serializer.errors)
+        if serializer.validated_data:
+            serializer.save()
+
+        results = serializer.results
+        created = len(serializer.valid_indexes)
+        data = {'created': created, 'failed': len(results) - created, 'results': results}
+        if not created:
+            return error_response(message=self.failed_message, errors=data)
+        if created < len(results):
+            return success_response(message=self.partial_message, data=data, status_code=status.HTTP_207_MULTI_STATUS)
+        return success_response(message=self.created_message, data=data, status_code=status.HTTP_201_CREATED)
+
+
+class StoneCommentBatchCreateView(StoneContentBatchCreateView):
+    '''
+    API view to create many comments, of any stones, in one request
+    '''
+    serializer_class = StoneCommentBatchItemSerializer
+    created_message = "همه نظرات با موفقیت ثبت شدند."
+    partial_message = "برخی از نظرات ثبت نشدند."
+    failed_message = "ثبت نظرات با خطا مواجه شد."
+
+
+class StoneFAQBatchCreateView(StoneContentBatchCreateView):
+    '''
+    API view to create many FAQs, of any stones, in one request
+    '''
+    serializer_class = StoneFAQBatchItemSerializer
+    created_message = "همه سوالات با موفقیت ثبت شدند."
+    partial_message = "برخی از سوالات ثبت نشدند."
+    failed_message = "ثبت سوالات با خطا مواجه شد."
+
+
 class StoneFAQAnswerView(UpdateAPIView):
     '''
     API view to allow admin users to answer a previously submitted FAQ
@@ -111,6 +344,7 @@ class StoneFAQAnswerView(UpdateAPIView):
     queryset = StoneFAQ.objects.all()
     serializer_class = StoneFAQSerializer
     permission_classes = (IsAdminUser,)
+    query_budget = 4
 
     def patch(self, request, *args, **kwargs):
         faq = self.get_object()
@@ -120,6 +354,17 @@ class StoneFAQAnswerView(UpdateAPIView):
             return error_response(message="فیلد پاسخ نمی‌تواند خالی باشد.")
 
         faq.answer = answer
-        faq.save()
+        faq.save(update_fields=['answer', 'updated_at'])  # post_save counts the answer on the stone and invalidates the caches
         serializer = self.get_serializer(faq)
-        return success_response(message="پاسخ با موفقیت ثبت شد.", data=serializer.data)
\ No newline at end of file
+        return success_response(message="پاسخ با موفقیت ثبت شد.", data=serializer.data)
+
+
+class CacheStatsView(APIView):
+    '''
+    API view to allow admin users to inspect the response cache hit and miss counters of this process
+    '''
+    permission_classes = (IsAdminUser,)
+    query_budget = 1
+
+    def get(self, request):
+        return success_response(message="آمار کش با موفقیت دریافت شد.", data=response_cache.stats())
@@ -0,0 +1,302 @@
+import json
+import logging
+import platform
+import random
+import statistics
+import time
+from itertools import count
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from core.utils.benchmarks import measure_allocations, summarize, temporary_database
+from core.utils.seeding import seed_orders, seed_products, seed_stones, seed_users
+
+
+PASSWORD = 'correct-horse-battery'
+
+
+class Case:
+    '''
+    One request to benchmark. path and data may be callables so that every
+    call can send a fresh payload (e.g. a new email to register). A cached
+    GET is measured twice: with the response cache cleared before every call
+    ("cold") and with it warm.
+    '''
+
+    def __init__(self, name, method, path, data=None, headers=None, status=200, cached=False, is_async=False, json_body=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.headers = headers or {}
+        self.status = status
+        self.cached = cached
+        self.is_async = is_async
+        self.json_body = json_body
+
+    def variants(self):
+        if not self.cached:
+            return [(self.name, False)]
+        return [(f'{self.name}:cold', True), (f'{self.name}:warm', False)]
+
+    def request(self, client, async_client, accept_encoding=None):
+        path = self.path() if callable(self.path) else self.path
+        data = self.data() if callable(self.data) else self.data
+        kwargs = dict(self.headers)
+        if self.json_body:
+            kwargs['content_type'] = 'application/json'
+        if accept_encoding:
+            kwargs['HTTP_ACCEPT_ENCODING'] = accept_encoding
+        if self.is_async:
+            response = async_to_sync(getattr(async_client, self.method))(path, data, **kwargs)
+        else:
+            response = getattr(client, self.method)(path, data, **kwargs)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.body_size = len(body)
+        return response
+
+
+def api_cases(stone_id, faq_id, stone_ids, users, batch_size, search_term):
+    '''
+    Every endpoint of general/api/v1/urls.py and accounts/api/v1/urls.py.
+    users maps a role to (user, headers); each role is used by one kind of
+    request so that, e.g., resetting a password never invalidates the token
+    another case authenticates with.
+    '''
+    serial = count()
+    admin = users['admin'][1]
+    member = users['member'][1]
+    refresh = str(RefreshToken.for_user(users['member'][0]))
+
+    def batch(item):
+        return lambda: [item(stone_ids[i % len(stone_ids)], next(serial)) for i in range(batch_size)]
+
+    return [
+        Case('stones.list', 'get', '/api/v1/stones/', cached=True),
+        Case('stones.list.expand', 'get', '/api/v1/stones/?expand=comments,faqs&page_size=50', cached=True),
+        Case('stones.list.cursor', 'get', '/api/v1/stones/?pagination=cursor&ordering=-comment_count', cached=True),
+        Case('stones.list.filtered', 'get', '/api/v1/stones/?min_comments=1&ordering=-last_comment_at', cached=True),
+        Case('stones.list.stream', 'get', '/api/v1/stones/?stream=1'),
+        Case('stones.create', 'post', '/api/v1/stones/', lambda: {'name': f'سنگ {next(serial)}', 'stone_type': 'igneous'}, status=201),
+        Case('stones.search', 'get', f'/api/v1/stones/search/?q={search_term}', cached=True),
+        Case('comments.list', 'get', f'/api/v1/stones/{stone_id}/comments/', cached=True),
+        Case('comments.create', 'post', f'/api/v1/stones/{stone_id}/comments/',
+             lambda: {'author_name': 'بنچمارک', 'text': f'نظر {next(serial)}'}, status=201),
+        Case('faqs.list', 'get', f'/api/v1/stones/{stone_id}/faqs/', cached=True),
+        Case('faqs.create', 'post', f'/api/v1/stones/{stone_id}/faqs/', lambda: {'question': f'سوال {next(serial)}؟'}, status=201),
+        Case('faqs.answer', 'patch', f'/api/v1/faqs/{faq_id}/answer/', {'answer': 'پاسخ کارشناس'}, admin, json_body=True),
+        Case('comments.batch', 'post', '/api/v1/comments/batch/',
+             batch(lambda stone, i: {'stone': stone, 'author_name': 'بنچمارک', 'text': f'نظر {i}'}), admin, status=201, json_body=True),
+        Case('faqs.batch', 'post', '/api/v1/faqs/batch/',
+             batch(lambda stone, i: {'stone': stone, 'question': f'سوال {i}؟'}), admin, status=201, json_body=True),
+        Case('cache.stats', 'get', '/api/v1/cache/stats/', headers=admin),
+        Case('async.stones.list', 'get', '/api/v1/async/stones/', is_async=True),
+        Case('async.comments.list', 'get', f'/api/v1/async/stones/{stone_id}/comments/', is_async=True),
+        Case('async.faqs.list', 'get', f'/api/v1/async/stones/{stone_id}/faqs/', is_async=True),
+        Case('accounts.register', 'post', '/accounts/api/v1/register/', lambda: {
+            'email': f'bench{next(serial)}@example.com', 'password': PASSWORD, 'first_name': 'بنچ', 'last_name': 'مارک',
+        }, status=201),
+        Case('accounts.login', 'post', '/accounts/api/v1/login/', {'email': users['member'][0].email, 'password': PASSWORD}),
+        Case('accounts.token_refresh', 'post', '/accounts/api/v1/token/refresh/', {'refresh': refresh}),
+        Case('accounts.reset_password', 'post', '/accounts/api/v1/reset-password/',
+             {'email': users['resetter'][0].email, 'new_password': PASSWORD}),
+        Case('accounts.profile_update', 'patch', '/accounts/api/v1/profile/update/',
+             lambda: {'first_name': 'بنچ', 'last_name': str(next(serial))}, member, json_body=True),
+    ]
+
+
+def compare(results, baseline, threshold):
+    '''
+    Cases slower (median latency) by more than threshold percent than in the
+    baseline, or running more queries. Returns a list of (case, what, old, new).
+    '''
+    previous = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results['cases']:
+        old = previous.get(case['name'])
+        if old is None:
+            continue
+        if case['queries']['max'] > old['queries']['max']:
+            regressions.append((case['name'], 'queries', old['queries']['max'], case['queries']['max']))
+        if case['latency']['median'] > old['latency']['median'] * (1 + threshold / 100):
+            regressions.append((case['name'], 'median ms', old['latency']['median'], case['latency']['median']))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway database with a reproducible dataset and drives every general "
+        "and accounts API endpoint in-process, reporting latency percentiles, SQL "
+        "statements and peak memory per endpoint. Save a run with --output and diff a "
+        "later one against it with --baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stones', type=int, default=5000)
+        parser.add_argument('--comments-per-stone', type=int, default=10)
+        parser.add_argument('--faqs-per-stone', type=int, default=4)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=100, help="Items per batch create request.")
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--accept-encoding', help="Accept-Encoding sent with every request, e.g. 'gzip' or 'zstd, br, gzip'.")
+        parser.add_argument('--case', action='append', dest='cases', help="Only run cases whose name starts with this (repeatable).")
+        parser.add_argument('--output', help="Also write the results as JSON to this file.")
+        parser.add_argument('--baseline', help="JSON file of an earlier run to compare against; fails on regressions.")
+        parser.add_argument('--threshold', type=float, default=20.0, help="Allowed median slowdown against the baseline, in percent.")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        rng = random.Random(options['seed'])
+        # over-budget and failed requests are reported in the results, not logged one by one
+        for name in ('core.profiling', 'django.request'):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+        overrides = override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            QUERY_BUDGET_ACTION='warn',
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+        )
+        with temporary_database(), overrides:
+            self.stderr.write("Seeding ...")
+            started = time.perf_counter()
+            stone_ids = seed_stones(options['stones'], options['comments_per_stone'], options['faqs_per_stone'], rng=rng)
+            user_ids = seed_users(options['users'], rng=rng)
+            product_ids = seed_products(options['products'], rng=rng)
+            seed_orders(options['orders'], user_ids, product_ids, rng=rng)
+            users = self.create_users()
+            seeding_s = time.perf_counter() - started
+
+            from general.models import Stone, StoneFAQ
+
+            stone_id = rng.choice(stone_ids)
+            faq = StoneFAQ.objects.filter(stone_id=stone_id).first() or StoneFAQ.objects.create(stone_id=stone_id, question='سوال؟')
+            search_term = Stone.objects.get(pk=stone_id).name.split()[0]
+            cases = api_cases(stone_id, faq.pk, stone_ids, users, options['batch_size'], search_term)
+            if options['cases']:
+                cases = [case for case in cases if any(case.name.startswith(prefix) for prefix in options['cases'])]
+
+            results = {
+                "meta": {
+                    "django": django.get_version(),
+                    "python": platform.python_version(),
+                    "database": connection.vendor,
+                    "seed": options['seed'],
+                    "accept_encoding": options['accept_encoding'],
+                    "repeat": options['repeat'],
+                    "seeding_s": round(seeding_s, 2),
+                    "rows": {key: options[key] for key in (
+                        'stones', 'comments_per_stone', 'faqs_per_stone', 'products', 'users', 'orders', 'batch_size')},
+                },
+                "cases": [],
+            }
+            client, async_client = Client(), AsyncClient()
+            for case in cases:
+                for name, cold in case.variants():
+                    self.stderr.write(f"  {name}")
+                    results['cases'].append(self.measure(
+                        name, case, cold, client, async_client, options['repeat'], options['accept_encoding'],
+                    ))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
+        else:
+            self.report(results)
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            if regressions:
+                for name, what, old, new in regressions:
+                    self.stderr.write(self.style.ERROR(f"{name}: {what} {old} -> {new}"))
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+            self.stderr.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
+
+    def create_users(self):
+        '''
+        Users with a real password, one per role, and their bearer headers.
+        '''
+        from accounts.models import User
+
+        users = {
+            'admin': User.objects.create_superuser('bench-admin@example.com', PASSWORD),
+            'member': User.objects.create_user('bench-member@example.com', PASSWORD, profile={'first_name': 'بنچ'}),
+            'resetter': User.objects.create_user('bench-reset@example.com', PASSWORD),
+        }
+        return {
+            role: (user, {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'})
+            for role, user in users.items()
+        }
+
+    def measure(self, name, case, cold, client, async_client, repeat, accept_encoding=None):
+        api_cache = caches['api']
+
+        def call():
+            if cold:
+                api_cache.clear()
+            started = time.perf_counter()
+            response = case.request(client, async_client, accept_encoding)
+            return response, (time.perf_counter() - started) * 1000
+
+        response, _ = call()  # warm-up; also fills the cache for the warm variant
+        samples, queries, db_ms, statuses = [], [], [], {}
+        for _ in range(repeat):
+            response, elapsed = call()
+            samples.append(elapsed)
+            profile = response.request_profile
+            queries.append(profile.queries)
+            db_ms.append(profile.db_ms)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        return {
+            "name": name,
+            "method": case.method.upper(),
+            "path": response.request_profile.path,
+            "view": response.request_profile.view,
+            "statuses": statuses,
+            "bytes": response.body_size,
+            "content_encoding": response.get('Content-Encoding'),
+            "ok": set(statuses) == {case.status},
+            "latency": summarize(samples),
+            "queries": {"min": min(queries), "max": max(queries), "budget": response.request_profile.budget},
+            "db_ms_median": round(statistics.median(db_ms), 3),
+            "peak_kib": measure_allocations(call),
+        }
+
+    def report(self, results):
+        meta = results['meta']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{meta['database']}, {meta['rows']['stones']} stones, {meta['rows']['users']} users, "
+            f"{meta['rows']['orders']} orders, {meta['repeat']} calls per case"
+        ))
+        self.stdout.write(
+            f"  {'case':<28} {'median':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'budget':>7} {'KiB':>8} {'bytes':>8}"
+        )
+        for case in results['cases']:
+            latency = case['latency']
+            line = (
+                f"  {case['name']:<28} {latency['median']:>8} {latency['p95']:>8} {latency['p99']:>8} "
+                f"{case['queries']['max']:>8} {str(case['queries']['budget']):>7} {case['peak_kib']:>8} {case['bytes']:>8}"
+            )
+            budget = case['queries']['budget']
+            if not case['ok']:
+                line = self.style.ERROR(f"{line}  statuses {case['statuses']}")
+            elif budget is not None and case['queries']['max'] > budget:
+                line = self.style.WARNING(f"{line}  over budget")
+            self.stdout.write(line)
@@ -0,0 +1,103 @@
+import json
+import random
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from core.utils.benchmarks import temporary_database, time_call
+from core.utils.compression import ENCODERS
+from core.utils.seeding import seed_products, seed_stones
+
+
+LEVELS = {
+    'gzip': (1, 6, 9),
+    'br': (1, 4, 6, 11),
+    'zstd': (1, 3, 9, 19),
+}
+
+
+def sample_paths(stone_id):
+    return {
+        'stones.list': '/api/v1/stones/',
+        'stones.list.expand': '/api/v1/stones/?expand=comments,faqs&page_size=10',
+        'comments.list': f'/api/v1/stones/{stone_id}/comments/',
+        'products.list': '/products/api/v1/stones/',
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the CPU/bytes tradeoff of every response compression coding and level "
+        "on real API bodies from a seeded throwaway database, and the request latency of "
+        "a cached response sent compressed (from the compressed cache entry) versus as is. "
+        "Use it to pick COMPRESS_ENCODINGS and COMPRESS_LEVELS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stones', type=int, default=500)
+        parser.add_argument('--comments-per-stone', type=int, default=10)
+        parser.add_argument('--faqs-per-stone', type=int, default=4)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        client = Client()
+        results = {"codecs": [], "served": []}
+
+        with temporary_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            stone_ids = seed_stones(options['stones'], options['comments_per_stone'], options['faqs_per_stone'], rng=rng)
+            seed_products(options['products'], rng=rng)
+            paths = sample_paths(rng.choice(stone_ids))
+
+            for name, path in paths.items():
+                body = client.get(path).content
+                for coding, (_, compress, _) in ENCODERS.items():
+                    for level in LEVELS[coding]:
+                        compressed = compress(body, level)
+                        timing = time_call(lambda: compress(body, level), repeat=options['repeat'])
+                        results['codecs'].append({
+                            "body": name,
+                            "coding": coding,
+                            "level": level,
+                            "bytes": len(body),
+                            "compressed_bytes": len(compressed),
+                            "ratio": round(len(body) / len(compressed), 2),
+                            "timing": timing,
+                            "mb_per_s": round(len(body) / 1024 / 1024 / (timing['median'] / 1000), 1) if timing['median'] else None,
+                        })
+
+            # the list response is cached: after the first request each coding is a cache read
+            path = paths['stones.list.expand']
+            for coding in [None, *ENCODERS]:
+                with override_settings(COMPRESS_ENCODINGS=[coding] if coding else []):
+                    caches['api'].clear()
+                    headers = {'HTTP_ACCEPT_ENCODING': coding} if coding else {}
+                    response = client.get(path, **headers)
+                    results['served'].append({
+                        "coding": coding or 'identity',
+                        "bytes": len(response.content),
+                        "warm": time_call(lambda: client.get(path, **headers), repeat=options['repeat']),
+                    })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        body = None
+        for result in results['codecs']:
+            if result['body'] != body:
+                body = result['body']
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{body} ({result['bytes']} bytes)"))
+            self.stdout.write(
+                f"  {result['coding']:<5} level {result['level']:>2}  {result['compressed_bytes']:>8} bytes  "
+                f"x{result['ratio']:<6} median {result['timing']['median']:>8} ms  {result['mb_per_s']} MB/s"
+            )
+        self.stdout.write(self.style.MIGRATE_HEADING(f"cached {paths['stones.list.expand']}"))
+        for result in results['served']:
+            self.stdout.write(
+                f"  {result['coding']:<8} {result['bytes']:>8} bytes  median {result['warm']['median']:>8} ms  "
+                f"p95 {result['warm']['p95']:>8} ms"
+            )
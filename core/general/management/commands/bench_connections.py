@@ -0,0 +1,86 @@
+import json
+import random
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from core.utils.benchmarks import temporary_database, time_call
+from core.utils.seeding import seed_products
+
+
+def connection_variants(settings_dict):
+    '''
+    (label, overrides) pairs, from "what every request paid before" to the configured setup.
+    '''
+    options = settings_dict['OPTIONS']
+    if connection.vendor == 'sqlite':
+        plain = {k: v for k, v in options.items() if k not in ('init_command', 'transaction_mode')}
+        return [
+            ('new connection per request, no pragmas', {'CONN_MAX_AGE': 0, 'OPTIONS': plain}),
+            ('new connection per request, pragmas', {'CONN_MAX_AGE': 0, 'OPTIONS': options}),
+            ('persistent + health checks, pragmas', {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': options}),
+        ]
+    plain = {k: v for k, v in options.items() if k != 'pool'}
+    return [
+        ('new connection per request', {'CONN_MAX_AGE': 0, 'OPTIONS': plain}),
+        ('persistent + health checks', {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': plain}),
+        ('connection pool', {'CONN_MAX_AGE': 0, 'OPTIONS': {**plain, 'pool': options.get('pool') or True}}),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures per-request latency through the full WSGI request cycle (including "
+        "connection open/close on request start/finish) for each database connection "
+        "strategy: a new connection per request, persistent connections and, on "
+        "PostgreSQL, the native connection pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        handler = WSGIHandler()
+        factory = RequestFactory()
+
+        results = []
+        with temporary_database():
+            product_ids = seed_products(options['products'], rng=rng)
+            paths = [f'/products/api/v1/stones/{pk}/' for pk in rng.sample(product_ids, min(50, len(product_ids)))]
+            paths.append('/products/api/v1/stones/?page_size=20')
+            original = dict(connection.settings_dict)
+
+            def request():
+                environ = factory.get(rng.choice(paths)).environ
+                response = handler(environ, lambda status, headers: None)
+                response.close()  # sends request_finished, which closes expired connections
+
+            try:
+                for label, overrides in connection_variants(original):
+                    connection.close()
+                    connection.settings_dict.update(overrides)
+                    results.append({
+                        "strategy": label,
+                        "timing": time_call(request, repeat=options['requests'], warmup=5),
+                    })
+                    connection.close()
+                    if connection.vendor == 'postgresql':
+                        connection.close_pool()
+            finally:
+                connection.settings_dict.clear()
+                connection.settings_dict.update(original)
+
+        if options['json']:
+            self.stdout.write(json.dumps({"vendor": connection.vendor, "results": results}, indent=2))
+            return
+        for result in results:
+            timing = result['timing']
+            self.stdout.write(
+                f"{result['strategy']:<45} median {timing['median']:>7} ms  p95 {timing['p95']:>7} ms  p99 {timing['p99']:>7} ms"
+            )
@@ -0,0 +1,122 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.utils.benchmarks import explain, temporary_database, time_call
+from core.utils.seeding import seed_orders, seed_products, seed_stones, seed_users
+
+
+def index_cases(rng, stone_ids, user_ids):
+    '''
+    Every secondary index shipped in the migrations, paired with the query it exists for.
+    '''
+    from general.models import StoneComment, StoneFAQ
+    from products.models import Order, ProductStone
+
+    stone_id = rng.choice(stone_ids)
+    user_id = rng.choice(user_ids)
+    return [
+        (
+            'general_comment_stone_idx', 'comments of a stone, newest first',
+            lambda: StoneComment.objects.filter(stone_id=stone_id).order_by('-created_at', '-id')[:5],
+        ),
+        (
+            'general_faq_stone_idx', 'FAQs of a stone, newest first',
+            lambda: StoneFAQ.objects.filter(stone_id=stone_id).order_by('-created_at', '-id')[:4],
+        ),
+        (
+            'products_order_status_idx', 'admin: pending orders, newest first',
+            lambda: Order.objects.filter(status='pending').order_by('-created_at')[:100],
+        ),
+        (
+            'products_order_user_idx', 'order history of a user',
+            lambda: Order.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:20],
+        ),
+        (
+            'products_stone_name_idx', 'admin: product stones sorted by name',
+            lambda: ProductStone.objects.order_by('name').only('id', 'name')[:100],
+        ),
+        (
+            'products_stone_created_idx', 'catalog: newest products',
+            lambda: ProductStone.objects.order_by('-created_at', '-id').only('id', 'name')[:20],
+        ),
+        (
+            'products_stone_price_idx', 'catalog: cheapest products',
+            lambda: ProductStone.objects.filter(price_per_kg__isnull=False).order_by('price_per_kg', 'id').only('id', 'name')[:20],
+        ),
+        (
+            'products_stone_type_new_idx', 'catalog: newest products of a type',
+            lambda: ProductStone.objects.filter(stone_type='igneous').order_by('-created_at', '-id').only('id', 'name')[:20],
+        ),
+        (
+            'products_stone_type_price_idx', 'catalog: cheapest products of a type',
+            lambda: ProductStone.objects.filter(stone_type='igneous', price_per_kg__isnull=False).order_by(
+                'price_per_kg', 'id').only('id', 'name')[:20],
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway database and shows, for every secondary index, the query "
+        "plan and latency of the query it serves with and without the index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stones', type=int, default=20000)
+        parser.add_argument('--comments-per-stone', type=int, default=10)
+        parser.add_argument('--faqs-per-stone', type=int, default=4)
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with temporary_database():
+            self.stderr.write("Seeding ...")
+            stone_ids = seed_stones(options['stones'], options['comments_per_stone'], options['faqs_per_stone'], rng=rng)
+            user_ids = seed_users(options['users'], rng=rng)
+            product_ids = seed_products(options['products'], rng=rng)
+            seed_orders(options['orders'], user_ids, product_ids, rng=rng)
+            self.analyze()
+
+            results = []
+            for index_name, label, make_queryset in index_cases(rng, stone_ids, user_ids):
+                with_index = self.measure(make_queryset, options['repeat'], 'with index')
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(index_name)}')
+                    without_index = self.measure(make_queryset, options['repeat'], 'without index')
+                    transaction.set_rollback(True)
+                results.append({
+                    "index": index_name,
+                    "query": label,
+                    "with_index": with_index,
+                    "without_index": without_index,
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
+            return
+        for result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{result['index']}: {result['query']}"))
+            for key in ('with_index', 'without_index'):
+                measured = result[key]
+                self.stdout.write(f"  {key.replace('_', ' ')}: median {measured['timing']['median']} ms")
+                for line in measured['plan'].splitlines():
+                    self.stdout.write(f"      {line}")
+
+    def measure(self, make_queryset, repeat, tag):
+        return {
+            "plan": explain(make_queryset(), tag),
+            "timing": time_call(lambda: list(make_queryset()), repeat=repeat),
+        }
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
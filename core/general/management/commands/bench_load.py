@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.utils.benchmarks import summarize
+
+
+WSGI_PATHS = (
+    '/api/v1/stones/',
+    '/api/v1/stones/1/comments/',
+    '/products/api/v1/stones/',
+)
+ASGI_PATHS = (
+    '/api/v1/async/stones/',
+    '/api/v1/async/stones/1/comments/',
+    '/products/api/v1/async/stones/',
+)
+
+
+async def fetch(host, port, path, trickle=0.0):
+    '''
+    Sends one GET over a fresh connection and reads the whole response.
+    With trickle > 0 the request and the response are sent/read in small
+    pieces spread over that many seconds, like a client on a slow link.
+    Returns (status, milliseconds, body bytes).
+    '''
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: application/json\r\nConnection: close\r\n\r\n'
+    ).encode()
+    try:
+        if trickle:
+            pieces = [request[i:i + 8] for i in range(0, len(request), 8)]
+            for piece in pieces:
+                writer.write(piece)
+                await writer.drain()
+                await asyncio.sleep(trickle / 2 / len(pieces))
+        else:
+            writer.write(request)
+            await writer.drain()
+
+        status_line = await reader.readline()
+        received = 0
+        while True:
+            chunk = await reader.read(1024 if trickle else 65536)
+            if not chunk:
+                break
+            received += len(chunk)
+            if trickle:
+                await asyncio.sleep(trickle / 200)
+    finally:
+        writer.close()
+    parts = status_line.split()
+    status = int(parts[1]) if len(parts) > 1 else 0
+    return status, (time.perf_counter() - started) * 1000, received
+
+
+async def run_load(url, paths, requests, concurrency, slow_clients, trickle, timeout):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip('/')
+    samples, statuses, errors = [], {}, 0
+    done = asyncio.Event()
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(prefix + paths[i % len(paths)])
+
+    async def fast_client():
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            try:
+                status, elapsed, _ = await asyncio.wait_for(fetch(host, port, path), timeout)
+            except (OSError, asyncio.TimeoutError):
+                errors += 1
+                continue
+            statuses[status] = statuses.get(status, 0) + 1
+            samples.append(elapsed)
+
+    async def slow_client(index):
+        # keeps a connection busy for the whole run
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(fetch(host, port, prefix + paths[index % len(paths)], trickle), trickle + timeout)
+            except (OSError, asyncio.TimeoutError):
+                await asyncio.sleep(0.1)
+
+    slow = [asyncio.create_task(slow_client(i)) for i in range(slow_clients)]
+    if slow_clients:
+        await asyncio.sleep(min(trickle / 2, 1.0))  # let them occupy the server first
+    started = time.perf_counter()
+    await asyncio.gather(*(fast_client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    return {
+        "url": url,
+        "requests": requests,
+        "concurrency": concurrency,
+        "slow_clients": slow_clients,
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "statuses": statuses,
+        "errors": errors,
+        "latency": summarize(samples) if samples else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests running servers with raw asyncio HTTP clients, optionally while many "
+        "slow clients hold connections open, e.g. the WSGI service against the uvicorn "
+        "(ASGI) one: bench_load --wsgi http://127.0.0.1:8000 --asgi http://127.0.0.1:8001"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', help="Base URL of the WSGI server; hits the sync endpoints.")
+        parser.add_argument('--asgi', help="Base URL of the ASGI server; hits the async endpoints.")
+        parser.add_argument('--wsgi-path', action='append', dest='wsgi_paths', help="Override the WSGI paths (repeatable).")
+        parser.add_argument('--asgi-path', action='append', dest='asgi_paths', help="Override the ASGI paths (repeatable).")
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--slow-clients', type=int, default=0)
+        parser.add_argument('--trickle', type=float, default=5.0, help="Seconds each slow client takes per request.")
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        targets = [
+            (mode, url, options[f'{mode}_paths'] or default)
+            for mode, url, default in (('wsgi', options['wsgi'], WSGI_PATHS), ('asgi', options['asgi'], ASGI_PATHS))
+            if url
+        ]
+        if not targets:
+            raise CommandError("Pass --wsgi and/or --asgi.")
+
+        results = {}
+        for mode, url, paths in targets:
+            self.stderr.write(f"Loading {mode} at {url} ...")
+            results[mode] = asyncio.run(run_load(
+                url, paths, options['requests'], options['concurrency'],
+                options['slow_clients'], options['trickle'], options['timeout'],
+            ))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            latency = result['latency'] or {}
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{mode}: {result['url']}"))
+            self.stdout.write(
+                f"  {result['throughput_rps']} req/s, statuses {result['statuses']}, errors {result['errors']}"
+            )
+            self.stdout.write(
+                f"  latency ms: median {latency.get('median')}  p95 {latency.get('p95')}  "
+                f"p99 {latency.get('p99')}  max {latency.get('max')}"
+            )
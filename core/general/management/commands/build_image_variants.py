@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.utils.images import build_variants
+
+
+def image_models():
+    from accounts.models import Profile
+    from general.models import Stone
+    from products.models import ProductStone
+
+    return {'stone': Stone, 'product': ProductStone, 'profile': Profile}
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the thumbnails and WebP/AVIF variants of images uploaded before the "
+        "image pipeline existed, or whose variants are missing or stale. Runs in this "
+        "process; originals that were already processed are reused, not re-encoded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(image_models()), action='append', dest='models',
+                            help="Only this model (repeatable); all by default.")
+        parser.add_argument('--force', action='store_true', help="Re-encode every image, even if up to date.")
+
+    def handle(self, *args, **options):
+        models = image_models()
+        for name in options['models'] or sorted(models):
+            model = models[name]
+            rows = model.objects.exclude(Q(image='') | Q(image__isnull=True)).only('pk', 'image', 'image_variants')
+            built = failed = 0
+            for row in rows.iterator(chunk_size=500):
+                if not options['force'] and (row.image_variants or {}).get('source') == row.image.name:
+                    continue
+                try:
+                    build_variants(model, row.pk, 'image', row.image.name, background=False, force=options['force'])
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f"{name} {row.pk} ({row.image.name}): {e}"))
+                    continue
+                built += 1
+            self.stdout.write(f"{name}: {built} built, {failed} failed")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core.utils.cache import response_cache
+from general.activity import drifted_stones, recount_stones
+from general.models import Stone, StoneComment, StoneFAQ
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the denormalized activity counters of stones (comment_count, faq_count, "
+        "answered_faq_count, last_comment_at) from their comments and FAQs, repairing any "
+        "drift, e.g. after rows were changed with raw SQL or queryset.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stone', type=int, action='append', dest='stones', help="Only this stone id (repeatable).")
+        parser.add_argument('--all', action='store_true', help="Rewrite every stone, not only the drifted ones.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many stones have drifted.")
+
+    def handle(self, *args, **options):
+        stones = Stone.objects.all()
+        if options['stones']:
+            stones = stones.filter(pk__in=options['stones'])
+
+        drifted = drifted_stones(stones, StoneComment, StoneFAQ)
+        if options['dry_run']:
+            self.stdout.write(f"{drifted.count()} of {stones.count()} stones have drifted counters.")
+            return
+
+        target = stones if options['all'] else Stone.objects.filter(pk__in=drifted.values('pk'))
+        updated = recount_stones(target, StoneComment, StoneFAQ)
+        if updated:
+            response_cache.invalidate('stones', 'stones:comments', 'stones:faqs')
+        self.stdout.write(self.style.SUCCESS(f"Recounted {updated} stones."))
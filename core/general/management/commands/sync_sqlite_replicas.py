@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database onto every replica_* SQLite database with the "
+        "online backup API, standing in for replication when testing replica routing locally. "
+        "With --interval it keeps copying, which simulates replication lag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Repeat every this many seconds until interrupted.")
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        replicas = [alias for alias in replica_aliases() if connections[alias].vendor == 'sqlite']
+        if primary.vendor != 'sqlite' or not replicas:
+            raise CommandError("Needs a SQLite primary and at least one SQLite replica (DB_REPLICAS).")
+
+        while True:
+            started = time.perf_counter()
+            source = sqlite3.connect(primary.settings_dict['NAME'])
+            try:
+                for alias in replicas:
+                    connections[alias].close()
+                    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                    try:
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+            self.stdout.write(f"Copied to {', '.join(replicas)} in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0003_alter_stonefaq_answer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stone',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='تاریخ ثبت'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='stone',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی'),
+        ),
+        migrations.AddField(
+            model_name='stonefaq',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='تاریخ ثبت'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='stonefaq',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی'),
+        ),
+    ]
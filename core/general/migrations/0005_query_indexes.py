@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0004_stone_faq_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stonecomment',
+            name='stone',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='general.stone'),
+        ),
+        migrations.AlterField(
+            model_name='stonefaq',
+            name='stone',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='faqs', to='general.stone'),
+        ),
+        migrations.AddIndex(
+            model_name='stone',
+            index=models.Index(fields=['updated_at'], name='general_stone_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stonecomment',
+            index=models.Index(fields=['stone', 'created_at'], name='general_comment_stone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stonefaq',
+            index=models.Index(fields=['stone', 'created_at'], name='general_faq_stone_idx'),
+        ),
+    ]
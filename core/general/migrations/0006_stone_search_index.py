@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from general.search import stone_search_index
+
+
+def create_search_index(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Stone = apps.get_model('general', 'Stone')
+    stone_search_index.create(using=alias)
+    stone_search_index.rebuild(Stone.objects.using(alias).all())
+
+
+def drop_search_index(apps, schema_editor):
+    stone_search_index.drop(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+from general.activity import recount_stones
+
+
+def fill_counters(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Stone = apps.get_model('general', 'Stone')
+    recount_stones(Stone.objects.using(alias).all(), apps.get_model('general', 'StoneComment'), apps.get_model('general', 'StoneFAQ'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0006_stone_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stone',
+            name='answered_faq_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد سوالات پاسخ داده شده'),
+        ),
+        migrations.AddField(
+            model_name='stone',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد نظرات'),
+        ),
+        migrations.AddField(
+            model_name='stone',
+            name='faq_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد سوالات'),
+        ),
+        migrations.AddField(
+            model_name='stone',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='تاریخ آخرین نظر'),
+        ),
+        migrations.AddIndex(
+            model_name='stone',
+            index=models.Index(fields=['comment_count', 'id'], name='general_stone_comments_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stone',
+            index=models.Index(fields=['answered_faq_count', 'id'], name='general_stone_answered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stone',
+            index=models.Index(fields=['last_comment_at', 'id'], name='general_stone_activity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
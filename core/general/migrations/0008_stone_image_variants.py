@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0007_stone_activity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stone',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='نسخه\u200cهای تصویر'),
+        ),
+    ]
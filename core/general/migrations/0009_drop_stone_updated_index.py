@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0008_stone_image_variants'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stone',
+            name='general_stone_updated_idx',
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from general.search import stone_search_index
+
+
+def rebuild_search_index(apps, schema_editor):
+    # documents are now indexed with ZWNJ-joined words (core/utils/search.py)
+    alias = schema_editor.connection.alias
+    Stone = apps.get_model('general', 'Stone')
+    stone_search_index.rebuild(Stone.objects.using(alias).all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0009_drop_stone_updated_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
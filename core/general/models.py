@@ -1,4 +1,11 @@
 from django.db import models
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.utils.cache import response_cache
+from core.utils.images import schedule_variants, variants_ready
+from .search import stone_search_index
 
 class Stone(models.Model):
     STONE_TYPE_CHOICES = [
@@ -12,6 +19,17 @@ class Stone(models.Model):
     description = models.TextField(blank=True, verbose_name='توضیح کوتاه')
     main_color = models.CharField(max_length=50, blank=True, verbose_name='رنگ اصلی')
     image = models.ImageField(upload_to='stones/', blank=True, null=True, verbose_name='تصویر')
+    # thumbnails and WebP/AVIF versions of the image, built after upload (core/utils/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='نسخه‌های تصویر')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
+
+    # denormalized activity, kept up to date by the comment/FAQ signals below
+    # (repair drift with `python manage.py recount_stone_activity`)
+    comment_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد نظرات')
+    faq_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد سوالات')
+    answered_faq_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد سوالات پاسخ داده شده')
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='تاریخ آخرین نظر')
 
     def __str__(self):
         return self.name
@@ -19,12 +37,18 @@ class Stone(models.Model):
     class Meta:
         verbose_name = 'stone'
         verbose_name_plural = 'stones'
+        indexes = [
+            # popularity / activity orderings of the stone list (keyset on value, id)
+            models.Index(fields=['comment_count', 'id'], name='general_stone_comments_idx'),
+            models.Index(fields=['answered_faq_count', 'id'], name='general_stone_answered_idx'),
+            models.Index(fields=['last_comment_at', 'id'], name='general_stone_activity_idx'),
+        ]
 
 class StoneComment(models.Model):
     '''
     نظرات          
     '''
-    stone = models.ForeignKey(Stone, on_delete=models.CASCADE, related_name='comments')
+    stone = models.ForeignKey(Stone, on_delete=models.CASCADE, related_name='comments', db_index=False)
     author_name = models.CharField(max_length=100, verbose_name='نام نویسنده')
     text = models.TextField(verbose_name='متن نظر')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')
@@ -32,13 +56,217 @@ class StoneComment(models.Model):
     def __str__(self):
         return f'نظر توسط {self.author_name} برای {self.stone.name}'
 
+    class Meta:
+        indexes = [
+            # comments of a stone, newest first; also replaces the plain stone_id FK index
+            models.Index(fields=['stone', 'created_at'], name='general_comment_stone_idx'),
+        ]
+
 class StoneFAQ(models.Model):
     '''
     سوالات متداول           
     '''
-    stone = models.ForeignKey(Stone, on_delete=models.CASCADE, related_name='faqs')
+    stone = models.ForeignKey(Stone, on_delete=models.CASCADE, related_name='faqs', db_index=False)
     question = models.CharField(max_length=255, verbose_name='سوال')
     answer = models.TextField(verbose_name='پاسخ', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
 
     def __str__(self):
         return f'سوال: {self.question} درباره {self.stone.name}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so the signal can tell when a FAQ gets (or loses) its answer
+        instance._was_answered = bool(instance.__dict__.get('answer'))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._was_answered = self.is_answered
+
+    @property
+    def is_answered(self):
+        return bool(self.answer)
+
+    class Meta:
+        indexes = [
+            # FAQs of a stone, newest first; also replaces the plain stone_id FK index
+            models.Index(fields=['stone', 'created_at'], name='general_faq_stone_idx'),
+        ]
+
+
+def per_stone(values, default):
+    """
+    A CASE expression picking a value per stone id, so that one UPDATE can
+    apply different changes to several stones (e.g. after a bulk insert).
+    """
+    return Case(*(When(pk=stone_id, then=Value(value)) for stone_id, value in values.items()), default=default)
+
+
+def counter_change(column, deltas):
+    """
+    column + its delta per stone; never below zero, so a decrement on a
+    counter that drifted low does not break the PositiveIntegerField.
+    """
+    value = F(column) + per_stone(deltas, 0)
+    if any(delta < 0 for delta in deltas.values()):
+        value = Greatest(value, Value(0))
+    return value
+
+
+def comment_counters(added, latest=None):
+    """
+    Column updates for stones that gained (added > 0) or lost comments:
+    added and latest map stone ids to the count delta and the newest new
+    created_at. The counters change with F() expressions, atomically in the
+    database; a removal recomputes last_comment_at from the remaining rows.
+    """
+    counters = {'comment_count': counter_change('comment_count', added)}
+    if latest:
+        newest = per_stone(latest, F('last_comment_at'))
+        counters['last_comment_at'] = Greatest(Coalesce(F('last_comment_at'), newest), newest)
+    elif any(delta < 0 for delta in added.values()):
+        counters['last_comment_at'] = Subquery(
+            StoneComment.objects.filter(stone=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+        )
+    return counters
+
+
+def faq_counters(added, answered):
+    """
+    Column updates for stones whose FAQs changed; added and answered map
+    stone ids to the delta of faq_count and answered_faq_count.
+    """
+    counters = {}
+    if any(added.values()):
+        counters['faq_count'] = counter_change('faq_count', added)
+    if any(answered.values()):
+        counters['answered_faq_count'] = counter_change('answered_faq_count', answered)
+    return counters
+
+
+def added_content_counters(relation, objects):
+    """
+    Counter updates for newly inserted comments or FAQs ('comments'/'faqs'),
+    for the signals and for bulk inserts, which send no post_save.
+    """
+    added, latest, answered = {}, {}, {}
+    for obj in objects:
+        added[obj.stone_id] = added.get(obj.stone_id, 0) + 1
+        if relation == 'comments':
+            latest[obj.stone_id] = max(latest.get(obj.stone_id, obj.created_at), obj.created_at)
+        else:
+            answered[obj.stone_id] = answered.get(obj.stone_id, 0) + int(obj.is_answered)
+    if relation == 'comments':
+        return comment_counters(added, latest)
+    return faq_counters(added, answered)
+
+
+def stone_content_changed(stone_ids, relation, **counters):
+    """
+    Invalidates the cached reads that embed the given relation ('comments'
+    or 'faqs') of the given stones: their own list endpoints and the stone
+    lists (which show the activity counters). The counters, if any (see
+    comment_counters/faq_counters), are applied in one UPDATE; the ETags
+    follow the scope versions, so the stone rows need no other change.
+    """
+    stone_ids = set(stone_ids)
+    if counters:
+        Stone.objects.filter(pk__in=stone_ids).update(**counters)
+    response_cache.invalidate(*(f'stone:{stone_id}:{relation}' for stone_id in stone_ids), f'stones:{relation}', 'stones')
+
+
+@receiver([post_save, post_delete], sender=Stone)
+def invalidate_stone_cache(sender, instance, **kwargs):
+    """
+    Signal that drops the cached stone list whenever a stone is saved or deleted
+    """
+    response_cache.invalidate('stones')
+
+
+@receiver(post_delete, sender=Stone)
+def invalidate_stone_content_cache(sender, instance, **kwargs):
+    """
+    Signal that drops the cached comment and FAQ pages of a deleted stone;
+    its comments and FAQs are deleted with it without touching the counters
+    (see deleted_with_stone)
+    """
+    response_cache.invalidate(f'stone:{instance.pk}:comments', f'stone:{instance.pk}:faqs', 'stones:comments', 'stones:faqs')
+
+
+def deleted_with_stone(origin):
+    """
+    Whether a post_delete comes from deleting stones, whose comments and
+    FAQs cascade: the stone rows are going away, so their counters are not
+    updated row by row.
+    """
+    if isinstance(origin, models.QuerySet):
+        return origin.model is Stone
+    return isinstance(origin, Stone)
+
+
+@receiver(post_save, sender=Stone)
+def index_stone(sender, instance, using, **kwargs):
+    """
+    Signal that keeps the full-text search index of stones up to date
+    """
+    stone_search_index.index(instance.pk, instance, using=using)
+
+
+@receiver(post_delete, sender=Stone)
+def unindex_stone(sender, instance, using, **kwargs):
+    stone_search_index.delete(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Stone)
+def stone_image_saved(sender, instance, using, **kwargs):
+    """
+    Signal that builds the image variants of a new or replaced stone image once the transaction commits
+    """
+    schedule_variants(instance, using=using)
+
+
+@receiver(variants_ready, sender=Stone)
+def stone_variants_ready(sender, pk, **kwargs):
+    response_cache.invalidate('stones')
+
+
+@receiver(post_save, sender=StoneComment)
+def comment_saved(sender, instance, created, **kwargs):
+    """
+    Signal that counts a new comment on its stone and drops the cached comment pages
+    """
+    counters = added_content_counters('comments', [instance]) if created else {}
+    stone_content_changed([instance.stone_id], 'comments', **counters)
+
+
+@receiver(post_delete, sender=StoneComment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_with_stone(origin):
+        return
+    stone_content_changed([instance.stone_id], 'comments', **comment_counters({instance.stone_id: -1}))
+
+
+@receiver(post_save, sender=StoneFAQ)
+def faq_saved(sender, instance, created, **kwargs):
+    """
+    Signal that keeps the FAQ counters of the stone (also covers answering a
+    FAQ) and drops the cached FAQ pages
+    """
+    if created:
+        counters = added_content_counters('faqs', [instance])
+    else:
+        was_answered = getattr(instance, '_was_answered', instance.is_answered)
+        counters = faq_counters({}, {instance.stone_id: int(instance.is_answered) - int(was_answered)})
+    instance._was_answered = instance.is_answered
+    stone_content_changed([instance.stone_id], 'faqs', **counters)
+
+
+@receiver(post_delete, sender=StoneFAQ)
+def faq_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_with_stone(origin):
+        return
+    counters = faq_counters({instance.stone_id: -1}, {instance.stone_id: -int(instance.is_answered)})
+    stone_content_changed([instance.stone_id], 'faqs', **counters)
@@ -0,0 +1,16 @@
+from core.utils.search import FullTextIndex
+
+
+def stone_document(stone):
+    return {
+        'name': stone.name,
+        'keywords': f'{stone.stone_type} {stone.get_stone_type_display()} {stone.main_color}',
+        'description': stone.description,
+    }
+
+
+stone_search_index = FullTextIndex(
+    'general_stone_search',
+    columns={'name': 10.0, 'keywords': 4.0, 'description': 1.0},
+    build=stone_document,
+)
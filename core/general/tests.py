@@ -1,3 +1,823 @@
-from django.test import TestCase
+import copy
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, router, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from core.routers import ReplicaRouter, allow_replica_reads
+from core.utils.cache import response_cache
+from core.utils.profiling import QueryBudgetExceeded
+from core.utils.search import normalize_text
+from core.utils.testing import QueryBudgetTestMixin
+from general.api.v1.views import StoneListCreateView, StoneSearchView
+from general.models import Stone, StoneComment, StoneFAQ
+from general.search import stone_search_index
+from products.models import ProductStone
+
+
+class GeneralQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    '''
+    Every endpoint of the general API stays within its query budget,
+    however many stones, comments and FAQs there are.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'a-strong-password')
+        cls.stones = [Stone.objects.create(name=f'گرانیت {i}', stone_type='igneous') for i in range(6)]
+        for stone in cls.stones:
+            for i in range(4):
+                StoneComment.objects.create(stone=stone, author_name='علی', text=f'نظر {i}')
+                StoneFAQ.objects.create(stone=stone, question=f'سوال {i}؟', answer='پاسخ' if i % 2 else None)
+        cls.stone = cls.stones[0]
+
+    def admin_headers(self):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.admin)}'}
+
+    def test_stone_list(self):
+        for query in ('', '?page_size=10', '?expand=comments,faqs&page_size=10', '?pagination=cursor&ordering=-comment_count',
+                      '?min_comments=1&ordering=-last_comment_at', '?search=گرانیت', '?stream=1'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/v1/stones/{query}')
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinQueryBudget(response)
+
+    def test_stone_create(self):
+        response = self.client.post('/api/v1/stones/', {'name': 'مرمر', 'stone_type': 'metamorphic'})
+        self.assertEqual(response.status_code, 201)
+        self.assertWithinQueryBudget(response)
+
+    def test_stone_search(self):
+        response = self.client.get('/api/v1/stones/search/?q=گرانیت')
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_comments(self):
+        url = f'/api/v1/stones/{self.stone.id}/comments/'
+        self.assertWithinQueryBudget(self.client.get(url))
+        self.assertWithinQueryBudget(self.client.get(f'{url}?stream=1'))
+        response = self.client.post(url, {'author_name': 'سارا', 'text': 'عالی'})
+        self.assertEqual(response.status_code, 201)
+        self.assertWithinQueryBudget(response)
+
+    def test_faqs(self):
+        url = f'/api/v1/stones/{self.stone.id}/faqs/'
+        self.assertWithinQueryBudget(self.client.get(url))
+        response = self.client.post(url, {'question': 'سختی؟'})
+        self.assertEqual(response.status_code, 201)
+        self.assertWithinQueryBudget(response)
+
+    def test_comment_batch(self):
+        items = [{'stone': self.stones[i % 6].id, 'author_name': 'ربات', 'text': f'نظر {i}'} for i in range(1000)]
+        response = self.client.post('/api/v1/comments/batch/', items, content_type='application/json', **self.admin_headers())
+        self.assertEqual(response.status_code, 201)
+        self.assertWithinQueryBudget(response)
+
+    def test_faq_batch(self):
+        items = [{'stone': stone.id, 'question': 'رنگ؟'} for stone in self.stones] + [{'stone': 0, 'question': 'x'}]
+        response = self.client.post('/api/v1/faqs/batch/', items, content_type='application/json', **self.admin_headers())
+        self.assertEqual(response.status_code, 207)
+        self.assertWithinQueryBudget(response)
+
+    def test_faq_answer(self):
+        faq = StoneFAQ.objects.filter(stone=self.stone, answer__isnull=True).first()
+        response = self.client.patch(
+            f'/api/v1/faqs/{faq.id}/answer/', {'answer': 'بله'}, content_type='application/json', **self.admin_headers(),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_cache_stats(self):
+        response = self.client.get('/api/v1/cache/stats/', **self.admin_headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    async def test_async_views(self):
+        for url in ('/api/v1/async/stones/', '/api/v1/async/stones/?expand=comments,faqs&page_size=10',
+                    '/api/v1/async/stones/?pagination=cursor&ordering=-comment_count', '/api/v1/async/stones/?search=گرانیت',
+                    f'/api/v1/async/stones/{self.stone.id}/comments/', f'/api/v1/async/stones/{self.stone.id}/faqs/'):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                profile = self.assertWithinQueryBudget(response)
+                # the queries of the async ORM are counted: the same as the sync view runs
+                sync_profile = (await self.async_client.get(url.replace('/async/', '/'))).request_profile
+                self.assertEqual(profile.queries, sync_profile.queries)
+                self.assertGreater(profile.queries, 0)
+
+    async def test_async_over_budget_fails(self):
+        with override_settings(QUERY_BUDGETS={'general:general:async-stone-comments': 1}):
+            with self.assertRaises(QueryBudgetExceeded), self.assertLogs('core.profiling', 'WARNING'):
+                await self.async_client.get(f'/api/v1/async/stones/{self.stone.id}/comments/')
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/v1/stones/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", view;dur=[\d.]+;.*render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_over_budget_fails(self):
+        with override_settings(QUERY_BUDGETS={'general:general:stone-list-create': 1}):
+            with self.assertRaises(QueryBudgetExceeded), self.assertLogs('core.profiling', 'WARNING'):
+                self.client.get('/api/v1/stones/')
+
+
+class StoneImageVariantsTest(TestCase):
+    '''
+    Uploaded stone images get small variants, listings reference only those,
+    and an identical upload reuses the variants of the first one.
+    '''
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, IMAGE_PIPELINE='sync', IMAGE_VARIANT_FORMATS=['webp']))
+
+    def upload(self, name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), (120, 80, 40)).save(buffer, 'JPEG')
+        image = SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/stones/', {'name': 'مرمر', 'stone_type': 'metamorphic', 'image': image})
+        self.assertEqual(response.status_code, 201)
+        return Stone.objects.get(pk=response.json()['data']['id'])
+
+    def test_variants(self):
+        stone = self.upload('first.jpg')
+        sizes = stone.image_variants['sizes']
+        self.assertEqual(stone.image_variants['source'], stone.image.name)
+        self.assertEqual((sizes['thumb']['width'], sizes['thumb']['height']), (160, 160))
+        self.assertEqual((sizes['small']['width'], sizes['small']['height']), (480, 360))
+
+        item = self.client.get('/api/v1/stones/').json()['data']['results'][0]
+        self.assertNotIn('image', item)
+        self.assertTrue(item['image_variants']['thumb']['webp'].endswith('/thumb.webp'))
+
+        again = self.upload('second.jpg')
+        self.assertNotEqual(again.image.name, stone.image.name)
+        self.assertEqual(again.image_variants['sizes'], sizes)
+
+
+class FileServingTest(TestCase):
+    '''
+    Static and media files are served with validators, byte ranges,
+    precompressed copies and the right caching policy.
+    '''
+
+    def setUp(self):
+        static_root, media_root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        for root in (static_root, media_root):
+            self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.enterContext(override_settings(STATIC_ROOT=static_root, MEDIA_ROOT=media_root))
+        self.body = b'0123456789' * 100
+        with open(os.path.join(media_root, 'clip.bin'), 'wb') as f:
+            f.write(self.body)
+        with open(os.path.join(static_root, 'app.css'), 'wb') as f:
+            f.write(b'body { color: red; }' * 50)
+        with open(os.path.join(static_root, 'app.css.gz'), 'wb') as f:
+            f.write(gzip.compress(b'body { color: red; }' * 50))
+
+    def test_media_range(self):
+        response = self.client.get('/media/clip.bin', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1000')
+        self.assertEqual(b''.join(response.streaming_content), self.body[10:20])
+
+        response = self.client.get('/media/clip.bin', HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.body[-5:])
+        self.assertEqual(self.client.get('/media/clip.bin', HTTP_RANGE='bytes=5000-').status_code, 416)
+
+    def test_media_validators(self):
+        response = self.client.get('/media/clip.bin')
+        self.assertEqual(response['Content-Length'], '1000')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.client.get('/media/clip.bin', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+
+    def test_static_precompressed(self):
+        response = self.client.get('/static/app.css', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'body { color: red; }' * 50)
+        self.assertNotIn('Content-Encoding', self.client.get('/static/app.css'))
+
+
+@override_settings(COMPRESS_ENCODINGS=['gzip'])
+class ResponseCompressionTest(TestCase):
+    '''
+    Large GET responses are compressed once and then served from the
+    response cache already compressed; small ones are sent as they are.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(20):
+            stone = Stone.objects.create(name=f'گرانیت {i}', stone_type='igneous', description='سنگ ساختمانی مقاوم ' * 10)
+            StoneComment.objects.create(stone=stone, author_name='علی', text='نظر')
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    def test_cached_response_is_compressed_once(self):
+        url = '/api/v1/stones/?expand=comments&page_size=10'
+        first = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0.5')
+        self.assertEqual((first['X-Cache'], first['Content-Encoding']), ('MISS', 'gzip'))
+        self.assertIn('Accept-Encoding', first['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(first.content))['data']['results']), 10)
+
+        second = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(response_cache.get_encoded(second.compress_cache_key, 'gzip'), first.content)
+
+        identity = self.client.get(url)
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertEqual(gzip.decompress(first.content), identity.content)
+
+    def test_small_and_streamed_responses(self):
+        self.assertNotIn('Content-Encoding', self.client.get('/api/v1/stones/?page_size=1', HTTP_ACCEPT_ENCODING='gzip'))
+        streamed = self.client.get('/api/v1/stones/?stream=1', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(streamed['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(b''.join(streamed.streaming_content)))['data']), 20)
+
+
+class StoneRepresentationTest(TestCase):
+    '''
+    The stone list is the compact summary by default; ?fields= picks
+    columns and ?expand= adds the nested comments and FAQs.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stone = Stone.objects.create(name='گرانیت', stone_type='igneous', description='سنگ ساختمانی', main_color='خاکستری')
+        StoneComment.objects.create(stone=cls.stone, author_name='علی', text='نظر')
+        StoneFAQ.objects.create(stone=cls.stone, question='سختی؟', answer='زیاد')
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    def first_result(self, query=''):
+        response = self.client.get(f'/api/v1/stones/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']['results'][0]
+
+    def test_summary_by_default(self):
+        item = self.first_result()
+        self.assertEqual(list(item), ['id', 'name', 'stone_type', 'main_color', 'image_variants', 'comment_count',
+                                      'faq_count', 'answered_faq_count', 'last_comment_at'])
+
+    def test_fields(self):
+        self.assertEqual(list(self.first_result('?fields=name,description')), ['id', 'name', 'description'])
+        # unknown fields are ignored; only unknown ones means the summary
+        self.assertEqual(list(self.first_result('?fields=name,password')), ['id', 'name'])
+        self.assertNotIn('password', self.first_result('?fields=password'))
+
+    def test_expand(self):
+        item = self.first_result('?expand=comments')
+        self.assertIn('name', item)
+        self.assertNotIn('faqs', item)
+        self.assertEqual([comment['text'] for comment in item['comments']], ['نظر'])
+
+        item = self.first_result('?fields=name&expand=comments,faqs')
+        self.assertEqual(list(item), ['id', 'name', 'comments', 'faqs'])
+        self.assertEqual(item['faqs'][0]['answer'], 'زیاد')
+
+
+class ResponseCacheTest(TestCase):
+    '''
+    Reads are served from the response cache until a write touches one of
+    their scopes; writes elsewhere leave them cached.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stone, cls.other = (Stone.objects.create(name=name, stone_type='igneous') for name in ('گرانیت', 'بازالت'))
+        cls.faq = StoneFAQ.objects.create(stone=cls.stone, question='سختی؟')
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    def assertCache(self, url, expected):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], expected, url)
+        return response.json()
+
+    def test_hit_then_miss_after_write(self):
+        url = f'/api/v1/stones/{self.stone.id}/comments/'
+        other_url = f'/api/v1/stones/{self.other.id}/comments/'
+        self.assertCache(url, 'MISS')
+        self.assertCache(other_url, 'MISS')
+        self.assertCache(url, 'HIT')
+
+        StoneComment.objects.create(stone=self.stone, author_name='علی', text='نظر')
+        self.assertEqual(self.assertCache(url, 'MISS')['data']['count'], 1)
+        self.assertCache(url, 'HIT')
+        self.assertCache(other_url, 'HIT')
+
+    def test_stone_list_follows_stones_and_expanded_relations(self):
+        self.assertCache('/api/v1/stones/', 'MISS')
+        self.assertCache('/api/v1/stones/?expand=faqs', 'MISS')
+        Stone.objects.create(name='مرمر', stone_type='metamorphic')
+        self.assertCache('/api/v1/stones/', 'MISS')
+        self.assertCache('/api/v1/stones/?expand=faqs', 'MISS')
+
+        self.faq.answer = 'زیاد'
+        self.faq.save()
+        data = self.assertCache('/api/v1/stones/?expand=faqs', 'MISS')['data']
+        stone = next(item for item in data['results'] if item['id'] == self.stone.id)
+        self.assertEqual(stone['faqs'][0]['answer'], 'زیاد')
+
+    def test_writes_without_signals_need_an_explicit_invalidation(self):
+        self.assertCache('/api/v1/stones/', 'MISS')
+        Stone.objects.filter(pk=self.stone.pk).update(name='گرانیت قرمز')
+        self.assertCache('/api/v1/stones/', 'HIT')
+        response_cache.invalidate('stones')
+        data = self.assertCache('/api/v1/stones/', 'MISS')['data']
+        self.assertIn('گرانیت قرمز', [item['name'] for item in data['results']])
+
+
+class ConditionalGetTest(TestCase):
+    '''
+    The ETag of a list changes with every write that changes the list,
+    including edits and deletions of rows other than the newest one.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stones = [Stone.objects.create(name=f'گرانیت {i}', stone_type='igneous') for i in range(3)]
+        cls.stone = cls.stones[0]
+        cls.comments = [StoneComment.objects.create(stone=cls.stone, author_name='علی', text=f'نظر {i}') for i in range(3)]
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    def assertNotModified(self, url, etag, expected=True):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304 if expected else 200, url)
+        return response
+
+    def test_validators(self):
+        response = self.client.get('/api/v1/stones/?page_size=1')
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotModified('/api/v1/stones/?page_size=1', response['ETag'])
+        self.assertNotModified('/api/v1/stones/?page_size=1&page=2', response['ETag'], expected=False)
+
+    def test_comment_edit_and_delete(self):
+        url = f'/api/v1/stones/{self.stone.id}/comments/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        comment = self.comments[1]
+        comment.text = 'نظر ویرایش شده'
+        comment.save()
+        response = self.assertNotModified(url, etag, expected=False)
+        self.assertIn('نظر ویرایش شده', [item['text'] for item in response.json()['data']['results']])
+
+        etag = response['ETag']
+        self.comments[0].delete()  # the oldest one: Max(created_at) stays the same
+        etag_after_delete = self.assertNotModified(url, etag, expected=False)['ETag']
+        self.assertNotModified(url, etag_after_delete)
+        self.assertNotModified(f'/api/v1/stones/{self.stones[1].id}/comments/',
+                               self.client.get(f'/api/v1/stones/{self.stones[1].id}/comments/')['ETag'])
+
+    def test_stone_delete(self):
+        etag = self.client.get('/api/v1/stones/?page_size=10')['ETag']
+        self.stones[0].delete()  # not the most recently updated stone
+        response = self.assertNotModified('/api/v1/stones/?page_size=10', etag, expected=False)
+        self.assertEqual(response.json()['data']['count'], 2)
+
+    def test_faq_answer(self):
+        faq = StoneFAQ.objects.create(stone=self.stone, question='سختی؟')
+        url = f'/api/v1/stones/{self.stone.id}/faqs/'
+        etag = self.client.get(url)['ETag']
+        faq.answer = 'زیاد'
+        faq.save()
+        self.assertNotModified(url, etag, expected=False)
+
+
+class StoneSearchTest(TestCase):
+    '''
+    Persian spelling variants match each other, and every match is ranked:
+    the best one is found however many rows share the query words.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.best = Stone.objects.create(name='مرمر کرمان', stone_type='metamorphic')
+        Stone.objects.bulk_create(
+            Stone(name=f'سنگ {i}', stone_type='metamorphic', description='مرمر') for i in range(300)
+        )
+        stone_search_index.rebuild(Stone.objects.filter(pk__gt=cls.best.pk))
+        cls.zwnj = Stone.objects.create(name='سنگ', stone_type='igneous', description='می‌خواهم ۱۲ تا')
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    def search(self, query, **params):
+        response = self.client.get('/api/v1/stones/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['data']]
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text('كيك  ي'), 'کیک ی')
+        self.assertEqual(normalize_text('۱۲۳ ٤٥'), '123 45')
+        self.assertEqual(normalize_text('مَرمَر'), 'مرمر')
+        self.assertEqual(normalize_text('می‌خواهم'), 'میخواهم')
+
+    def test_zwnj_variants(self):
+        for query in ('می‌خواهم', 'میخواهم', 'می خواهم', 'خواهم 12'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [self.zwnj.id])
+
+    def test_best_match_among_many(self):
+        ids = self.search('مرمر', limit=5)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(ids[0], self.best.id)
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.search('مرمر', limit=-5)), 1)
+        self.assertEqual(len(self.search('مرمر', limit=1000)), StoneSearchView.max_limit)
+        response = self.client.get('/api/v1/stones/search/', {'q': 'مرمر', 'limit': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_gets_every_match(self):
+        self.client.force_login(User.objects.create_superuser('admin@example.com', 'a-strong-password'))
+        response = self.client.get('/admin/general/stone/', {'q': 'مرمر'})
+        self.assertEqual(response.context['cl'].result_count, 301)
+
+
+class StoneCursorPaginationTest(TestCase):
+    '''
+    Cursor pages on the activity orderings, where most stones share a count of 0.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stones = [Stone.objects.create(name=f'گرانیت {i}', stone_type='igneous') for i in range(10)]
+        for stone in cls.stones[3:5]:
+            StoneComment.objects.create(stone=stone, author_name='علی', text='نظر')
+            StoneFAQ.objects.create(stone=stone, question='سختی؟', answer='زیاد')
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    def test_ties(self):
+        for ordering in ('-comment_count', '-answered_faq_count'):
+            with self.subTest(ordering=ordering):
+                ids, url = [], f'/api/v1/stones/?pagination=cursor&ordering={ordering}&page_size=3'
+                while url:
+                    data = self.client.get(url).json()['data']
+                    ids.extend(item['id'] for item in data['results'])
+                    url = data['next']
+                busy = [self.stones[4].id, self.stones[3].id]
+                self.assertEqual(ids, busy + [stone.id for stone in reversed(self.stones) if stone.id not in busy])
+
+
+class AsyncViewsTest(TestCase):
+    '''
+    The async read views answer like their sync counterparts, errors included.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stones = [Stone.objects.create(name=f'گرانیت {i}', stone_type='igneous') for i in range(4)]
+        cls.stone = cls.stones[0]
+        for i in range(6):
+            StoneComment.objects.create(stone=cls.stone, author_name='علی', text=f'نظر {i}')
+            StoneFAQ.objects.create(stone=cls.stone, question=f'سوال {i}؟')
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    async def test_same_data_as_sync_views(self):
+        for query in ('', '?page=2', '?fields=name&expand=comments', '?pagination=cursor&ordering=-comment_count'):
+            for path in ('stones/', f'stones/{self.stone.id}/comments/', f'stones/{self.stone.id}/faqs/'):
+                with self.subTest(path=path, query=query):
+                    response = await self.async_client.get(f'/api/v1/async/{path}{query}')
+                    self.assertEqual(response.status_code, 200)
+                    expected = (await self.async_client.get(f'/api/v1/{path}{query}')).json()['data']
+                    self.assertEqual(response.json()['data']['results'], expected['results'])
+
+    async def test_stream(self):
+        response = await self.async_client.get(f'/api/v1/async/stones/{self.stone.id}/comments/?stream=1')
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([item['text'] for item in json.loads(body)['data']], [f'نظر {i}' for i in reversed(range(6))])
+
+    async def test_errors(self):
+        for url in ('/api/v1/async/stones/?page=9', '/api/v1/async/stones/?page=x',
+                    f'/api/v1/async/stones/{self.stone.id}/comments/?page=9',
+                    '/api/v1/async/stones/?pagination=cursor&cursor=bm9wZQ=='):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['status'], 'error')
+        self.assertEqual((await self.async_client.post('/api/v1/async/stones/')).status_code, 405)
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    '''
+    Routing against a real replica: a second SQLite file copied from the
+    primary with sync_sqlite_replicas, then left behind by further writes.
+    '''
+
+    alias = 'replica_test'
+
+    def setUp(self):
+        if connections['default'].vendor != 'sqlite':
+            self.skipTest('needs a SQLite primary')
+        response_cache.backend.clear()
+
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        replica_settings = copy.deepcopy(connections['default'].settings_dict)
+        replica_settings['NAME'] = path
+        replica_settings['OPTIONS']['init_command'] += 'PRAGMA query_only=ON;'
+        connections.settings[self.alias] = replica_settings
+        self.addCleanup(self.remove_replica, path)
+
+        replica_router = next(r for r in router.routers if isinstance(r, ReplicaRouter))
+        for patcher in (
+            # allowed for the test only: the flush after it must not touch the read-only copy
+            mock.patch.object(type(self), 'databases', {'default', self.alias}),
+            mock.patch.object(replica_router, 'replicas', [self.alias]),
+            mock.patch('general.management.commands.sync_sqlite_replicas.replica_aliases', return_value=[self.alias]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def remove_replica(self, path):
+        connections[self.alias].close()
+        del connections[self.alias]
+        del connections.settings[self.alias]
+        for name in (path, f'{path}-wal', f'{path}-shm'):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def sync_replica(self):
+        call_command('sync_sqlite_replicas', stdout=io.StringIO())
+
+    def test_reads_and_pinning(self):
+        product = ProductStone.objects.create(name='گرانیت', stone_type='igneous', price_per_kg='12.50', available_quantity=10)
+        self.sync_replica()
+        ProductStone.objects.filter(pk=product.pk).update(name='مرمر')
+
+        self.assertEqual(ProductStone.objects.get(pk=product.pk).name, 'مرمر')
+        with allow_replica_reads():
+            self.assertEqual(ProductStone.objects.get(pk=product.pk).name, 'گرانیت')
+            with transaction.atomic():
+                self.assertEqual(ProductStone.objects.get(pk=product.pk).name, 'مرمر')
+            # only the replicated models go there
+            self.assertEqual(router.db_for_read(User), 'default')
+
+        url = f'/products/api/v1/stones/{product.pk}/'
+        self.assertEqual(self.client.get(url).json()['data']['name'], 'گرانیت')
+
+        response = self.client.post('/api/v1/stones/', {'name': 'بازالت', 'stone_type': 'igneous'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies['db_pin']['max-age'], 10)
+        # the pinned client reads its writes (and everyone else's) from the primary
+        self.assertEqual(self.client.get(url).json()['data']['name'], 'مرمر')
+
+        self.client.cookies.clear()
+        self.sync_replica()
+        self.assertEqual(self.client.get(url).json()['data']['name'], 'مرمر')
+
+    def test_recent_write_fills_cache_from_primary(self):
+        stone = Stone.objects.create(name='گرانیت', stone_type='igneous')
+        self.sync_replica()
+        stone.name = 'مرمر'
+        stone.save()
+
+        with allow_replica_reads():
+            self.assertEqual(Stone.objects.get(pk=stone.pk).name, 'گرانیت')
+        for expected in ('MISS', 'HIT'):
+            response = self.client.get('/api/v1/stones/')
+            self.assertEqual(response['X-Cache'], expected)
+            self.assertEqual([item['name'] for item in response.json()['data']['results']], ['مرمر'])
+
+    def test_settled_miss_reads_replica(self):
+        stone = Stone.objects.create(name='گرانیت', stone_type='igneous')
+        self.sync_replica()
+        # no signal, no invalidation: only the replica still has the old name
+        Stone.objects.filter(pk=stone.pk).update(name='مرمر')
+
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            with CaptureQueriesContext(connections[self.alias]) as replica_queries:
+                response = self.client.get('/api/v1/stones/')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual([item['name'] for item in response.json()['data']['results']], ['گرانیت'])
+            self.assertTrue(replica_queries.captured_queries)
+
+            # a pinned client fills its misses from the primary
+            self.client.cookies['db_pin'] = '1'
+            with CaptureQueriesContext(connections[self.alias]) as replica_queries:
+                response = self.client.get('/api/v1/stones/?page_size=5')
+            self.assertEqual([item['name'] for item in response.json()['data']['results']], ['مرمر'])
+            self.assertFalse(replica_queries.captured_queries)
+
+    def test_fill_racing_a_write_is_not_stored(self):
+        Stone.objects.create(name='گرانیت', stone_type='igneous')
+        get_queryset = StoneListCreateView.get_queryset
+
+        def write_during_fill(view, *args, **kwargs):
+            response_cache.invalidate('stones')
+            return get_queryset(view, *args, **kwargs)
+
+        with mock.patch.object(StoneListCreateView, 'get_queryset', write_during_fill):
+            self.assertEqual(self.client.get('/api/v1/stones/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/v1/stones/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/v1/stones/')['X-Cache'], 'HIT')
+
+
+class StoneBatchCreateTest(TestCase):
+    '''
+    Batch creation keeps the valid items of a mixed payload, reports every
+    item in request order and inserts with the counters in one transaction.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'a-strong-password')
+        cls.stone, cls.other = (Stone.objects.create(name=name, stone_type='igneous') for name in ('گرانیت', 'بازالت'))
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    def post(self, url, items, user=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user or self.admin)}'}
+        return self.client.post(url, json.dumps(items), content_type='application/json', **headers)
+
+    def test_mixed_items(self):
+        comments_url = f'/api/v1/stones/{self.stone.id}/comments/'
+        self.assertEqual(self.client.get(comments_url).json()['data']['count'], 0)
+
+        items = [
+            {'stone': self.stone.id, 'author_name': 'علی', 'text': 'نظر اول'},
+            {'stone': self.stone.id, 'author_name': 'علی'},
+            {'stone': 999999, 'author_name': 'علی', 'text': 'سنگ ناموجود'},
+            {'stone': self.other.id, 'author_name': 'سارا', 'text': 'نظر دوم'},
+            'not an object',
+        ]
+        response = self.post('/api/v1/comments/batch/', items)
+        self.assertEqual(response.status_code, 207)
+        data = response.json()['data']
+        self.assertEqual((data['created'], data['failed']), (2, 3))
+        self.assertEqual([(r['index'], r['status']) for r in data['results']], [(0, 201), (1, 400), (2, 400), (3, 201), (4, 400)])
+        self.assertIn('text', data['results'][1]['errors'])
+        self.assertIn('stone', data['results'][2]['errors'])
+        self.assertEqual(data['results'][3]['data']['text'], 'نظر دوم')
+        self.assertEqual(data['results'][0]['data']['id'], StoneComment.objects.get(text='نظر اول').id)
+
+        self.assertEqual(StoneComment.objects.count(), 2)
+        self.assertEqual(sorted(Stone.objects.values_list('comment_count', flat=True)), [1, 1])
+        # bulk inserts send no signals; the batch invalidates the cached pages itself
+        self.assertEqual(self.client.get(comments_url).json()['data']['count'], 1)
+
+    def test_all_valid_and_all_invalid(self):
+        items = [{'stone': self.stone.id, 'question': 'سختی؟'}, {'stone': self.other.id, 'question': 'رنگ؟', 'answer': 'سیاه'}]
+        response = self.post('/api/v1/faqs/batch/', items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['created'], 2)
+        self.assertEqual(
+            list(Stone.objects.order_by('id').values_list('faq_count', 'answered_faq_count')), [(1, 0), (1, 1)],
+        )
+
+        response = self.post('/api/v1/faqs/batch/', [{'stone': 0, 'question': 'x'}, {'stone': self.stone.id}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.json()['errors']['results']], [400, 400])
+        self.assertEqual(StoneFAQ.objects.count(), 2)
+
+    def test_invalid_payload(self):
+        for payload in ({'stone': self.stone.id, 'question': 'x'}, [], [{'stone': self.stone.id, 'question': 'x'}] * 1001):
+            with self.subTest(size=len(payload)):
+                response = self.post('/api/v1/faqs/batch/', payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('non_field_errors', response.json()['errors'])
+        self.assertFalse(StoneFAQ.objects.exists())
+
+    def test_admin_only(self):
+        user = User.objects.create_user('user@example.com', 'a-strong-password')
+        response = self.post('/api/v1/faqs/batch/', [{'stone': self.stone.id, 'question': 'x'}], user=user)
+        self.assertEqual(response.status_code, 403)
+
+    def test_insert_and_counters_are_atomic(self):
+        items = [{'stone': self.stone.id, 'author_name': 'علی', 'text': f'نظر {i}'} for i in range(3)]
+        with mock.patch('general.api.v1.serializers.stone_content_changed', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post('/api/v1/comments/batch/', items)
+        self.assertFalse(StoneComment.objects.exists())
+        self.assertEqual(Stone.objects.get(pk=self.stone.pk).comment_count, 0)
+
+
+class StoneActivityCounterTest(TestCase):
+    '''
+    The denormalized activity counters of stones follow comment and FAQ
+    creation, answering and deletion, and recount_stone_activity repairs drift.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'a-strong-password')
+        cls.stone, cls.other = (Stone.objects.create(name=name, stone_type='igneous') for name in ('گرانیت', 'بازالت'))
+
+    def setUp(self):
+        response_cache.backend.clear()
+
+    def counters(self, stone=None):
+        return Stone.objects.values_list('comment_count', 'faq_count', 'answered_faq_count').get(pk=(stone or self.stone).pk)
+
+    def test_comments(self):
+        first = StoneComment.objects.create(stone=self.stone, author_name='علی', text='اول')
+        second = StoneComment.objects.create(stone=self.stone, author_name='سارا', text='دوم')
+        StoneComment.objects.create(stone=self.other, author_name='علی', text='دیگر')
+        self.stone.refresh_from_db()
+        self.assertEqual((self.stone.comment_count, self.stone.last_comment_at), (2, second.created_at))
+
+        second.delete()
+        self.stone.refresh_from_db()
+        self.assertEqual((self.stone.comment_count, self.stone.last_comment_at), (1, first.created_at))
+        first.delete()
+        self.stone.refresh_from_db()
+        self.assertEqual((self.stone.comment_count, self.stone.last_comment_at), (0, None))
+        self.assertEqual(self.counters(self.other), (1, 0, 0))
+
+    def test_faqs(self):
+        faq = StoneFAQ.objects.create(stone=self.stone, question='سختی؟')
+        answered = StoneFAQ.objects.create(stone=self.stone, question='رنگ؟', answer='خاکستری')
+        self.assertEqual(self.counters(), (0, 2, 1))
+
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.admin)}'}
+        for answer in ('بالا', 'خیلی بالا'):
+            response = self.client.patch(f'/api/v1/faqs/{faq.id}/answer/', {'answer': answer}, content_type='application/json', **headers)
+            self.assertEqual(response.status_code, 200)
+            # answering again does not count the FAQ twice
+            self.assertEqual(self.counters(), (0, 2, 2))
+
+        faq.refresh_from_db()
+        faq.answer = ''
+        faq.save()
+        self.assertEqual(self.counters(), (0, 2, 1))
+        answered.delete()
+        self.assertEqual(self.counters(), (0, 1, 0))
+        faq.delete()
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_decrements_stop_at_zero(self):
+        comment = StoneComment.objects.create(stone=self.stone, author_name='علی', text='اول')
+        faq = StoneFAQ.objects.create(stone=self.stone, question='سختی؟', answer='بالا')
+        Stone.objects.filter(pk=self.stone.pk).update(comment_count=0, faq_count=0, answered_faq_count=0)
+        comment.delete()
+        faq.delete()
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_stone_delete_skips_counters(self):
+        for i in range(3):
+            StoneComment.objects.create(stone=self.stone, author_name='علی', text=f'نظر {i}')
+            StoneFAQ.objects.create(stone=self.stone, question=f'سوال {i}؟')
+        StoneComment.objects.create(stone=self.other, author_name='علی', text='دیگر')
+        comments_url = f'/api/v1/stones/{self.stone.id}/comments/'
+        self.assertEqual(self.client.get(comments_url).json()['data']['count'], 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.stone.delete()
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE')], queries.captured_queries)
+        self.assertEqual(self.counters(self.other), (1, 0, 0))
+        # the cached pages of the deleted stone are dropped all the same
+        response = self.client.get(comments_url)
+        self.assertEqual((response['X-Cache'], response.json()['data']['count']), ('MISS', 0))
+
+        StoneComment.objects.filter(stone=self.other).delete()
+        self.assertEqual(self.counters(self.other), (0, 0, 0))
+
+    def test_recount(self):
+        StoneComment.objects.create(stone=self.stone, author_name='علی', text='اول')
+        StoneFAQ.objects.create(stone=self.stone, question='سختی؟', answer='بالا')
+        expected = self.counters()
+        # queryset.update() sends no signals, so the counters drift
+        Stone.objects.filter(pk=self.stone.pk).update(comment_count=7, answered_faq_count=0)
+
+        out = io.StringIO()
+        call_command('recount_stone_activity', '--dry-run', stdout=out)
+        self.assertEqual(out.getvalue().strip(), '1 of 2 stones have drifted counters.')
+        self.assertEqual(self.counters(), (7, 1, 0))
+
+        out = io.StringIO()
+        call_command('recount_stone_activity', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Recounted 1 stones.')
+        self.assertEqual(self.counters(), expected)
+
+        out = io.StringIO()
+        call_command('recount_stone_activity', '--dry-run', stdout=out)
+        self.assertEqual(out.getvalue().strip(), '0 of 2 stones have drifted counters.')
@@ -1,5 +1,17 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.urls import path
+
+from .importers import FORMATS, as_text_stream, export_products, import_products
 from .models import ProductStone, Order, OrderItem
+from .search import product_stone_search_index
+
+
+class ProductStoneImportForm(forms.Form):
+    file = forms.FileField(label='فایل')
+    format = forms.ChoiceField(label='قالب', choices=[(fmt, fmt.upper()) for fmt in FORMATS])
 
 @admin.register(ProductStone)
 class ProductStoneAdmin(admin.ModelAdmin):
@@ -7,6 +19,57 @@ class ProductStoneAdmin(admin.ModelAdmin):
     list_filter = ('stone_type',)
     search_fields = ('name', 'scientific_name', 'colors')
     readonly_fields = ('created_at', 'updated_at')
+    actions = ['export_csv', 'export_jsonl']
+    change_list_template = 'admin/products/productstone/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='products_productstone_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:products_productstone_changelist')
+
+        form = ProductStoneImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            # the upload is read through a text wrapper, so large files are never decoded in one piece
+            report = import_products(as_text_stream(form.cleaned_data['file'].file), form.cleaned_data['format'])
+            messages.success(
+                request,
+                f"{report.upserted} ردیف ذخیره شد، {report.rejected} ردیف رد شد.",
+            )
+            for rejection in report.rejections[:20]:
+                errors = '، '.join(f"{field}: {error}" for field, error in rejection['errors'].items())
+                messages.warning(request, f"سطر {rejection['line']}: {errors}")
+            return redirect('admin:products_productstone_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': 'ورود انبوه محصولات',
+        }
+        return render(request, 'admin/products/productstone/import_form.html', context)
+
+    def export(self, queryset, fmt, content_type):
+        response = StreamingHttpResponse(export_products(queryset, fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="product_stones.{fmt}"'
+        return response
+
+    @admin.action(description='خروجی CSV محصولات انتخاب‌شده')
+    def export_csv(self, request, queryset):
+        return self.export(queryset, 'csv', 'text/csv; charset=utf-8')
+
+    @admin.action(description='خروجی JSONL محصولات انتخاب‌شده')
+    def export_jsonl(self, request, queryset):
+        return self.export(queryset, 'jsonl', 'application/jsonl; charset=utf-8')
+
+    def get_search_results(self, request, queryset, search_term):
+        # use the full-text index instead of icontains table scans when the database supports it
+        if not search_term or not product_stone_search_index.is_supported(queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        return product_stone_search_index.filter(queryset, search_term), False
 
 
 class OrderItemInline(admin.TabularInline):
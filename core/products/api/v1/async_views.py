@@ -0,0 +1,45 @@
+from products.models import ProductStone
+from .serializer import ProductStoneSummarySerializer, ProductStoneDetailSerializer
+from .views import ProductStoneCatalogMixin, ProductStoneCursorPagination
+from core.utils.async_views import AsyncReadView
+from core.utils.pagination import PaginationModeMixin
+from core.utils.responses import json_success_response, json_error_response, async_streaming_success_response
+
+
+class AsyncProductStoneListView(ProductStoneCatalogMixin, PaginationModeMixin, AsyncReadView):
+    '''
+    Async variant of the catalog (see ProductStoneCatalogMixin), keyset paginated or ?stream=1
+    '''
+    pagination_class = ProductStoneCursorPagination
+
+    async def get(self, request):
+        try:
+            queryset = self.filter_queryset(request, self.get_queryset())
+        except ValueError as e:
+            return json_error_response(message="پارامترهای فیلتر نامعتبر است.", errors={str(e): "عدد معتبر نیست."})
+
+        if self.is_streaming(request):
+            return async_streaming_success_response(
+                "لیست محصولات با موفقیت دریافت شد.",
+                queryset.order_by(*self.get_ordering(request)),
+                ProductStoneSummarySerializer(),
+                chunk_size=self.stream_chunk_size,
+            )
+
+        page, paginator = await self.apaginate(request, queryset)
+        serializer = ProductStoneSummarySerializer(page, many=True)
+        return json_success_response(message="لیست محصولات با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
+
+
+class AsyncProductStoneDetailView(AsyncReadView):
+    '''
+    Async variant of the ProductStone detail
+    '''
+
+    async def get(self, request, pk):
+        try:
+            product = await ProductStone.objects.aget(pk=pk)
+        except ProductStone.DoesNotExist:
+            return json_error_response(message="محصول یافت نشد.", status_code=404)
+        serializer = ProductStoneDetailSerializer(product)
+        return json_success_response(message="اطلاعات محصول با موفقیت دریافت شد.", data=serializer.data)
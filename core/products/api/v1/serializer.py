@@ -0,0 +1,183 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from rest_framework import serializers
+from core.utils.images import ImageVariantsField
+from products.models import ProductStone, Order, OrderItem, line_total
+
+
+class ProductStoneSummarySerializer(serializers.ModelSerializer):
+    '''
+    Compact ProductStone representation used by listings and search results
+    (the long description/applications/extraction_sites texts and the original image are left out)
+    '''
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = ProductStone
+        fields = [
+            'id',
+            'name',
+            'scientific_name',
+            'stone_type',
+            'colors',
+            'hardness',
+            'density',
+            'image_variants',
+            'price_per_kg',
+            'available_quantity',
+        ]
+
+
+class ProductStoneDetailSerializer(serializers.ModelSerializer):
+    '''
+    Full ProductStone representation for the product page
+    '''
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = ProductStone
+        fields = [
+            'id',
+            'name',
+            'scientific_name',
+            'stone_type',
+            'colors',
+            'hardness',
+            'density',
+            'description',
+            'applications',
+            'extraction_sites',
+            'image',
+            'image_variants',
+            'price_per_kg',
+            'available_quantity',
+            'created_at',
+            'updated_at',
+        ]
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    '''
+    Serializer for listing the items of an order
+    '''
+    class Meta:
+        model = OrderItem
+        fields = [
+            'product',
+            'quantity',
+            'price_per_unit',
+        ]
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    '''
+    Serializer for showing an order together with its items
+    '''
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id',
+            'status',
+            'total_price',
+            'created_at',
+            'items',
+        ]
+
+
+class OrderHistoryItemSerializer(serializers.ModelSerializer):
+    '''
+    An order item in the order history; line_total is annotated by the database
+    '''
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = [
+            'product',
+            'product_name',
+            'quantity',
+            'price_per_unit',
+            'line_total',
+        ]
+
+
+class OrderHistorySerializer(serializers.ModelSerializer):
+    '''
+    An order in the order history of a user (see OrderQuerySet.history);
+    total_price is the Sum of the line totals, computed by the database
+    '''
+    total_price = serializers.DecimalField(source='items_total', max_digits=12, decimal_places=2, read_only=True)
+    items = OrderHistoryItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id',
+            'status',
+            'total_price',
+            'created_at',
+            'payment_date',
+            'items',
+        ]
+
+
+# the most units of one product per order; keeps the stock UPDATE and the
+# line totals well inside the database integer and decimal columns
+MAX_ITEM_QUANTITY = 100_000
+
+
+class OrderItemInputSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+    quantity = serializers.IntegerField(min_value=1, max_value=MAX_ITEM_QUANTITY)
+
+
+class OrderCreateSerializer(serializers.Serializer):
+    '''
+    Places an order for the user in the serializer context.
+    Everything runs in one transaction: stock is reserved with one conditional
+    UPDATE per product (in product id order, so concurrent checkouts never
+    deadlock), the items are bulk inserted and the order total is computed by
+    the database. If any product is short, the whole order is rolled back and
+    InsufficientStock propagates to the view.
+    '''
+    items = OrderItemInputSerializer(many=True, allow_empty=False)
+
+    max_items = 100
+
+    def validate_items(self, value):
+        if len(value) > self.max_items:
+            raise serializers.ValidationError(f"حداکثر {self.max_items} قلم در هر سفارش مجاز است.")
+        quantities = {}
+        for item in value:
+            if item['product'] in quantities:
+                raise serializers.ValidationError(f"محصول {item['product']} بیش از یک بار در سفارش آمده است.")
+            quantities[item['product']] = item['quantity']
+        return quantities
+
+    def create(self, validated_data):
+        quantities = validated_data['items']
+        user = self.context['request'].user
+
+        with transaction.atomic():
+            for product_id in sorted(quantities):
+                ProductStone.objects.reserve(product_id, quantities[product_id])
+
+            prices = dict(ProductStone.objects.filter(pk__in=quantities).values_list('id', 'price_per_kg'))
+            order = Order.objects.create(user=user)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=product_id, quantity=quantity, price_per_unit=prices[product_id])
+                for product_id, quantity in sorted(quantities.items())
+            ])
+
+            order_total = (
+                OrderItem.objects.filter(order=OuterRef('pk'))
+                .values('order')
+                .annotate(total=Sum(line_total()))
+                .values('total')
+            )
+            Order.objects.filter(pk=order.pk).update(total_price=Subquery(order_total))
+            order.refresh_from_db(fields=['total_price'])
+        return order
@@ -0,0 +1,14 @@
+from django.urls import path
+from .views import ProductStoneListView, ProductStoneDetailView, ProductStoneSearchView, OrderListCreateView
+from .async_views import AsyncProductStoneListView, AsyncProductStoneDetailView
+
+app_name = "products"
+
+urlpatterns = [
+    path('stones/', ProductStoneListView.as_view(), name='product-stone-list'), # لیست محصولات سنگ
+    path('stones/<int:pk>/', ProductStoneDetailView.as_view(), name='product-stone-detail'), # جزئیات محصول سنگ
+    path('orders/', OrderListCreateView.as_view(), name='order-list-create'), # لیست و ثبت سفارش‌ها
+    path('stones/search/', ProductStoneSearchView.as_view(), name='product-stone-search'), # جستجوی متنی محصولات
+    path('async/stones/', AsyncProductStoneListView.as_view(), name='async-product-stone-list'), # لیست محصولات سنگ (async)
+    path('async/stones/<int:pk>/', AsyncProductStoneDetailView.as_view(), name='async-product-stone-detail'), # جزئیات محصول سنگ (async)
+]
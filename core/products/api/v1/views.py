@@ -0,0 +1,208 @@
+from decimal import Decimal, InvalidOperation
+from django.shortcuts import get_object_or_404
+from rest_framework.views import APIView
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework import status
+from products.models import ProductStone, Order, InsufficientStock
+from products.search import product_stone_search_index
+from .serializer import (
+    ProductStoneSummarySerializer, ProductStoneDetailSerializer, OrderCreateSerializer, OrderSerializer, OrderHistorySerializer,
+)
+from core.utils.responses import success_response, error_response, streaming_success_response
+from core.utils.search import search_queryset
+from core.utils.pagination import EnvelopeCursorPagination, PaginationModeMixin
+
+
+class ProductStoneCursorPagination(EnvelopeCursorPagination):
+    '''
+    Keyset pagination whose ordering is chosen by the view (see ProductStoneListView.orderings)
+    '''
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        return view.get_ordering(request)
+
+
+class ProductStoneCatalogMixin:
+    '''
+    Filtering and ordering of the catalog, shared by the sync and async lists.
+    Filters: stone_type, hardness_min/max, density_min/max, price_min/max, in_stock=true.
+    Sorting (?ordering=) is limited to indexed columns.
+    Only the listing columns are loaded; long texts stay in the database.
+    '''
+    orderings = {
+        '-created_at': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+        '-price_per_kg': ('-price_per_kg', '-id'),
+        'price_per_kg': ('price_per_kg', 'id'),
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+    default_ordering = '-created_at'
+    range_filters = {
+        'hardness': 'hardness',
+        'density': 'density',
+        'price': 'price_per_kg',
+    }
+
+    def get_ordering(self, request):
+        return self.orderings.get(request.query_params.get('ordering'), self.orderings[self.default_ordering])
+
+    def filter_queryset(self, request, queryset):
+        '''
+        Applies the query string filters; raises ValueError on malformed numbers.
+        '''
+        params = request.query_params
+        stone_type = params.get('stone_type')
+        if stone_type:
+            queryset = queryset.filter(stone_type=stone_type)
+
+        for param, field in self.range_filters.items():
+            for suffix, lookup in (('min', 'gte'), ('max', 'lte')):
+                value = params.get(f'{param}_{suffix}')
+                if value:
+                    try:
+                        number = Decimal(value)
+                    except InvalidOperation:
+                        number = None
+                    if number is None or not number.is_finite():
+                        raise ValueError(f'{param}_{suffix}')
+                    queryset = queryset.filter(**{f'{field}__{lookup}': number})
+
+        if params.get('in_stock') in ('1', 'true', 'True'):
+            queryset = queryset.filter(available_quantity__gt=0)
+
+        # NULL prices cannot take part in a keyset on price_per_kg
+        ordering_field = self.get_ordering(request)[0].lstrip('-')
+        if ordering_field == 'price_per_kg':
+            queryset = queryset.filter(price_per_kg__isnull=False)
+        return queryset
+
+    def get_queryset(self):
+        return ProductStone.objects.only(*ProductStoneSummarySerializer.Meta.fields, 'created_at')
+
+
+class ProductStoneListView(ProductStoneCatalogMixin, PaginationModeMixin, APIView):
+    '''
+    Read-optimized catalog of ProductStones (see ProductStoneCatalogMixin).
+    Pages are keyset based; ?stream=1 streams every matching row in the same order instead.
+    '''
+    permission_classes = (AllowAny,)
+    pagination_class = ProductStoneCursorPagination
+
+    def get(self, request):
+        queryset = self.get_queryset()
+        try:
+            queryset = self.filter_queryset(request, queryset)
+        except ValueError as e:
+            return error_response(message="پارامترهای فیلتر نامعتبر است.", errors={str(e): "عدد معتبر نیست."})
+
+        if self.is_streaming(request):
+            return streaming_success_response(
+                "لیست محصولات با موفقیت دریافت شد.",
+                queryset.order_by(*self.get_ordering(request)),
+                ProductStoneSummarySerializer(),
+                chunk_size=self.stream_chunk_size,
+            )
+
+        page, paginator = self.paginate(request, queryset)
+        serializer = ProductStoneSummarySerializer(page, many=True)
+        return success_response(message="لیست محصولات با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
+
+
+class ProductStoneDetailView(APIView):
+    '''
+    API view to retrieve a single ProductStone with all of its details
+    '''
+    permission_classes = (AllowAny,)
+
+    def get(self, request, pk):
+        product = get_object_or_404(ProductStone, pk=pk)
+        serializer = ProductStoneDetailSerializer(product)
+        return success_response(message="اطلاعات محصول با موفقیت دریافت شد.", data=serializer.data)
+
+
+class ProductStoneSearchView(APIView):
+    '''
+    API view for ranked full-text search over ProductStones (?q=...&limit=...)
+    '''
+    permission_classes = (AllowAny,)
+    search_filter = ('name', 'scientific_name', 'colors')
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return error_response(message="عبارت جستجو (q) ارسال نشده است.")
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), self.max_limit))
+        except ValueError:
+            return error_response(message="مقدار limit نامعتبر است.")
+
+        queryset = ProductStone.objects.only(*ProductStoneSummarySerializer.Meta.fields)
+        products = search_queryset(product_stone_search_index, queryset, query, self.search_filter, limit=limit)
+        serializer = ProductStoneSummarySerializer(products, many=True)
+        return success_response(message="نتایج جستجو با موفقیت دریافت شد.", data=serializer.data)
+
+
+class OrderHistoryPagination(EnvelopeCursorPagination):
+    '''
+    Keyset pagination of a user's orders, newest first (products_order_user_idx)
+    '''
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class OrderListCreateView(PaginationModeMixin, APIView):
+    '''
+    GET: order history of the authenticated user, newest first, with the
+    items, line totals and order totals (?status= filters; ?stream=1 streams
+    every order). A page costs at most three queries: the user (unless the
+    authentication cache has it), the orders and their items. query_budget
+    covers pages only: a stream runs one orders query, then one items query
+    per stream_chunk_size orders while the body is sent, after the request
+    profile is closed.
+
+    POST: places an order: {"items": [{"product": id, "quantity": n}, ...]}.
+    Stock is reserved atomically; a short product fails the whole order with 409.
+    '''
+    permission_classes = (IsAuthenticated,)
+    pagination_class = OrderHistoryPagination
+    query_budget = {'GET': 3}
+
+    def get(self, request):
+        queryset = Order.objects.history(request.user)
+        order_status = request.query_params.get('status')
+        if order_status:
+            queryset = queryset.filter(status=order_status)
+
+        if self.is_streaming(request):
+            return streaming_success_response(
+                "لیست سفارش‌ها با موفقیت دریافت شد.",
+                queryset.order_by(*OrderHistoryPagination.ordering),
+                OrderHistorySerializer(),
+                chunk_size=self.stream_chunk_size,
+            )
+
+        page, paginator = self.paginate(request, queryset)
+        serializer = OrderHistorySerializer(page, many=True)
+        return success_response(message="لیست سفارش‌ها با موفقیت دریافت شد.", data=paginator.get_paginated_data(serializer.data))
+
+    def post(self, request):
+        serializer = OrderCreateSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return error_response(message="ثبت سفارش با خطا مواجه شد.", errors=serializer.errors)
+        try:
+            order = serializer.save()
+        except InsufficientStock as e:
+            return error_response(
+                message="موجودی محصول کافی نیست.",
+                errors={"product": e.product_id},
+                status_code=status.HTTP_409_CONFLICT,
+            )
+        return success_response(message="سفارش با موفقیت ثبت شد.", data=OrderSerializer(order).data, status_code=status.HTTP_201_CREATED)
@@ -0,0 +1,301 @@
+"""
+ورود و خروج انبوه کاتالوگ محصولات سنگ (CSV / JSONL).
+فایل به صورت جریانی و در دسته‌های ثابت خوانده می‌شود تا مصرف حافظه به اندازه فایل بستگی نداشته باشد.
+"""
+
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from products.models import ProductStone
+from products.search import product_stone_search_index
+
+
+FORMATS = ('csv', 'jsonl')
+
+
+class RowError(Exception):
+    pass
+
+
+def text_field(max_length=None, required=False):
+    def coerce(value):
+        value = '' if value is None else str(value).strip()
+        if required and not value:
+            raise RowError("این فیلد ضروری است.")
+        if max_length and len(value) > max_length:
+            raise RowError(f"حداکثر {max_length} کاراکتر مجاز است.")
+        return value
+    return coerce
+
+
+def decimal_field(max_digits, decimal_places):
+    limit = Decimal(10) ** (max_digits - decimal_places)
+    step = Decimal(1).scaleb(-decimal_places)
+
+    def coerce(value):
+        if value is None or str(value).strip() == '':
+            return None
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise RowError("عدد معتبر نیست.")
+        if not number.is_finite() or abs(number) >= limit:
+            raise RowError("عدد خارج از محدوده مجاز است.")
+        return number.quantize(step)
+    return coerce
+
+
+# the largest value a PositiveIntegerField holds on every supported database
+MAX_QUANTITY = 2 ** 31 - 1
+
+
+def quantity_field(value):
+    if value is None or str(value).strip() == '':
+        return 0
+    try:
+        number = int(str(value).strip())
+    except (ValueError, OverflowError):
+        raise RowError("عدد صحیح معتبر نیست.")
+    if number < 0:
+        raise RowError("مقدار منفی مجاز نیست.")
+    if number > MAX_QUANTITY:
+        raise RowError(f"حداکثر مقدار مجاز {MAX_QUANTITY} است.")
+    return number
+
+
+def choice_field(choices):
+    allowed = {key for key, _ in choices}
+    labels = {label: key for key, label in choices}
+
+    def coerce(value):
+        value = '' if value is None else str(value).strip()
+        value = labels.get(value, value)
+        if value not in allowed:
+            raise RowError(f"مقدار باید یکی از {', '.join(sorted(allowed))} باشد.")
+        return value
+    return coerce
+
+
+# field name -> coercer; 'sku' is the natural key used for upserts
+SCHEMA = {
+    'sku': text_field(max_length=64, required=True),
+    'name': text_field(max_length=150, required=True),
+    'scientific_name': text_field(max_length=150),
+    'stone_type': choice_field(ProductStone.STONE_TYPE_CHOICES),
+    'colors': text_field(max_length=100),
+    'hardness': decimal_field(3, 1),
+    'density': decimal_field(5, 2),
+    'description': text_field(),
+    'applications': text_field(),
+    'extraction_sites': text_field(),
+    'price_per_kg': decimal_field(10, 2),
+    'available_quantity': quantity_field,
+}
+
+# columns a row must have to create a product (an existing SKU only needs 'sku')
+REQUIRED_ON_INSERT = ('name', 'stone_type')
+
+
+def row_columns(row):
+    '''
+    The SCHEMA columns a row carries (the CSV header, or the keys of a JSONL
+    object), always with 'sku'. Only these are written: a file with some of
+    the columns updates those and leaves the others of existing SKUs alone.
+    '''
+    return frozenset(name for name in SCHEMA if name in row) | {'sku'}
+
+
+def validate_row(row, columns=None):
+    '''
+    Coerces one raw row (dict of strings) against SCHEMA, for the given
+    columns (all of them by default). Returns (values, errors); errors is an
+    empty dict for a valid row.
+    '''
+    values, errors = {}, {}
+    for name, coerce in SCHEMA.items():
+        if columns is not None and name not in columns:
+            continue
+        try:
+            values[name] = coerce(row.get(name))
+        except RowError as e:
+            errors[name] = str(e)
+    return values, errors
+
+
+def read_rows(stream, fmt):
+    '''
+    Yields (line_number, row_dict) from a text stream without loading it whole.
+    '''
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, None
+                continue
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
+
+
+def as_text_stream(fileobj, encoding='utf-8-sig'):
+    '''
+    Wraps a binary file (e.g. an uploaded file) as a streaming text file.
+    '''
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding=encoding, newline='')
+
+
+class ImportReport:
+    '''
+    Running totals of an import. Only the first `max_reported` rejected rows
+    are kept in memory; pass on_reject to stream every rejection elsewhere.
+    '''
+
+    max_reported = 100
+
+    def __init__(self):
+        self.processed = 0
+        self.upserted = 0
+        self.rejected = 0
+        self.rejections = []
+
+    def reject(self, line_number, errors):
+        self.rejected += 1
+        if len(self.rejections) < self.max_reported:
+            self.rejections.append({"line": line_number, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "processed": self.processed,
+            "upserted": self.upserted,
+            "rejected": self.rejected,
+            "rejections": self.rejections,
+        }
+
+
+def upsert_batch(batch, columns):
+    '''
+    Inserts new SKUs and updates existing ones with one INSERT ... ON CONFLICT
+    per batch, then refreshes their full-text index entries (bulk_create does
+    not send post_save). batch maps SKUs to (line_number, values), all with
+    the given columns; only those columns (and updated_at) are updated.
+    New SKUs without the REQUIRED_ON_INSERT columns are not created.
+    Returns the number of rows written and the (line_number, errors) of the
+    rejected ones.
+    '''
+    rejected = []
+    missing = [name for name in REQUIRED_ON_INSERT if name not in columns]
+    if missing:
+        existing = set(ProductStone.objects.filter(sku__in=list(batch)).values_list('sku', flat=True))
+        for sku in list(batch):
+            if sku not in existing:
+                line_number, _ = batch.pop(sku)
+                rejected.append((line_number, {"sku": f"کد کالا وجود ندارد؛ برای ایجاد محصول ستون‌های {'، '.join(missing)} لازم است."}))
+    if not batch:
+        return 0, rejected
+
+    objects = [ProductStone(**values) for _, values in batch.values()]
+    ProductStone.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=['sku'],
+        update_fields=[name for name in SCHEMA if name in columns and name != 'sku'] + ['updated_at'],
+    )
+    saved = ProductStone.objects.filter(sku__in=list(batch))
+    product_stone_search_index.index_many((product.pk, product) for product in saved)
+    return len(objects), rejected
+
+
+def import_products(stream, fmt, batch_size=1000, on_progress=None, on_reject=None):
+    '''
+    Streams rows from `stream`, validates them and upserts valid rows in
+    batches of `batch_size`. on_progress(report) is called after every batch,
+    on_reject(line_number, errors) for every rejected row.
+    '''
+    report = ImportReport()
+    # rows waiting to be written, grouped by their columns (JSONL rows may differ)
+    pending, pending_rows = {}, 0
+
+    def reject(line_number, errors):
+        report.reject(line_number, errors)
+        if on_reject:
+            on_reject(line_number, errors)
+
+    def flush():
+        nonlocal pending_rows
+        for columns, batch in pending.items():
+            upserted, rejected = upsert_batch(batch, columns)
+            report.upserted += upserted
+            for line_number, errors in rejected:
+                reject(line_number, errors)
+        pending.clear()
+        pending_rows = 0
+        if on_progress:
+            on_progress(report)
+
+    for line_number, row in read_rows(stream, fmt):
+        report.processed += 1
+        if row is None:
+            reject(line_number, {"row": "سطر قابل خواندن نیست."})
+            continue
+        columns = row_columns(row)
+        values, errors = validate_row(row, columns)
+        if errors:
+            reject(line_number, errors)
+            continue
+
+        sku = values['sku']
+        if any(sku in batch for other, batch in pending.items() if other != columns):
+            flush()  # keep the file order for a SKU written with different columns
+        # the same SKU twice in one batch would hit the same row twice in one statement; the last one wins
+        batch = pending.setdefault(columns, {})
+        pending_rows += sku not in batch
+        batch[sku] = (line_number, values)
+        if pending_rows >= batch_size:
+            flush()
+
+    if pending:
+        flush()
+    elif on_progress:
+        on_progress(report)
+    return report
+
+
+def export_products(queryset, fmt, chunk_size=2000):
+    '''
+    Yields the queryset as CSV or JSONL text, one row at a time, reading the
+    database with a server-side chunked iterator.
+
+    SKU is the key imports match rows on, so products without one are
+    exported with an empty sku and rejected when the file is imported again;
+    give them a SKU first to round-trip them.
+    '''
+    fields = list(SCHEMA)
+    rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow('' if value is None else value for value in row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+    elif fmt == 'jsonl':
+        for row in rows:
+            record = {name: (str(value) if isinstance(value, Decimal) else value) for name, value in zip(fields, row)}
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
@@ -0,0 +1,109 @@
+import json
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.utils import renderers
+from core.utils.benchmarks import measure_allocations, time_call
+from core.utils.renderers import FastJSONRenderer, PreEncodedJSON, encode_json
+from core.utils.seeding import COLORS, NAMES, STONE_TYPES
+from products.api.v1.serializer import ProductStoneSummarySerializer
+from products.models import ProductStone
+
+
+def catalog_payload(count, rng):
+    '''
+    A catalog page as the API sends it: serializer output, prices already coerced to strings.
+    '''
+    products = [
+        ProductStone(
+            id=i + 1,
+            name=f'{rng.choice(NAMES)} {i}',
+            scientific_name=f'Lapis {i}',
+            stone_type=rng.choice(STONE_TYPES),
+            colors='، '.join(rng.sample(COLORS, 2)),
+            hardness=Decimal(rng.randint(10, 100)) / 10,
+            density=Decimal(rng.randint(200, 400)) / 100,
+            price_per_kg=Decimal(rng.randint(1000, 100000)) / 100,
+            available_quantity=rng.randint(0, 500),
+        )
+        for i in range(count)
+    ]
+    return ProductStoneSummarySerializer(products, many=True).data
+
+
+def orders_payload(count, rng):
+    '''
+    Order rows straight from values()/annotate(): native Decimal and datetime objects.
+    '''
+    now = timezone.now()
+    return [
+        {
+            "id": i + 1,
+            "status": rng.choice(('pending', 'paid', 'shipped')),
+            "total_price": Decimal(rng.randint(1000, 10 ** 7)) / 100,
+            "created_at": now - timedelta(seconds=rng.randint(0, 10 ** 7)),
+            "items": [
+                {"product": rng.randint(1, 10 ** 4), "quantity": rng.randint(1, 20),
+                 "price_per_unit": Decimal(rng.randint(1000, 100000)) / 100}
+                for _ in range(3)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares render time and peak allocations of DRF's JSONRenderer, "
+        "FastJSONRenderer (orjson and stdlib fallback) and a pre-encoded body."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        payloads = {
+            'catalog': catalog_payload(options['items'], rng),
+            'orders': orders_payload(options['items'], rng),
+        }
+
+        results = []
+        for name, data in payloads.items():
+            envelope = {"status": "success", "message": "لیست با موفقیت دریافت شد.", "data": {"results": data}}
+            pre_encoded = PreEncodedJSON(encode_json(envelope))
+            cases = {
+                'drf': lambda: JSONRenderer().render(envelope),
+                'stdlib': lambda: encode_json(envelope, fast=False),
+                'pre-encoded': lambda: FastJSONRenderer().render(pre_encoded),
+            }
+            if renderers.orjson is not None:
+                cases['orjson'] = lambda: FastJSONRenderer().render(envelope)
+
+            for renderer, render in cases.items():
+                results.append({
+                    "payload": name,
+                    "renderer": renderer,
+                    "bytes": len(render()),
+                    "timing": time_call(render, repeat=options['repeat']),
+                    "peak_kib": measure_allocations(render),
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        if renderers.orjson is None:
+            self.stderr.write("orjson is not installed; only the stdlib paths were measured.")
+        for result in results:
+            self.stdout.write(
+                f"{result['payload']:<8} {result['renderer']:<12} median {result['timing']['median']:>8} ms"
+                f"  p95 {result['timing']['p95']:>8} ms  peak {result['peak_kib']:>9} KiB  {result['bytes']} bytes"
+            )
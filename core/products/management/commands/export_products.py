@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importers import FORMATS, export_products
+from products.models import ProductStone
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams the product stone catalog out as CSV or JSONL, in the format import_products reads. "
+        "Products without a SKU are written with an empty sku, which import_products rejects."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help="Output file; defaults to stdout.")
+        parser.add_argument('--stone-type', choices=[key for key, _ in ProductStone.STONE_TYPE_CHOICES])
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        queryset = ProductStone.objects.all()
+        if options['stone_type']:
+            queryset = queryset.filter(stone_type=options['stone_type'])
+
+        try:
+            output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else None
+        except OSError as e:
+            raise CommandError(str(e))
+        try:
+            for chunk in export_products(queryset, options['format'], chunk_size=options['chunk_size']):
+                if output:
+                    output.write(chunk)
+                else:
+                    self.stdout.write(chunk, ending='')
+        finally:
+            if output:
+                output.close()
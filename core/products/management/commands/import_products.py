@@ -0,0 +1,65 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importers import FORMATS, import_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Upserts product stones from a CSV or JSONL file, matched by SKU. Only the columns "
+        "present in the file are written, so a file with just sku and price_per_kg updates "
+        "prices; creating a product needs name and stone_type too. The file is streamed and "
+        "written in batches, so memory use does not grow with its size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--rejects', help="Write every rejected row as a JSON line to this file.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if fmt not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {path!r}; pass --format.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        rejects = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+
+        def on_reject(line_number, errors):
+            rejects.write(json.dumps({"line": line_number, "errors": errors}, ensure_ascii=False) + '\n')
+
+        def on_progress(report):
+            self.stderr.write(
+                f"processed {report.processed}, upserted {report.upserted}, rejected {report.rejected}",
+                ending='\r',
+            )
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding=options['encoding'], newline='')
+            with stream:
+                report = import_products(
+                    stream, fmt,
+                    batch_size=options['batch_size'],
+                    on_progress=on_progress,
+                    on_reject=on_reject if rejects else None,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        finally:
+            if rejects:
+                rejects.close()
+
+        self.stderr.write('')
+        for rejection in report.rejections:
+            self.stderr.write(f"line {rejection['line']}: {json.dumps(rejection['errors'], ensure_ascii=False)}")
+        if report.rejected > len(report.rejections):
+            self.stderr.write(f"... and {report.rejected - len(report.rejections)} more rejected rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.upserted} rows upserted, {report.rejected} rejected, {report.processed} processed."
+        ))
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from products.search import product_stone_search_index
+
+
+def create_search_index(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    ProductStone = apps.get_model('products', 'ProductStone')
+    product_stone_search_index.create(using=alias)
+    product_stone_search_index.rebuild(ProductStone.objects.using(alias).all())
+
+
+def drop_search_index(apps, schema_editor):
+    product_stone_search_index.drop(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_productstone_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productstone',
+            index=models.Index(fields=['created_at', 'id'], name='products_stone_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstone',
+            index=models.Index(fields=['price_per_kg', 'id'], name='products_stone_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstone',
+            index=models.Index(fields=['stone_type', 'created_at', 'id'], name='products_stone_type_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstone',
+            index=models.Index(fields=['stone_type', 'price_per_kg', 'id'], name='products_stone_type_price_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_productstone_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productstone',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='نسخه\u200cهای تصویر'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from products.search import product_stone_search_index
+
+
+def rebuild_search_index(apps, schema_editor):
+    # documents are now indexed with ZWNJ-joined words (core/utils/search.py)
+    alias = schema_editor.connection.alias
+    ProductStone = apps.get_model('products', 'ProductStone')
+    product_stone_search_index.rebuild(ProductStone.objects.using(alias).all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_productstone_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
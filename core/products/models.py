@@ -1,5 +1,92 @@
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.conf import settings
+from core.utils.images import schedule_variants
+from .search import product_stone_search_index
+
+class InsufficientStock(Exception):
+    """
+    موجودی محصول برای رزرو مقدار درخواستی کافی نیست.
+    """
+
+    def __init__(self, product_id):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+
+class ProductStoneQuerySet(models.QuerySet):
+
+    def reserve(self, product_id, quantity):
+        """
+        Atomically takes `quantity` units of a product out of stock with a single
+        conditional UPDATE ... WHERE available_quantity >= quantity, so concurrent
+        checkouts can never oversell. Raises InsufficientStock when nothing was updated.
+        """
+        updated = self.filter(
+            pk=product_id,
+            available_quantity__gte=quantity,
+            price_per_kg__isnull=False,
+        ).update(available_quantity=models.F('available_quantity') - quantity)
+        if not updated:
+            raise InsufficientStock(product_id)
+
+
+def line_total():
+    """
+    quantity * price_per_unit of an order item, computed by the database.
+    """
+    return models.ExpressionWrapper(
+        models.F('quantity') * models.F('price_per_unit'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class OrderItemQuerySet(models.QuerySet):
+
+    def with_line_totals(self):
+        return self.annotate(line_total=line_total())
+
+
+class OrderQuerySet(models.QuerySet):
+
+    def with_item_totals(self):
+        """
+        Annotates items_total, the Sum of the line totals of each order, as a
+        correlated subquery, so the orders stay one row each (no GROUP BY
+        over the joined items) and can be paginated.
+        """
+        totals = (
+            OrderItem.objects.filter(order=models.OuterRef('pk'))
+            .order_by()
+            .values('order')
+            .annotate(total=models.Sum(line_total()))
+            .values('total')
+        )
+        return self.annotate(items_total=Coalesce(
+            models.Subquery(totals), models.Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ))
+
+    def history(self, user):
+        """
+        The orders of a user with their items (line totals and product name
+        included) in two queries: the orders, then every item of the page
+        with its product joined, whatever the number of items.
+        """
+        items = (
+            OrderItem.objects.with_line_totals()
+            .select_related('product')
+            .only('id', 'order_id', 'quantity', 'price_per_unit', 'product__id', 'product__name')
+            .order_by('id')
+        )
+        return (
+            self.filter(user=user)
+            .with_item_totals()
+            .only('id', 'status', 'created_at', 'payment_date')
+            .prefetch_related(models.Prefetch('items', queryset=items))
+        )
+
 
 class ProductStone(models.Model):
     """
@@ -14,6 +101,7 @@ class ProductStone(models.Model):
         ('metamorphic', 'دگرگونی'),
     ]
 
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True, verbose_name='کد کالا')
     name = models.CharField(max_length=150, verbose_name='نام سنگ')
     scientific_name = models.CharField(max_length=150, blank=True, verbose_name='نام علمی')
     stone_type = models.CharField(max_length=50, choices=STONE_TYPE_CHOICES, verbose_name='نوع سنگ')
@@ -24,18 +112,31 @@ class ProductStone(models.Model):
     applications = models.TextField(blank=True, verbose_name='کاربردها')
     extraction_sites = models.TextField(blank=True, verbose_name='محل‌های استخراج')
     image = models.ImageField(upload_to='product_stones/', blank=True, null=True, verbose_name='تصویر')
+    # thumbnails and WebP/AVIF versions of the image, built after upload (core/utils/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='نسخه‌های تصویر')
     price_per_kg = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='قیمت هر کیلوگرم')
     available_quantity = models.PositiveIntegerField(default=0, verbose_name='مقدار موجود')
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
 
+    objects = ProductStoneQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name = 'محصول سنگ'
         verbose_name_plural = 'محصولات سنگ'
+        indexes = [
+            # sorting and exact lookups by name
+            models.Index(fields=['name'], name='products_stone_name_idx'),
+            # catalog keyset orderings, alone and combined with the stone_type filter
+            models.Index(fields=['created_at', 'id'], name='products_stone_created_idx'),
+            models.Index(fields=['price_per_kg', 'id'], name='products_stone_price_idx'),
+            models.Index(fields=['stone_type', 'created_at', 'id'], name='products_stone_type_new_idx'),
+            models.Index(fields=['stone_type', 'price_per_kg', 'id'], name='products_stone_type_price_idx'),
+        ]
 
 
 class Order(models.Model):
@@ -51,19 +152,27 @@ class Order(models.Model):
         ('failed', 'پرداخت نشده'),
     ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='کاربر')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='کاربر', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ سفارش')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
     total_price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='قیمت کل', default=0)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='وضعیت سفارش')
     payment_date = models.DateTimeField(blank=True, null=True, verbose_name='تاریخ پرداخت')
 
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return f'سفارش #{self.id} توسط {self.user} - وضعیت: {self.get_status_display()}'
 
     class Meta:
         verbose_name = 'سفارش'
         verbose_name_plural = 'سفارش‌ها'
+        indexes = [
+            # admin list_filter on status and created_at
+            models.Index(fields=['status', 'created_at'], name='products_order_status_idx'),
+            # order history of a user, newest first; also replaces the plain user_id FK index
+            models.Index(fields=['user', 'created_at', 'id'], name='products_order_user_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -77,6 +186,8 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(verbose_name='تعداد')
     price_per_unit = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='قیمت واحد')
 
+    objects = OrderItemQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.quantity} x {self.product.name}'
 
@@ -86,3 +197,24 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = 'آیتم سفارش'
         verbose_name_plural = 'آیتم‌های سفارش'
+
+
+@receiver(post_save, sender=ProductStone)
+def index_product_stone(sender, instance, using, **kwargs):
+    """
+    Signal that keeps the full-text search index of product stones up to date
+    """
+    product_stone_search_index.index(instance.pk, instance, using=using)
+
+
+@receiver(post_delete, sender=ProductStone)
+def unindex_product_stone(sender, instance, using, **kwargs):
+    product_stone_search_index.delete(instance.pk, using=using)
+
+
+@receiver(post_save, sender=ProductStone)
+def product_stone_image_saved(sender, instance, using, **kwargs):
+    """
+    Signal that builds the image variants of a new or replaced product image once the transaction commits
+    """
+    schedule_variants(instance, using=using)
@@ -0,0 +1,16 @@
+from core.utils.search import FullTextIndex
+
+
+def product_stone_document(product):
+    return {
+        'name': f'{product.name} {product.scientific_name}',
+        'keywords': f'{product.stone_type} {product.get_stone_type_display()} {product.colors}',
+        'description': f'{product.description} {product.applications} {product.extraction_sites}',
+    }
+
+
+product_stone_search_index = FullTextIndex(
+    'products_productstone_search',
+    columns={'name': 10.0, 'keywords': 4.0, 'description': 1.0},
+    build=product_stone_document,
+)
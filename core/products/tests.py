@@ -1,3 +1,419 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import quote, urlencode
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from core.utils.testing import QueryBudgetTestMixin
+from products.models import InsufficientStock, Order, OrderItem, ProductStone
+from products.api.v1.serializer import MAX_ITEM_QUANTITY, OrderCreateSerializer
+from products.api.v1.views import OrderListCreateView
+from products.importers import export_products, import_products
+
+
+class FakeRequest:
+    def __init__(self, user):
+        self.user = user
+
+
+class OrderPlacementStressTest(TransactionTestCase):
+    '''
+    Many threads check out the same product at once; stock must never go negative
+    and every unit sold must belong to exactly one committed order.
+    Runs against whatever database is configured (SQLite or PostgreSQL).
+    '''
+
+    threads = 200
+    stock = 60
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer@example.com', 'a-strong-password')
+        self.product = ProductStone.objects.create(
+            name='گرانیت', stone_type='igneous', price_per_kg='12.50', available_quantity=self.stock,
+        )
+        self.other = ProductStone.objects.create(
+            name='مرمر', stone_type='metamorphic', price_per_kg='4.00', available_quantity=10 ** 6,
+        )
+
+    def place_order(self, results, barrier):
+        barrier.wait()
+        try:
+            serializer = OrderCreateSerializer(
+                data={'items': [{'product': self.other.id, 'quantity': 2}, {'product': self.product.id, 'quantity': 1}]},
+                context={'request': FakeRequest(self.user)},
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            results.append('ok')
+        except InsufficientStock:
+            results.append('short')
+        except Exception as e:  # surfaced by the assertions below
+            results.append(repr(e))
+        finally:
+            connection.close()
+
+    def test_concurrent_checkouts_never_oversell(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("threads cannot share an in-memory SQLite test database")
+        results = []
+        barrier = threading.Barrier(self.threads)
+        workers = [threading.Thread(target=self.place_order, args=(results, barrier)) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual([r for r in results if r not in ('ok', 'short')], [])
+        self.assertEqual(results.count('ok'), self.stock)
+
+        self.product.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.product.available_quantity, 0)
+        self.assertEqual(self.other.available_quantity, 10 ** 6 - 2 * self.stock)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.assertEqual(OrderItem.objects.filter(product=self.product).count(), self.stock)
+        # totals were computed by the database: 2 * 4.00 + 1 * 12.50
+        self.assertEqual(set(Order.objects.values_list('total_price', flat=True)), {20.5})
+
+
+class OrderHistoryTest(QueryBudgetTestMixin, TestCase):
+    '''
+    The order history of a user: totals computed by the database, keyset
+    pages, and at most three queries per page however many items there are.
+    '''
+
+    url = '/products/api/v1/orders/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer@example.com', 'a-strong-password')
+        cls.other_user = User.objects.create_user('other@example.com', 'a-strong-password')
+        cls.products = [
+            ProductStone.objects.create(name=f'گرانیت {i}', stone_type='igneous', price_per_kg='12.50', available_quantity=100)
+            for i in range(3)
+        ]
+        now = timezone.now()
+        cls.orders = []
+        for i in range(5):
+            order = Order.objects.create(user=cls.user, total_price=0, status='paid' if i % 2 else 'pending')
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(days=i))
+            for quantity, product in enumerate(cls.products, start=1):
+                OrderItem.objects.create(order=order, product=product, quantity=quantity + i, price_per_unit='2.50')
+            cls.orders.append(order)
+        Order.objects.create(user=cls.other_user, total_price=0)
+
+    def headers(self, user=None):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user or self.user)}'}
+
+    def test_history_totals(self):
+        response = self.client.get(self.url, **self.headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        results = response.json()['data']['results']
+        self.assertEqual([order['id'] for order in results], [order.id for order in self.orders])
+        first = results[0]
+        self.assertEqual([Decimal(item['line_total']) for item in first['items']], [Decimal('2.50'), Decimal('5.00'), Decimal('7.50')])
+        self.assertEqual(Decimal(first['total_price']), Decimal('15.00'))
+        self.assertEqual(first['items'][0]['product_name'], 'گرانیت 0')
+
+    def test_keyset_pages(self):
+        response = self.client.get(f'{self.url}?page_size=2', **self.headers())
+        self.assertWithinQueryBudget(response)
+        data = response.json()['data']
+        self.assertEqual([order['id'] for order in data['results']], [order.id for order in self.orders[:2]])
+        response = self.client.get(data['next'], **self.headers())
+        self.assertWithinQueryBudget(response)
+        self.assertEqual([order['id'] for order in response.json()['data']['results']], [order.id for order in self.orders[2:4]])
+
+    def test_status_filter_and_stream(self):
+        response = self.client.get(f'{self.url}?status=paid', **self.headers())
+        self.assertWithinQueryBudget(response)
+        self.assertEqual([order['id'] for order in response.json()['data']['results']], [self.orders[1].id, self.orders[3].id])
+
+    def test_stream_queries(self):
+        # the budget only covers the response up to its first byte; while the
+        # body is sent, the orders are read once and their items once per chunk
+        with mock.patch.object(OrderListCreateView, 'stream_chunk_size', 2):
+            response = self.client.get(f'{self.url}?stream=1', **self.headers())
+            self.assertWithinQueryBudget(response)
+            with CaptureQueriesContext(connection) as queries:
+                data = json.loads(b''.join(response.streaming_content))['data']
+        self.assertEqual([order['id'] for order in data], [order.id for order in self.orders])
+        self.assertEqual([len(order['items']) for order in data], [3] * 5)
+        self.assertEqual(len(queries), 1 + 3)
+
+    def test_only_own_orders(self):
+        response = self.client.get(self.url, **self.headers(self.other_user))
+        results = response.json()['data']['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(Decimal(results[0]['total_price']), Decimal('0'))
+        self.assertEqual(results[0]['items'], [])
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class OrderCreateTest(TestCase):
+    '''
+    Placing orders over HTTP: the created order, a short product rolling the
+    whole order back, and payloads rejected before any stock is touched.
+    '''
+
+    url = '/products/api/v1/orders/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer@example.com', 'a-strong-password')
+        cls.granite, cls.marble = (
+            ProductStone.objects.create(name=name, stone_type='igneous', price_per_kg=price, available_quantity=10)
+            for name, price in (('گرانیت', '12.50'), ('مرمر', '20.00'))
+        )
+
+    def post(self, items):
+        return self.client.post(
+            self.url, {'items': items}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}',
+        )
+
+    def stock(self):
+        return list(ProductStone.objects.order_by('id').values_list('available_quantity', flat=True))
+
+    def test_created(self):
+        response = self.post([{'product': self.marble.id, 'quantity': 2}, {'product': self.granite.id, 'quantity': 3}])
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['data']
+        order = Order.objects.get(user=self.user)
+        self.assertEqual((data['id'], data['status']), (order.id, 'pending'))
+        self.assertEqual(Decimal(data['total_price']), Decimal('77.50'))
+        self.assertEqual(
+            [(item['product'], item['quantity'], Decimal(item['price_per_unit'])) for item in data['items']],
+            [(self.granite.id, 3, Decimal('12.50')), (self.marble.id, 2, Decimal('20.00'))],
+        )
+        self.assertEqual(self.stock(), [7, 8])
+
+    def test_insufficient_stock_rolls_back(self):
+        # granite is reserved first (product id order), then marble is short
+        response = self.post([{'product': self.granite.id, 'quantity': 5}, {'product': self.marble.id, 'quantity': 11}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['errors'], {'product': self.marble.id})
+        self.assertEqual(self.stock(), [10, 10])
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_items(self):
+        for items in (
+            [{'product': self.granite.id, 'quantity': 1}, {'product': self.granite.id, 'quantity': 1}],
+            [{'product': self.granite.id, 'quantity': 10 ** 30}],
+            [{'product': self.granite.id, 'quantity': MAX_ITEM_QUANTITY + 1}],
+            [{'product': 2 ** 70, 'quantity': 1}],
+            [{'product': self.granite.id, 'quantity': 0}],
+            [],
+        ):
+            with self.subTest(items=items):
+                response = self.post(items)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('items', response.json()['errors'])
+        self.assertEqual(self.stock(), [10, 10])
+        self.assertFalse(Order.objects.exists())
+
+    def test_requires_authentication(self):
+        response = self.client.post(self.url, {'items': [{'product': self.granite.id, 'quantity': 1}]}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+class CatalogPaginationTest(TestCase):
+    '''
+    Cursor pages of the catalog walk every product exactly once, in order,
+    on orderings whose first column has many ties, without OFFSET scans.
+    '''
+
+    url = '/products/api/v1/stones/'
+
+    @classmethod
+    def setUpTestData(cls):
+        ProductStone.objects.bulk_create(
+            ProductStone(name=f'گرانیت {i % 3}', stone_type='igneous', price_per_kg=('12.50', '8.00')[i % 2], available_quantity=i)
+            for i in range(25)
+        )
+        ProductStone.objects.create(name='بی‌قیمت', stone_type='igneous')
+
+    def walk(self, query):
+        ids, url, pages = [], f'{self.url}?{query}', []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries), queries.captured_queries)
+            data = response.json()['data']
+            ids.extend(item['id'] for item in data['results'])
+            pages.append(data)
+            url = data['next']
+        return ids, pages
+
+    def test_ties_on_the_first_field(self):
+        for ordering, key in (
+            ('price_per_kg', lambda p: (p.price_per_kg, p.id)),
+            ('-price_per_kg', lambda p: (-p.price_per_kg, -p.id)),
+            ('name', lambda p: (p.name, p.id)),
+            ('-name', lambda p: (p.name, p.id)),
+        ):
+            with self.subTest(ordering=ordering):
+                ids, _ = self.walk(f'ordering={ordering}&page_size=4')
+                products = ProductStone.objects.all()
+                if 'price' in ordering:
+                    products = products.exclude(price_per_kg__isnull=True)
+                expected = [p.id for p in sorted(products, key=key, reverse=ordering == '-name')]
+                self.assertEqual(ids, expected)
+
+    def test_previous_pages(self):
+        _, pages = self.walk('ordering=price_per_kg&page_size=4')
+        self.assertIsNone(pages[0]['previous'])
+        last = pages[-1]
+        for page in reversed(pages[:-1]):
+            response = self.client.get(last['previous']).json()['data']
+            self.assertEqual(response['results'], page['results'])
+            last = response
+        self.assertIsNone(last['previous'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(f'{self.url}?cursor=bm9wZQ==').status_code, 404)
+        self.assertEqual(self.client.get(f'{self.url}?cursor=cD0lNUIxJTVE').status_code, 404)  # p=[1]: one value for two fields
+
+    def test_tampered_cursor(self):
+        def cursor(position, **extra):
+            return base64.b64encode(urlencode({'p': json.dumps(position), **extra}).encode()).decode()
+
+        now = timezone.now().isoformat()
+        for ordering, position in (
+            ('', ['yesterday', 1]),
+            ('', [now, 'one']),
+            ('', [{'a': 1}, 1]),
+            ('', [now, [1]]),
+            ('', [None, 1]),
+            ('', [now, 2 ** 80]),
+            ('ordering=price_per_kg&', ['cheap', 1]),
+        ):
+            with self.subTest(position=position):
+                response = self.client.get(f'{self.url}?{ordering}cursor={quote(cursor(position))}')
+                self.assertEqual(response.status_code, 404)
+        # a well-formed one still works, in both directions
+        for extra in ({}, {'r': '1'}):
+            self.assertEqual(self.client.get(f'{self.url}?cursor={quote(cursor([now, 1], **extra))}').status_code, 200)
+
+
+class ProductImportTest(TestCase):
+    '''
+    Imports write only the columns of the file, report bad rows one by one
+    and read back what the export wrote.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.granite = ProductStone.objects.create(
+            sku='GR-1', name='گرانیت', scientific_name='Granite', stone_type='igneous', colors='خاکستری',
+            hardness='6.5', density='2.70', description='سنگ ساختمانی', price_per_kg='12.50', available_quantity=40,
+        )
+
+    def run_import(self, text, fmt='csv', **kwargs):
+        return import_products(io.StringIO(text), fmt, **kwargs)
+
+    def test_partial_columns_update_only_those(self):
+        report = self.run_import('sku,price_per_kg\nGR-1,15.00\nNEW-1,3.00\n')
+        self.assertEqual((report.upserted, report.rejected), (1, 1))
+        self.assertEqual(report.rejections[0]['line'], 3)
+        self.assertIn('sku', report.rejections[0]['errors'])
+
+        granite = ProductStone.objects.get(sku='GR-1')
+        self.assertEqual(granite.price_per_kg, Decimal('15.00'))
+        self.assertEqual((granite.name, granite.colors, granite.description), ('گرانیت', 'خاکستری', 'سنگ ساختمانی'))
+        self.assertEqual((granite.hardness, granite.density, granite.available_quantity), (Decimal('6.5'), Decimal('2.70'), 40))
+        self.assertFalse(ProductStone.objects.filter(sku='NEW-1').exists())
+
+    def test_jsonl_rows_with_different_keys(self):
+        lines = [
+            {'sku': 'GR-1', 'available_quantity': 7},
+            {'sku': 'MR-1', 'name': 'مرمر', 'stone_type': 'metamorphic'},
+            {'sku': 'GR-1', 'colors': 'صورتی'},
+        ]
+        report = self.run_import(''.join(json.dumps(line) + '\n' for line in lines), 'jsonl', batch_size=2)
+        self.assertEqual((report.upserted, report.rejected), (3, 0))
+        granite = ProductStone.objects.get(sku='GR-1')
+        self.assertEqual((granite.available_quantity, granite.colors, granite.price_per_kg), (7, 'صورتی', Decimal('12.50')))
+        self.assertEqual(ProductStone.objects.get(sku='MR-1').available_quantity, 0)
+
+    def test_invalid_rows_are_reported_per_row(self):
+        text = (
+            'sku,name,stone_type,hardness,available_quantity\n'
+            'A-1,الف,igneous,5,10\n'
+            'A-2,,lava,5,10\n'
+            'A-3,ج,igneous,abc,-1\n'
+            f'A-4,د,igneous,5,{10 ** 30}\n'
+            'A-5,ه,آذرین,5,\n'
+        )
+        report = self.run_import(text)
+        self.assertEqual((report.processed, report.upserted, report.rejected), (5, 2, 3))
+        errors = {rejection['line']: rejection['errors'] for rejection in report.rejections}
+        self.assertEqual(set(errors), {3, 4, 5})
+        self.assertEqual(set(errors[3]), {'name', 'stone_type'})
+        self.assertEqual(set(errors[4]), {'hardness', 'available_quantity'})
+        self.assertEqual(set(errors[5]), {'available_quantity'})
+        self.assertEqual(ProductStone.objects.get(sku='A-5').stone_type, 'igneous')
+
+        report = self.run_import('{"sku": "B-1", "name": "ب", "stone_type": "igneous", "available_quantity": 1e400}\n[1]\n', 'jsonl')
+        self.assertEqual((report.upserted, report.rejected), (0, 2))
+
+    def test_export_round_trip(self):
+        ProductStone.objects.create(name='بدون کد', stone_type='sedimentary')
+        fields = ['sku', 'name', 'scientific_name', 'stone_type', 'colors', 'hardness', 'density',
+                  'description', 'applications', 'extraction_sites', 'price_per_kg', 'available_quantity']
+        before = list(ProductStone.objects.filter(sku__isnull=False).values(*fields))
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                exported = ''.join(export_products(ProductStone.objects.all(), fmt))
+                ProductStone.objects.filter(sku='GR-1').update(name='تغییر', price_per_kg=None, available_quantity=0)
+                report = self.run_import(exported, fmt)
+                # the product without a SKU cannot be matched, so it is rejected (see export_products)
+                self.assertEqual((report.upserted, report.rejected), (1, 1))
+                self.assertEqual(list(report.rejections[0]['errors']), ['sku'])
+                self.assertEqual(list(ProductStone.objects.filter(sku__isnull=False).values(*fields)), before)
+
+
+class AsyncCatalogTest(TestCase):
+    '''
+    The async catalog views answer like the sync ones, errors included.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            ProductStone.objects.create(name=f'گرانیت {i}', stone_type='igneous', price_per_kg=f'{i}.50', available_quantity=i)
+            for i in range(5)
+        ]
+
+    async def test_list_and_detail(self):
+        for query in ('', '?ordering=price_per_kg&page_size=2', '?in_stock=true&price_min=2'):
+            with self.subTest(query=query):
+                response = await self.async_client.get(f'/products/api/v1/async/stones/{query}')
+                self.assertEqual(response.status_code, 200)
+                expected = (await self.async_client.get(f'/products/api/v1/stones/{query}')).json()['data']
+                self.assertEqual(response.json()['data']['results'], expected['results'])
+
+        product = self.products[1]
+        response = await self.async_client.get(f'/products/api/v1/async/stones/{product.id}/')
+        self.assertEqual(response.json()['data']['name'], product.name)
+
+    async def test_errors(self):
+        response = await self.async_client.get('/products/api/v1/async/stones/0/')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/products/api/v1/async/stones/?price_min=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], {'price_min': 'عدد معتبر نیست.'})
+        response = await self.async_client.get('/products/api/v1/async/stones/?cursor=bm9wZQ==')
+        self.assertEqual(response.status_code, 404)
@@ -1,6 +1,8 @@
-# accounts/urls.py
+from django.urls import path, include
 
-from django.urls import path
+app_name = "products"
 
 urlpatterns = [
+    
+    path("api/v1/", include("products.api.v1.urls")),
 ]